@@ -0,0 +1,256 @@
+"""
+Local stand-in for the Azure OpenAI and AWS Bedrock vision endpoints.
+
+Answers chat completions (``/openai/deployments/<name>/chat/completions``) and
+Bedrock InvokeModel (``/model/<id>/invoke``) requests after a fixed latency
+(plus up to ``--jitter`` seconds, fixed per image), with token usage in the
+response. Each description ends with a digest of the image it describes, so
+callers can check answers land in the right place. Requests with several
+images get the batched JSON answer, one entry per image. Requests beyond ``--max-concurrency`` in
+flight are rejected the way the real services throttle: HTTP 429, plus
+``x-amzn-ErrorType: ThrottlingException`` for Bedrock. ``GET /stats`` reports
+request, throttle and peak-concurrency counts.
+
+Point clients at it with ``AzureOpenAI(azure_endpoint=...)`` or
+``boto3.client("bedrock-runtime", endpoint_url=...)``.
+
+Usage:
+    python -m benchmarks.fake_llm_server [--port 8089] [--latency 0.5] [--jitter 0] [--max-concurrency 8]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+DESCRIPTION = "Chart: quarterly revenue. Q1 10, Q2 12, Q3 15, Q4 18."
+
+
+def image_digests(request: dict) -> list[str]:
+    """Short digest of each image's base64 data in a chat completions or Bedrock Messages request, in order."""
+    digests = []
+    for message in request.get("messages", []):
+        if not isinstance(message.get("content"), list):
+            continue
+        for part in message["content"]:
+            if part.get("type") == "image_url":
+                data = part["image_url"]["url"]
+            elif part.get("type") == "image":
+                data = part["source"]["data"]
+            else:
+                continue
+            digests.append(hashlib.sha256(data.encode("utf-8")).hexdigest()[:12])
+    return digests
+
+
+def describe(digest: str) -> str:
+    return f"{DESCRIPTION} Image {digest}."
+
+
+def answer_text(request: dict) -> str:
+    """The description of a single image, or the batched JSON answer describing each image of a request."""
+    digests = image_digests(request)
+    if len(digests) <= 1:
+        return describe(digests[0] if digests else "none")
+    return json.dumps(
+        {"images": [{"index": n, "description": describe(digest)} for n, digest in enumerate(digests, start=1)]}
+    )
+
+
+class FakeLLMServer:
+    """Threaded fake LLM server. Use as a context manager or call start()/stop()."""
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.5,
+        jitter: float = 0.0,
+        max_concurrency: int = 8,
+        retry_after: float | None = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {"requests": 0, "completed": 0, "throttled": 0, "peakConcurrency": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = {key: 0 for key in self._stats}
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def delay(self, request: dict) -> float:
+        """Latency for ``request``: the base latency plus a jitter picked from its first image, so reruns match."""
+        digests = image_digests(request)
+        if not self.jitter or not digests:
+            return self.latency
+        return self.latency + self.jitter * int(digests[0][:4], 16) / 0xFFFF
+
+    def _enter(self) -> bool:
+        with self._lock:
+            self._stats["requests"] += 1
+            if self._in_flight >= self.max_concurrency:
+                self._stats["throttled"] += 1
+                return False
+            self._in_flight += 1
+            self._stats["peakConcurrency"] = max(self._stats["peakConcurrency"], self._in_flight)
+            return True
+
+    def _exit(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._stats["completed"] += 1
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: dict[str, str] | None = None) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                if self.path.rstrip("/") == "/stats":
+                    self._send_json(200, server.stats())
+                else:
+                    self._send_json(404, {"message": "Not found"})
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                path = self.path.split("?", 1)[0]
+                is_bedrock = path.startswith("/model/")
+                if not is_bedrock and not path.endswith("/chat/completions"):
+                    self._send_json(404, {"message": "Not found"})
+                    return
+
+                if not server._enter():
+                    headers = {}
+                    if server.retry_after is not None:
+                        headers["Retry-After"] = str(server.retry_after)
+                    if is_bedrock:
+                        headers["x-amzn-ErrorType"] = "ThrottlingException"
+                        self._send_json(429, {"message": "Too many requests, please wait before trying again."}, headers)
+                    else:
+                        self._send_json(429, {"error": {"code": "429", "message": "Rate limit exceeded"}}, headers)
+                    return
+
+                try:
+                    time.sleep(server.delay(request))
+                finally:
+                    # Count the request as finished before replying, so a client's next call is not seen as overlapping
+                    server._exit()
+
+                text = answer_text(request)
+                input_tokens = max(1, length // 4)
+                output_tokens = len(text) // 4
+                if is_bedrock:
+                    self._send_json(
+                        200,
+                        {
+                            "id": "msg_fake",
+                            "type": "message",
+                            "role": "assistant",
+                            "content": [{"type": "text", "text": text}],
+                            "stop_reason": "end_turn",
+                            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+                        },
+                    )
+                else:
+                    self._send_json(
+                        200,
+                        {
+                            "id": "chatcmpl-fake",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": request.get("model", "fake"),
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "finish_reason": "stop",
+                                    "message": {"role": "assistant", "content": text},
+                                }
+                            ],
+                            "usage": {
+                                "prompt_tokens": input_tokens,
+                                "completion_tokens": output_tokens,
+                                "total_tokens": input_tokens + output_tokens,
+                            },
+                        },
+                    )
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per successful request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra seconds per request, up to this, fixed per image")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Requests in flight before returning 429")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        max_concurrency=args.max_concurrency,
+        retry_after=args.retry_after,
+    )
+    print(f"Fake LLM server listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
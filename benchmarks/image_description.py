@@ -0,0 +1,160 @@
+"""
+Wall-clock comparison of sequential vs concurrent image description.
+
+Builds a synthetic image-only PDF deck, starts the fake LLM server and runs
+PDFToMarkdown.convert_pdf_to_markdown_optimized against it: once with the
+provider's LLM scheduler limited to one call at a time (the old sequential
+behaviour) and once per --concurrency value. The fake server throttles above
+--server-limit requests in flight, so high concurrency also exercises the
+scheduler's backoff. --decorative adds blank and gradient slides, which the
+local prefilter should drop before any LLM call. Each --batch-size is then
+run at the highest concurrency, packing that many images into one call
+(0 = one call per page).
+
+Usage:
+    python -m benchmarks.image_description [--images 40] [--decorative 10] [--latency 0.5]
+        [--concurrency 4 8 16] [--batch-size 4 8] [--provider azure_openai|aws_bedrock] [--tokens-per-minute 0]
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from extraction.helper.common import ratelimit
+from extraction.helper.common.ratelimit import LLMScheduler
+from extraction.helper.markitdown.PdfToMarkdown import ImageStats, PDFToMarkdown
+from extraction.helper.schemas.types import ModelProvider
+
+
+def build_deck(path: Path, images: int, decorative: int = 0) -> None:
+    """Write a PDF with one distinct chart-like JPEG per page, followed by ``decorative`` blank or gradient pages."""
+    pages = []
+    for n in range(images):
+        img = Image.new("RGB", (800, 600), (255, 255, 255))
+        draw = ImageDraw.Draw(img)
+        for bar in range(6):
+            height = 60 + ((n * 37 + bar * 53) % 400)
+            draw.rectangle([80 + bar * 110, 550 - height, 160 + bar * 110, 550], fill=(30 + bar * 35, 90, 200 - n % 150))
+        draw.text((40, 30), f"Slide {n + 1}", fill=(0, 0, 0))
+        pages.append(img)
+    for n in range(decorative):
+        if n % 2:
+            pages.append(Image.new("RGB", (800, 600), (240 - n % 40, 240, 250)))
+        else:
+            gradient = Image.linear_gradient("L").resize((800, 600)).convert("RGB")
+            pages.append(gradient)
+    buffer = io.BytesIO()
+    pages[0].save(buffer, format="PDF", save_all=True, append_images=pages[1:], resolution=100)
+    path.write_bytes(buffer.getvalue())
+
+
+def make_client(provider: ModelProvider, url: str):
+    if provider == ModelProvider.AZURE_OPENAI:
+        from openai import AzureOpenAI
+
+        return AzureOpenAI(api_key="fake", azure_endpoint=url, api_version="2024-12-01-preview"), "fake-deployment"
+
+    import boto3
+    from botocore.config import Config as BotocoreConfig
+
+    client = boto3.client(
+        "bedrock-runtime",
+        endpoint_url=url,
+        region_name="us-east-1",
+        aws_access_key_id="fake",
+        aws_secret_access_key="fake",
+        config=BotocoreConfig(retries={"total_max_attempts": 1}),
+    )
+    return client, "anthropic.claude-3-5-sonnet-20240620-v1:0"
+
+
+def run(
+    pdf: Path,
+    provider: ModelProvider,
+    client,
+    model: str,
+    *,
+    concurrency: int,
+    tokens_per_minute: int,
+    batch_size: int = 1,
+) -> tuple[float, dict, ImageStats, str]:
+    os.environ["IMAGE_DESCRIPTION_BATCH_SIZE"] = str(batch_size)
+    # Swap in a scheduler with the limits under test
+    scheduler = LLMScheduler(
+        provider.value,
+        max_concurrency=concurrency,
+        tokens_per_minute=tokens_per_minute,
+        retry_base_seconds=0.2,
+        retry_max_seconds=5,
+    )
+    ratelimit._SCHEDULERS[provider.value] = scheduler
+    image_stats = ImageStats()
+    start = time.perf_counter()
+    markdown = PDFToMarkdown().convert_pdf_to_markdown_optimized(
+        str(pdf), client, model, provider, request_id="benchmark", include_images=False, stats=image_stats
+    )
+    return time.perf_counter() - start, scheduler.stats(), image_stats, markdown
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--decorative", type=int, default=10, help="Blank and gradient slides added to the deck")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM seconds per call")
+    parser.add_argument("--server-limit", type=int, default=8, help="Fake LLM requests in flight before 429")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--batch-size", type=int, nargs="*", default=[4, 8], help="Images per call, at top concurrency")
+    parser.add_argument("--provider", choices=[p.value for p in ModelProvider], default=ModelProvider.AZURE_OPENAI.value)
+    parser.add_argument("--tokens-per-minute", type=int, default=0, help="Scheduler token budget (0 = unlimited)")
+    args = parser.parse_args()
+
+    provider = ModelProvider(args.provider)
+    # Every run describes the same deck; cached descriptions would hide the LLM calls being measured
+    os.environ["IMAGE_DESCRIPTION_CACHE_ENABLED"] = "false"
+    with tempfile.TemporaryDirectory() as tmp, FakeLLMServer(latency=args.latency, max_concurrency=args.server_limit) as server:
+        pdf = Path(tmp) / "deck.pdf"
+        build_deck(pdf, args.images, args.decorative)
+        client, model = make_client(provider, server.url)
+
+        print(
+            f"{args.images} images + {args.decorative} decorative, {args.latency:.2f}s per call, "
+            f"server limit {args.server_limit}, provider {provider.value}"
+        )
+        print(
+            f"{'concurrency':>11}  {'batch':>5}  {'seconds':>8}  {'speedup':>7}  {'calls':>5}  {'throttled':>9}  {'server peak':>11}"
+            f"  {'prefiltered':>11}"
+        )
+        baseline_seconds = None
+        baseline_markdown = None
+        runs = [(1, 1), *((c, 1) for c in args.concurrency), *((max(args.concurrency), b) for b in args.batch_size)]
+        for concurrency, batch_size in runs:
+            server.reset_stats()
+            seconds, stats, image_stats, markdown = run(
+                pdf,
+                provider,
+                client,
+                model,
+                concurrency=concurrency,
+                tokens_per_minute=args.tokens_per_minute,
+                batch_size=batch_size,
+            )
+            if baseline_seconds is None:
+                baseline_seconds, baseline_markdown = seconds, markdown
+            elif markdown != baseline_markdown:
+                print(f"  warning: output at concurrency {concurrency}, batch {batch_size} differs from sequential output")
+            print(
+                f"{concurrency:>11}  {batch_size:>5}  {seconds:>8.2f}  {baseline_seconds / seconds:>6.1f}x  {stats['calls']:>5}"
+                f"  {stats['throttled']:>9}  {server.stats()['peakConcurrency']:>11}"
+                f"  {sum(image_stats.prefiltered.values()):>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Micro-benchmark of the PDF image pipeline used before images are described or stored.
+
+Extracts the embedded images of a PDF (sample_docs/embedded-images.pdf by
+default) and times three ways of making each one ready for a vision model:
+
+- legacy: the old two-pass path, where a non-JPEG was decoded and saved as a
+  JPEG, then every image was decoded again, resized with LANCZOS and
+  re-encoded with optimize=True
+- quality / fast: PDFToMarkdown._validate_and_resize_image_for_azure under
+  each IMAGE_PIPELINE_PROFILE (one decode at most, draft/reduce downscaling,
+  compliant JPEGs passed through)
+
+The sample's images are small, so each is also upscaled and run again as a
+--large pixel JPEG (a large scan, which exercises draft decoding) and as a
+PNG (a non-JPEG XObject) capped at the 4096px the converter accepts, which
+exercises the resize path.
+
+Usage:
+    python -m benchmarks.image_pipeline [--pdf sample_docs/embedded-images.pdf] [--repeat 20] [--large 6000]
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+from PIL import Image
+from pypdf import PdfReader
+
+from extraction.helper.markitdown.PdfToMarkdown import VISION_MAX_DIMENSION, PDFToMarkdown
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def legacy_prepare(image_bytes: bytes, image_mime: str) -> bytes:
+    """The pipeline before single-decode: convert non-JPEGs to JPEG, then decode, resize and re-encode."""
+    if image_mime != "image/jpeg":
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            buffer = io.BytesIO()
+            img.convert("RGB").save(buffer, format="JPEG", quality=85, optimize=True)
+            image_bytes = buffer.getvalue()
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        if max(img.size) > VISION_MAX_DIMENSION:
+            scale = min(VISION_MAX_DIMENSION / img.width, VISION_MAX_DIMENSION / img.height)
+            img = img.resize((int(img.width * scale), int(img.height * scale)), Image.Resampling.LANCZOS)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=85, optimize=True)
+        return buffer.getvalue()
+
+
+def pipeline_prepare(profile: str) -> Callable[[bytes, str], bytes]:
+    helper = PDFToMarkdown()
+
+    def prepare(image_bytes: bytes, image_mime: str) -> bytes:
+        os.environ["IMAGE_PIPELINE_PROFILE"] = profile
+        if image_mime != "image/jpeg":
+            # Non-JPEG XObjects are converted during extraction, which now also fits them to the size limit
+            image_bytes, image_mime = helper._convert_image_to_jpeg(image_bytes, 0, 0, "Generic")
+        processed, _ = helper._validate_and_resize_image_for_azure(image_bytes, image_mime, "benchmark", 0, 0)
+        return processed
+
+    return prepare
+
+
+def pdf_images(pdf: Path) -> list[tuple[str, bytes]]:
+    helper = PDFToMarkdown()
+    images: list[tuple[str, bytes]] = []
+    for page in PdfReader(pdf).pages:
+        images.extend(helper.extract_images_from_page(page))
+    return images
+
+
+def enlarge(images: list[tuple[str, bytes]], size: int, fmt: str) -> list[tuple[str, bytes]]:
+    enlarged = []
+    for _, data in images:
+        with Image.open(io.BytesIO(data)) as img:
+            big = img.convert("RGB").resize((size, size), Image.Resampling.BICUBIC)
+        buffer = io.BytesIO()
+        big.save(buffer, format=fmt, **({"quality": 92} if fmt == "JPEG" else {"compress_level": 1}))
+        enlarged.append((f"image/{fmt.lower()}", buffer.getvalue()))
+    return enlarged
+
+
+def run(prepare: Callable[[bytes, str], bytes], images: list[tuple[str, bytes]], repeat: int) -> tuple[float, int]:
+    out_bytes = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out_bytes = sum(len(prepare(data, mime)) for mime, data in images)
+    return (time.perf_counter() - start) / (repeat * len(images)), out_bytes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", type=Path, default=ROOT / "sample_docs" / "embedded-images.pdf")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--large", type=int, default=6000, help="Side in pixels of the upscaled JPEG variant")
+    args = parser.parse_args()
+
+    images = pdf_images(args.pdf)
+    if not images:
+        raise SystemExit(f"No extractable images in {args.pdf}")
+    png_size = min(args.large, 4096)
+    sets = {
+        "pdf": images,
+        f"jpeg {args.large}px": enlarge(images, args.large, "JPEG"),
+        f"png {png_size}px": enlarge(images, png_size, "PNG"),
+    }
+    pipelines = {"legacy": legacy_prepare, "quality": pipeline_prepare("quality"), "fast": pipeline_prepare("fast")}
+
+    print(f"{len(images)} images from {args.pdf.name}, {args.repeat} repeats")
+    print(f"{'images':>14}  {'pipeline':>8}  {'ms/image':>9}  {'speedup':>7}  {'output KB':>9}")
+    for set_name, set_images in sets.items():
+        repeat = args.repeat if set_name == "pdf" else max(1, args.repeat // 10)
+        baseline = None
+        for name, prepare in pipelines.items():
+            seconds, out_bytes = run(prepare, set_images, repeat)
+            baseline = baseline or seconds
+            print(
+                f"{set_name:>14}  {name:>8}  {seconds * 1000:>9.2f}  {baseline / seconds:>6.1f}x"
+                f"  {out_bytes / 1024:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Wall-clock comparison of marker structured extraction: two marker passes vs one.
+
+The legacy path rendered the PDF with PdfConverter for the markdown response and
+then let ExtractionConverter build the document again before the LLM stage. The
+single-pass path renders once and hands the paginated markdown to the extractor.
+
+By default only the marker stages are timed, so no LLM credentials are needed.
+Pass --with-llm to time the full structured extraction end to end.
+
+Usage:
+    python -m benchmarks.marker_structured [--repeat 3] [--with-llm] [pdf ...]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from marker.converters.extraction import ExtractionConverter
+
+from extraction.helper.marker.markerHelper import (
+    _get_marker_artifacts,
+    convert_pdf_to_markdown,
+    convert_pdf_to_markdown_with_pages,
+    extract_structured_json,
+)
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "sample_docs"
+SAMPLE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "summary": {"type": "string"},
+    },
+}
+
+
+def legacy_two_pass(pdf: Path, *, with_llm: bool) -> None:
+    convert_pdf_to_markdown(pdf, include_images=True)
+    if with_llm:
+        extract_structured_json(pdf, SAMPLE_SCHEMA)
+    else:
+        converter = ExtractionConverter(artifact_dict=_get_marker_artifacts(), config={"paginate_output": True})
+        converter.build_document(str(pdf))
+
+
+def single_pass(pdf: Path, *, with_llm: bool) -> None:
+    _, paginated = convert_pdf_to_markdown_with_pages(pdf, include_images=True)
+    if with_llm:
+        extract_structured_json(pdf, SAMPLE_SCHEMA, existing_markdown=paginated)
+
+
+def _time(fn, pdf: Path, repeat: int, with_llm: bool) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(pdf, with_llm=with_llm)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", type=Path, help="PDFs to benchmark (default: sample_docs/*.pdf)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--with-llm", action="store_true", help="Include the LLM extraction stage")
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(SAMPLE_DIR.glob("*.pdf"))
+
+    # Load models up front so neither variant pays for it.
+    _get_marker_artifacts()
+
+    results = []
+    for pdf in pdfs:
+        legacy = _time(legacy_two_pass, pdf, args.repeat, args.with_llm)
+        single = _time(single_pass, pdf, args.repeat, args.with_llm)
+        legacy_median = statistics.median(legacy)
+        single_median = statistics.median(single)
+        results.append(
+            {
+                "file": pdf.name,
+                "legacy_two_pass_s": round(legacy_median, 3),
+                "single_pass_s": round(single_median, 3),
+                "saving_pct": round(100 * (1 - single_median / legacy_median), 1) if legacy_median else 0.0,
+            }
+        )
+        print(json.dumps(results[-1]))
+
+    total_legacy = sum(r["legacy_two_pass_s"] for r in results)
+    total_single = sum(r["single_pass_s"] for r in results)
+    print(json.dumps({"total_legacy_two_pass_s": round(total_legacy, 3), "total_single_pass_s": round(total_single, 3)}))
+
+
+if __name__ == "__main__":
+    main()
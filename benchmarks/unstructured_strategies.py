@@ -0,0 +1,151 @@
+"""
+Per-file-type latency of unstructured partitioning: hi_res everywhere vs the strategy table.
+
+The legacy configuration sent every file type through the hi_res strategy with
+the yolox layout model and table inference. The strategy table in
+UnstructuredHelper keeps hi_res for PDFs and reads Word documents,
+spreadsheets, CSV and text files without it.
+
+sample_docs/ only holds PDFs, so the other types are generated from their
+text: a .txt, a .docx (headings, paragraphs and a table, needs python-docx),
+and a .csv and .xlsx table of the lines. Pass --types to limit the run.
+
+Usage:
+    python -m benchmarks.unstructured_strategies [--repeat 3] [--types .pdf .docx ...] [pdf ...]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from openpyxl import Workbook
+from pypdf import PdfReader
+from unstructured.partition.utils.constants import PartitionStrategy
+
+from extraction.helper.unstructured.unstructuredHelper import UnstructuredHelper
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "sample_docs"
+FILE_TYPES = [".pdf", ".docx", ".xlsx", ".csv", ".txt"]
+LEGACY_CONFIG: dict[str, Any] = {
+    "strategy": PartitionStrategy.HI_RES,
+    "hi_res_model_name": "yolox",
+    "infer_table_structure": True,
+    "extract_image_block_types": ["Image"],
+    "extract_image_block_to_payload": True,
+}
+
+
+def _lines(pdf: Path) -> list[str]:
+    text = "\n".join(page.extract_text() or "" for page in PdfReader(pdf).pages)
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def build_samples(pdf: Path, out_dir: Path, types: list[str]) -> list[Path]:
+    """Write one document per requested type derived from ``pdf``."""
+    lines = _lines(pdf)
+    rows = [[str(index), line] for index, line in enumerate(lines, start=1)]
+    samples = []
+    for suffix in types:
+        path = out_dir / f"{pdf.stem}{suffix}"
+        if suffix == ".pdf":
+            path = pdf
+        elif suffix == ".txt":
+            path.write_text("\n\n".join(lines), encoding="utf-8")
+        elif suffix == ".csv":
+            with open(path, "w", newline="", encoding="utf-8") as fh:
+                writer = csv.writer(fh)
+                writer.writerow(["line", "text"])
+                writer.writerows(rows)
+        elif suffix == ".xlsx":
+            workbook = Workbook()
+            sheet = workbook.active
+            sheet.append(["line", "text"])
+            for row in rows:
+                sheet.append(row)
+            workbook.save(path)
+        elif suffix == ".docx":
+            try:
+                import docx
+            except ImportError:
+                print(json.dumps({"file": path.name, "skipped": "python-docx is not installed"}))
+                continue
+            document = docx.Document()
+            for line in lines:
+                if len(line) < 40 and not line.endswith("."):
+                    document.add_heading(line, level=2)
+                else:
+                    document.add_paragraph(line)
+            table = document.add_table(rows=0, cols=2)
+            for row in rows[:50]:
+                cells = table.add_row().cells
+                cells[0].text, cells[1].text = row
+            document.save(path)
+        else:
+            raise ValueError(f"Unsupported benchmark type: {suffix}")
+        samples.append(path)
+    return samples
+
+
+def _time(path: Path, parsing_config: dict[str, Any], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        with open(path, "rb") as fh:
+            start = time.perf_counter()
+            UnstructuredHelper.partition_to_markdown(
+                fh,
+                filename=path.name,
+                content_type=None,
+                parsing_config=parsing_config,
+                include_images=True,
+            )
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", type=Path, help="Source PDFs (default: sample_docs/*.pdf)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--types", nargs="+", default=FILE_TYPES, choices=FILE_TYPES)
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(SAMPLE_DIR.glob("*.pdf"))
+    helper = UnstructuredHelper()
+
+    # Load the layout model up front so neither configuration pays for it.
+    UnstructuredHelper.preload_models()
+
+    totals: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for pdf in pdfs:
+            for path in build_samples(pdf, Path(tmp), args.types):
+                suffix = path.suffix.lower()
+                legacy = statistics.median(_time(path, LEGACY_CONFIG, args.repeat))
+                table = statistics.median(_time(path, helper.FILE_PARSING_CONFIG[suffix], args.repeat))
+                total = totals.setdefault(suffix, {"legacy_hi_res_s": 0.0, "strategy_table_s": 0.0})
+                total["legacy_hi_res_s"] += legacy
+                total["strategy_table_s"] += table
+                print(
+                    json.dumps(
+                        {
+                            "file": path.name,
+                            "type": suffix,
+                            "legacy_hi_res_s": round(legacy, 3),
+                            "strategy_table_s": round(table, 3),
+                            "saving_pct": round(100 * (1 - table / legacy), 1) if legacy else 0.0,
+                        }
+                    )
+                )
+
+    for suffix, total in totals.items():
+        print(json.dumps({"type": suffix, **{key: round(value, 3) for key, value in total.items()}}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from extraction.helper.common.cache import cache_stats
+from extraction.helper.common.executor import engine_worker_pids
+from extraction.helper.common.imagestore import image_store_stats
+from extraction.helper.common.libreoffice import libreoffice_stats
+from extraction.helper.common.memory import memory_report
+from extraction.helper.common.ratelimit import llm_scheduler_stats
+from extraction.helper.common.warmup import readiness
+from extraction.helper.unstructured.pagePool import page_pool_pids
+
+router = APIRouter()
+
+
+@router.get(
+    "/ready",
+    status_code=int(HTTPStatus.OK),
+    responses={
+        int(HTTPStatus.OK): {"description": "All preloaded engines are loaded"},
+        int(HTTPStatus.SERVICE_UNAVAILABLE): {"description": "Engines are still loading or failed to load"},
+    },
+)
+async def ready():
+    """
+    Readiness probe for load balancers and autoscalers.
+
+    Returns 200 once every engine in PRELOAD_ENGINES has loaded, otherwise 503.
+    The body reports each engine's load state and load time in seconds.
+    """
+    is_ready, engines = readiness()
+    status_code = HTTPStatus.OK if is_ready else HTTPStatus.SERVICE_UNAVAILABLE
+    return JSONResponse(
+        status_code=int(status_code),
+        content={"ready": is_ready, "engines": engines},
+    )
+
+
+@router.get(
+    "/metrics",
+    status_code=int(HTTPStatus.OK),
+    responses={
+        int(HTTPStatus.OK): {
+            "description": "Cache, image store, LLM, LibreOffice and memory figures for this server process"
+        }
+    },
+)
+async def metrics():
+    """
+    Counters for this server process: hit rates and sizes of the result and
+    image-description caches, image store writes, reuses and size (null
+    until first used), per-provider LLM call, throttle and token
+    counts, and LibreOffice pool conversions and restarts (null until the
+    pool is first used). ``memory`` gives RSS and PSS in MiB for the server
+    and for each engine's worker processes.
+    """
+    worker_pids = engine_worker_pids()
+    worker_pids["unstructured-pages"] = page_pool_pids()
+    return {
+        "caches": cache_stats(),
+        "imageStore": image_store_stats(),
+        "llm": llm_scheduler_stats(),
+        "libreoffice": libreoffice_stats(),
+        "memory": memory_report(worker_pids),
+    }
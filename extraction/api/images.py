@@ -0,0 +1,43 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import FileResponse
+
+from extraction.helper.common.imagestore import get_image_store
+
+router = APIRouter()
+
+# Ids are content hashes, so the bytes behind a URL never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get(
+    "/{image_id}",
+    status_code=int(HTTPStatus.OK),
+    responses={
+        int(HTTPStatus.OK): {"description": "The stored image"},
+        int(HTTPStatus.NOT_MODIFIED): {"description": "The client's cached copy is current"},
+        int(HTTPStatus.NOT_FOUND): {"description": "Unknown or expired image"},
+    },
+)
+async def get_image(
+    image_id: str,
+    if_none_match: str | None = Header(None, description="ETag of a cached copy"),
+):
+    """
+    Serve an image extracted into the image store, as linked from /extracts
+    markdown in ``reference`` image mode.
+
+    No API key is needed: ids are SHA-256 content hashes, so markdown viewers
+    can load the links directly, and only someone holding the markdown (or
+    the image itself) can name one.
+    """
+    stored = get_image_store().get(image_id)
+    if stored is None:
+        raise HTTPException(status_code=int(HTTPStatus.NOT_FOUND), detail="Image not found or expired")
+    path, mime = stored
+    etag = f'"{image_id.split(".")[0]}"'
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": etag}
+    if if_none_match is not None and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=int(HTTPStatus.NOT_MODIFIED), headers=headers)
+    return FileResponse(path, media_type=mime, headers=headers)
@@ -0,0 +1,162 @@
+import datetime
+import json
+import os
+import shutil
+from http import HTTPStatus
+from typing import Any
+
+from fastapi import APIRouter, Form, Header, HTTPException, Request, UploadFile
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.common.auth import validate_endpoint_api_key
+from extraction.helper.common.uploads import save_upload
+from extraction.helper.jobs.runner import get_job_workers
+from extraction.helper.jobs.store import get_job_store
+from extraction.helper.schemas.types import ExtractionEngine, ImageMode, UnstructuredStrategy
+from extraction.helper.unstructured.unstructuredHelper import UnstructuredHelper
+
+router = APIRouter()
+logger = logutil.get_logger("jobs-endpoint")
+
+unstructured_helper = UnstructuredHelper()
+
+
+def _timestamp(value: float) -> str:
+    return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc).isoformat()
+
+
+def _job_response(job: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "jobId": job["id"],
+        "engine": job["engine"],
+        "status": job["status"],
+        "fileName": job["file_name"],
+        "createdAt": _timestamp(job["created_at"]),
+        "updatedAt": _timestamp(job["updated_at"]),
+        "expiresAt": _timestamp(job["expires_at"]),
+        "result": job["result"],
+        "error": job["error"],
+    }
+
+
+@router.post("/", status_code=int(HTTPStatus.ACCEPTED), include_in_schema=False)
+@router.post(
+    "",
+    status_code=int(HTTPStatus.ACCEPTED),
+    responses={
+        int(HTTPStatus.ACCEPTED): {
+            "description": "Job accepted; poll GET /jobs/{job_id} for the result",
+            "content": {"application/json": {"example": {"jobId": "...", "status": "queued"}}},
+        }
+    },
+)
+async def submit_job(
+    request: Request,
+    file: UploadFile,
+    engine: ExtractionEngine = Form(..., description="Extraction engine to run"),
+    schema_json: str | None = Form(None, description="JSON schema string, required for marker_structured"),
+    strategy: UnstructuredStrategy | None = Form(
+        None, description="unstructured only: partition strategy replacing the per-file-type default"
+    ),
+    max_rows: int | None = Form(None, ge=0, description="unstructured only: data rows kept per CSV/Excel sheet"),
+    max_columns: int | None = Form(None, ge=0, description="unstructured only: columns kept per CSV/Excel sheet"),
+    image_mode: ImageMode | None = Form(
+        None, description="How extracted images appear in the markdown (none, reference, inline or thumbnail)"
+    ),
+    api_key: str | None = Header(None, alias="API_KEY", description="API key for endpoint authentication"),
+):
+    """
+    Queue an extraction and return its job id immediately.
+
+    Accepts the same inputs as the matching /extracts route. The result body,
+    once ready, is the same as that route's response.
+    """
+    await validate_endpoint_api_key(request, api_key=api_key)
+
+    filename = os.path.basename(file.filename or "")
+    if not filename or filename in {".", ".."}:
+        filename = "upload.pdf" if engine in {ExtractionEngine.MARKER, ExtractionEngine.MARKER_STRUCTURED} else "upload"
+    content_type = file.content_type or ""
+    is_pdf_upload = filename.lower().endswith(".pdf") or content_type.startswith("application/pdf")
+
+    options: dict[str, Any] = {}
+    if image_mode is not None:
+        options["imageMode"] = image_mode.value
+    if engine in {ExtractionEngine.MARKER, ExtractionEngine.MARKER_STRUCTURED}:
+        if not is_pdf_upload:
+            raise HTTPException(status_code=400, detail="Marker engines only support PDF uploads")
+    if engine == ExtractionEngine.MARKER_STRUCTURED:
+        if not schema_json:
+            raise HTTPException(status_code=400, detail="schema_json is required for marker_structured")
+        try:
+            schema = json.loads(schema_json)
+        except json.JSONDecodeError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid schema_json: {exc}") from exc
+        if not isinstance(schema, dict):
+            raise HTTPException(status_code=400, detail="schema_json must be a JSON object")
+        options["schema"] = schema
+    if engine == ExtractionEngine.MARKITDOWN:
+        options["isPdf"] = is_pdf_upload
+    if engine == ExtractionEngine.UNSTRUCTURED:
+        await unstructured_helper.validate_uploaded_file(file)
+        if strategy is not None:
+            options["strategy"] = strategy.value
+        if max_rows is not None:
+            options["maxRows"] = max_rows
+        if max_columns is not None:
+            options["maxColumns"] = max_columns
+
+    # marker_structured runs marker, so it shares marker's upload limit
+    limit_engine = "marker" if engine == ExtractionEngine.MARKER_STRUCTURED else engine.value
+    required_kind = "pdf" if engine in {ExtractionEngine.MARKER, ExtractionEngine.MARKER_STRUCTURED} else None
+
+    store = get_job_store()
+    job_id = store.new_job_id()
+    job_dir = store.job_dir(job_id)
+    try:
+        job_dir.mkdir(parents=True, exist_ok=False)
+        input_path = job_dir / filename
+        upload = await save_upload(file, input_path, engine=limit_engine, required_kind=required_kind)
+        store.create(
+            job_id,
+            engine=engine.value,
+            options=options,
+            file_name=filename,
+            file_size=upload.size,
+            content_type=file.content_type,
+            input_path=str(input_path),
+        )
+    except HTTPException:
+        # Oversized or mismatched upload
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+    except Exception as exc:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        logger.error("[%s] Failed to queue job: %s", job_id, exc, exc_info=True)
+        raise HTTPException(status_code=500, detail="Unable to queue job") from exc
+
+    get_job_workers().notify()
+    logger.info("[%s] Queued %s job for %s", job_id, engine.value, filename)
+    return {"jobId": job_id, "engine": engine.value, "status": "queued"}
+
+
+@router.get(
+    "/{job_id}",
+    status_code=int(HTTPStatus.OK),
+    responses={
+        int(HTTPStatus.OK): {"description": "Job status, plus the result once it has succeeded"},
+        int(HTTPStatus.NOT_FOUND): {"description": "Unknown or expired job"},
+    },
+)
+async def get_job(
+    request: Request,
+    job_id: str,
+    api_key: str | None = Header(None, alias="API_KEY", description="API key for endpoint authentication"),
+):
+    """Return a job's status (queued, running, succeeded, failed) and, when finished, its result or error."""
+    await validate_endpoint_api_key(request, api_key=api_key)
+
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=int(HTTPStatus.NOT_FOUND), detail="Job not found")
+    return _job_response(job)
@@ -5,13 +5,23 @@ from http import HTTPStatus
 from typing import Any
 from uuid import uuid4
 
-from fastapi import APIRouter, Form, Header, HTTPException, Request, UploadFile
+from fastapi import APIRouter, Form, Header, HTTPException, Query, Request, UploadFile
 
 from extraction.helper.common import logging as logutil
 from extraction.helper.common.auth import validate_endpoint_api_key
+from extraction.helper.common.cache import cached_extraction, make_cache_key
+from extraction.helper.common.imagestore import default_image_mode, image_output_options
+from extraction.helper.common.executor import run_in_engine
 from extraction.helper.common.markdown import sanitize_markdown_output
-from extraction.helper.marker.markerHelper import convert_pdf_to_markdown, extract_structured_json
-from extraction.helper.schemas.types import TextExtraction
+from extraction.helper.common.pdfrouting import routing_enabled, routing_thresholds
+from extraction.helper.common.uploads import save_upload
+from extraction.helper.marker.markerHelper import (
+    convert_pdf_to_markdown,
+    convert_pdf_to_markdown_with_routing,
+    extract_structured_markdown_and_json,
+    structured_llm_fingerprint,
+)
+from extraction.helper.schemas.types import ImageMode, TextExtraction
 import json
 
 
@@ -42,17 +52,23 @@ logger = logutil.get_logger("marker-endpoint")
 async def convert_markdown_with_marker(
     request: Request,
     file: UploadFile,
+    fast_path: bool | None = Query(
+        None,
+        description="Read text-layer pages with pypdf and run marker's models only on scanned or image-heavy "
+        "pages. Defaults to PDF_FAST_PATH_ROUTING.",
+    ),
+    image_mode: ImageMode | None = Query(
+        None,
+        description="How extracted images appear in the markdown: none (not extracted at all), reference "
+        "(/images/{id} links), inline (data URIs) or thumbnail (downscaled data URIs). Defaults to IMAGE_MODE.",
+    ),
     api_key: str | None = Header(None, alias="API_KEY", description="API key for endpoint authentication"),
 ):
     await validate_endpoint_api_key(request, api_key=api_key)
 
     request_id = str(uuid4())
+    # Only created if the upload is too large to keep in memory
     folder_path = f"/tmp/{request_id}"
-    try:
-        os.makedirs(folder_path, exist_ok=True)
-    except OSError as exc:
-        logger.error("Failed to create temp directory in /tmp: %s", exc)
-        raise HTTPException(status_code=500, detail="Unable to create temporary storage") from exc
 
     try:
         filename = file.filename or f"upload_{request_id}.pdf"
@@ -61,30 +77,53 @@ async def convert_markdown_with_marker(
             filename = f"upload_{request_id}.pdf"
         file_path = f"{folder_path}/{filename}"
 
-        with open(file_path, "wb") as f_out:
-            shutil.copyfileobj(file.file, f_out)
-
         lower_name = filename.lower()
         content_type = request.headers.get("content-type", "")
         is_pdf_upload = lower_name.endswith(".pdf") or content_type.startswith("application/pdf")
         if not is_pdf_upload:
             raise HTTPException(status_code=400, detail="Marker endpoint only supports PDF uploads")
 
-        marker_output_dir = os.path.join(folder_path, "marker_output")
-        text = convert_pdf_to_markdown(
-            input_pdf=file_path,
-            output_dir=marker_output_dir,
-            include_images=True,
-        )
-        text = sanitize_markdown_output(text or "")
+        use_routing = routing_enabled(fast_path)
+        image_mode = image_mode or default_image_mode()
+        include_images = image_mode != ImageMode.NONE
+        options: dict[str, Any] = {"include_images": include_images, "images": image_output_options(image_mode)}
+        if use_routing:
+            options["routing"] = routing_thresholds()
+        # Rejects non-PDF content and oversized files on the first chunk past the limit
+        upload = await save_upload(file, file_path, engine="marker", required_kind="pdf", keep_in_memory=True)
+        cache_key = make_cache_key(upload.sha256, "marker", options)
+
+        async def convert(source: bytes | str) -> dict[str, Any]:
+            page_routes = None
+            if use_routing:
+                text, page_routes = await run_in_engine(
+                    "marker",
+                    convert_pdf_to_markdown_with_routing,
+                    input_pdf=source,
+                    include_images=include_images,
+                    image_mode=image_mode,
+                )
+            else:
+                text = await run_in_engine(
+                    "marker",
+                    convert_pdf_to_markdown,
+                    input_pdf=source,
+                    include_images=include_images,
+                    image_mode=image_mode,
+                )
+            return {"markdown": sanitize_markdown_output(text or ""), "pageRoutes": page_routes}
+
+        result, cache_hit = await cached_extraction(cache_key, convert, upload.source)
 
         metadata: dict[str, Any] = {
             "fileName": file.filename,
-            "fileSize": str(file.size),
+            "fileSize": str(upload.size),
             "creationDate": datetime.datetime.now(tz=datetime.timezone.utc),
+            "cacheHit": cache_hit,
+            "pageRoutes": result.get("pageRoutes"),
         }
         return {
-            "markdown": text,
+            "markdown": result["markdown"],
             "metadata": metadata,
         }
 
@@ -114,17 +153,18 @@ async def extract_structured_with_marker(
     request: Request,
     file: UploadFile,
     schema_json: str = Form(..., description="JSON schema string for marker structured extraction"),
+    image_mode: ImageMode | None = Query(
+        None,
+        description="How extracted images appear in the markdown: none (not extracted at all), reference "
+        "(/images/{id} links), inline (data URIs) or thumbnail (downscaled data URIs). Defaults to IMAGE_MODE.",
+    ),
     api_key: str | None = Header(None, alias="API_KEY", description="API key for endpoint authentication"),
 ):
     await validate_endpoint_api_key(request, api_key=api_key)
 
     request_id = str(uuid4())
+    # Only created if the upload is too large to keep in memory
     folder_path = f"/tmp/{request_id}"
-    try:
-        os.makedirs(folder_path, exist_ok=True)
-    except OSError as exc:
-        logger.error("Failed to create temp directory in /tmp: %s", exc)
-        raise HTTPException(status_code=500, detail="Unable to create temporary storage") from exc
 
     try:
         try:
@@ -140,37 +180,52 @@ async def extract_structured_with_marker(
             filename = f"upload_{request_id}.pdf"
         file_path = f"{folder_path}/{filename}"
 
-        with open(file_path, "wb") as f_out:
-            shutil.copyfileobj(file.file, f_out)
-
         lower_name = filename.lower()
         content_type = request.headers.get("content-type", "")
         is_pdf_upload = lower_name.endswith(".pdf") or content_type.startswith("application/pdf")
         if not is_pdf_upload:
             raise HTTPException(status_code=400, detail="Marker structured endpoint only supports PDF uploads")
 
-        markdown = sanitize_markdown_output(
-            convert_pdf_to_markdown(
-                input_pdf=file_path,
-                include_images=True,
-            )
-            or ""
-        )
-        analysis, document_json = extract_structured_json(
-            input_pdf=file_path,
-            schema=schema,
-            existing_markdown=markdown,
+        upload = await save_upload(file, file_path, engine="marker", required_kind="pdf", keep_in_memory=True)
+        image_mode = image_mode or default_image_mode()
+        include_images = image_mode != ImageMode.NONE
+        cache_key = make_cache_key(
+            upload.sha256,
+            "marker-structured",
+            {
+                "schema": schema,
+                "include_images": include_images,
+                "images": image_output_options(image_mode),
+                "llm": structured_llm_fingerprint(),
+            },
         )
 
+        async def extract(source: bytes | str) -> dict[str, Any]:
+            # One marker pass feeds both the markdown response and the LLM extraction stage.
+            markdown, analysis, document_json = await run_in_engine(
+                "marker",
+                extract_structured_markdown_and_json,
+                input_pdf=source,
+                schema=schema,
+                include_images=include_images,
+                image_mode=image_mode,
+            )
+            return {
+                "markdown": sanitize_markdown_output(markdown or ""),
+                "structured": json.loads(document_json),
+                "analysis": analysis,
+            }
+
+        result, cache_hit = await cached_extraction(cache_key, extract, upload.source)
+
         metadata: dict[str, Any] = {
             "fileName": file.filename,
-            "fileSize": str(file.size),
+            "fileSize": str(upload.size),
             "creationDate": datetime.datetime.now(tz=datetime.timezone.utc),
+            "cacheHit": cache_hit,
         }
         return {
-            "markdown": markdown,
-            "structured": json.loads(document_json),
-            "analysis": analysis,
+            **result,
             "metadata": metadata,
         }
 
@@ -1,14 +1,24 @@
 import os 
 import shutil
 import datetime
+import json
 from extraction.helper.common import logging as logutil 
 from extraction.helper.common.auth import validate_endpoint_api_key
 from fastapi import UploadFile, Header, HTTPException, Request, Query, APIRouter
+from fastapi.responses import StreamingResponse
 from http import HTTPStatus
-from extraction.helper.schemas.types import TextExtraction, ModelProvider
+from extraction.helper.schemas.types import ImageMode, TextExtraction, ModelProvider
 from extraction.helper.common.markdown import sanitize_markdown_output
+from extraction.helper.common.executor import run_in_engine, stream_in_engine
+from extraction.helper.common.cache import cached_extraction, make_cache_key
+from extraction.helper.common.imagestore import default_image_mode
+from extraction.helper.common.uploads import save_request_body, save_upload
+from extraction.helper.markitdown.markitdownHelper import (
+    conversion_fingerprint,
+    convert_file_to_markdown,
+    iter_pdf_markdown_pages,
+)
 from uuid import uuid4
-from markitdown import MarkItDown
 from typing import Any
 
 
@@ -25,7 +35,11 @@ logger = logutil.get_logger("markitdown-endpoint")
                  int(HTTPStatus.OK):{
                 "description": "Succesfuly extracted text",
                 "content": {
-                    "application/json": {"example": []}
+                    "application/json": {"example": []},
+                    "application/x-ndjson": {
+                        "example": '{"type": "page", "page": 1, "markdown": "..."}\n'
+                                   '{"type": "metadata", "metadata": {"fileName": "...", "pageCount": 1}}\n'
+                    },
                 },
                 "model": TextExtraction
                 }
@@ -33,24 +47,26 @@ logger = logutil.get_logger("markitdown-endpoint")
             )
 async def convert_markdown(
     request: Request,
-    file: UploadFile,
+    file: UploadFile | None = None,
     api_key: str | None = Header(None, alias="API_KEY", description="API key for endpoint authentication"),
     enrich_pdf: bool = Query(False, description="Deprecated. Ignored in MarkItDown endpoint."),
     model_provider: ModelProvider = Query(ModelProvider.AWS_BEDROCK, description="Deprecated. Ignored in MarkItDown endpoint."),
+    stream: bool = Query(False, description="PDF only. Stream one NDJSON record per page as soon as it is converted."),
+    image_mode: ImageMode | None = Query(
+        None,
+        description="PDF only. How embedded images appear in the markdown: none (not extracted at all), reference "
+        "(/images/{id} links), inline (data URIs) or thumbnail (downscaled data URIs). Defaults to IMAGE_MODE.",
+    ),
 ):
     # Validate endpoint API key at router layer, independent of extraction engine.
     await validate_endpoint_api_key(request, api_key=api_key)
 
-    # Prepare temp folder
+    # Temp folder, only created if the upload is too large to keep in memory
     hash = uuid4()
     folder_path = f"/tmp/{hash}"
-    try:
-        os.makedirs(folder_path, exist_ok=True)
-    except OSError as e:
-        logger.error("Failed to create temp directory in /tmp: %s", e)
-        raise HTTPException(status_code=500,
-                            detail="Unable to create temporary storage")
 
+    # A streaming response takes over the temp folder and removes it once the stream ends
+    cleanup_folder = True
     try:
         if file is not None:
             # Standard multipart/form-data upload 
@@ -61,8 +77,7 @@ async def convert_markdown(
             if not filename or filename == "." or filename == "..":
                 filename = f"upload_{hash}"
             file_path = f"{folder_path}/{filename}"
-            with open(file_path, "wb") as f_out:
-                shutil.copyfileobj(file.file, f_out)
+            upload = await save_upload(file, file_path, engine="markitdown", keep_in_memory=True)
         else:
             # Raw binary upload 
             # Try to get filename from headers, otherwise use a default
@@ -72,9 +87,16 @@ async def convert_markdown(
             if not filename or filename == "." or filename == "..":
                 filename = f"upload_{hash}"
             file_path = f"{folder_path}/{filename}"
-            body = await request.body()
-            with open(file_path, "wb") as f_out:
-                f_out.write(body)
+            # Streamed to disk as it arrives rather than buffered in memory
+            declared_pdf = request.headers.get("content-type", "").startswith("application/pdf")
+            upload = await save_request_body(
+                request,
+                file_path,
+                filename=filename,
+                engine="markitdown",
+                required_kind="pdf" if declared_pdf else None,
+                keep_in_memory=True,
+            )
 
         # If enrichment requested and input is a PDF, run enriched pipeline
         lower_name = os.path.basename(file_path).lower()
@@ -88,87 +110,104 @@ async def convert_markdown(
         else:
             logger.info("model_provider is deprecated and ignored by MarkItDown endpoint")
 
-        from extraction.helper.markitdown.PdfToMarkdown import PDFToMarkdown
-        pdfToMarkdownHelper = PDFToMarkdown()
-
         if enrich_pdf:
             logger.info("[%s] enrich_pdf is deprecated and ignored in MarkItDown endpoint", request_id)
 
-        docintel_endpoint = os.getenv("AZURE_DOC_INTEL_ENDPOINT") or os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
-        docintel_key = os.getenv("AZURE_DOC_INTEL_KEY") or os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
-        docintel_api_version = os.getenv("AZURE_DOC_INTEL_API_VERSION")
-        use_docintel = is_pdf_upload and bool(docintel_endpoint and docintel_key)
+        image_mode = image_mode or default_image_mode()
 
-        try:
-            if use_docintel:
-                from azure.core.credentials import AzureKeyCredential
-
-                md_kwargs: dict[str, Any] = {
-                    "docintel_endpoint": docintel_endpoint,
-                    "docintel_credential": AzureKeyCredential(docintel_key),
-                    "keep_data_uris": True,
-                }
-                if docintel_api_version:
-                    md_kwargs["docintel_api_version"] = docintel_api_version
-
-                md_instance = MarkItDown(**md_kwargs)
-                result = md_instance.convert(file_path)
-                text = result.text_content
-                logger.info("[%s] Converted with Azure Document Intelligence mode", request_id)
-            else:
-                if is_pdf_upload:
-                    logger.info("[%s] Azure Document Intelligence credentials not set; using standard MarkItDown path", request_id)
-                md_instance = MarkItDown()
-                result = md_instance.convert(file_path)
-                text = result.text_content
-                if is_pdf_upload:
-                    image_markdown = pdfToMarkdownHelper.extract_pdf_images_markdown(
-                        file_path,
-                        request_id=request_id,
-                    )
-                    if image_markdown:
-                        text = f"{(text or '').strip()}\n\n---\n\n## Extracted Images\n\n{image_markdown}".strip()
-        except Exception as exc:
-            if is_pdf_upload:
-                logger.warning(
-                    "[%s] MarkItDown conversion failed; using local PDF fallback: %s",
-                    request_id,
-                    exc,
-                )
-                text = pdfToMarkdownHelper.convert_pdf_to_markdown_local(
-                    file_path,
+        if stream:
+            if not is_pdf_upload:
+                raise HTTPException(status_code=400, detail="Streaming is only supported for PDF uploads")
+            # Pages are produced on the markitdown engine pool; a full queue raises 503 here
+            pages = stream_in_engine(
+                "markitdown", iter_pdf_markdown_pages, upload.source, request_id=request_id, image_mode=image_mode
+            )
+            response = StreamingResponse(
+                _ndjson_pages(
+                    pages,
+                    folder_path=folder_path,
+                    file_name=filename,
+                    file_size=upload.size,
                     request_id=request_id,
-                    include_images=True,
-                    include_page_text=True,
-                )
-            else:
-                raise
+                ),
+                media_type="application/x-ndjson",
+            )
+            cleanup_folder = False
+            return response
+
+        cache_key = make_cache_key(
+            upload.sha256,
+            "markitdown",
+            {
+                "extension": os.path.splitext(lower_name)[1],
+                **conversion_fingerprint(is_pdf_upload=is_pdf_upload, image_mode=image_mode),
+            },
+        )
+
+        async def convert(source: bytes | str) -> dict[str, Any]:
+            # MarkItDown/pypdf conversion is blocking; run it on the markitdown engine pool.
+            text = await run_in_engine(
+                "markitdown",
+                convert_file_to_markdown,
+                source,
+                is_pdf_upload=is_pdf_upload,
+                request_id=request_id,
+                file_name=filename,
+                image_mode=image_mode,
+            )
+            if is_pdf_upload:
+                text = sanitize_markdown_output(text or "")
+            return {"markdown": text}
 
-        if is_pdf_upload:
-            text = sanitize_markdown_output(text or "")
+        result, cache_hit = await cached_extraction(cache_key, convert, upload.source)
 
         # Generating metadata
         metadata: dict[str, Any] = {
-            "fileName": file.filename, 
-            "fileSize": str(file.size),
+            "fileName": filename,
+            "fileSize": str(upload.size),
             "creationDate": datetime.datetime.now(
                 tz=datetime.timezone.utc
-            )
+            ),
+            "cacheHit": cache_hit,
         }
 
         return {
-            "markdown": text, 
+            "markdown": result["markdown"], 
             "metadata": metadata
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("[Error] Unexpected failure: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        if os.path.exists(folder_path):
+        if cleanup_folder and os.path.exists(folder_path):
             shutil.rmtree(folder_path)
 
-   
 
-    
-    
+async def _ndjson_pages(pages, *, folder_path: str, file_name: str, file_size: int, request_id: str):
+    """
+    Serialize streamed pages as NDJSON: one {"type": "page"} record per page,
+    then a final {"type": "metadata"} record, or {"type": "error"} if conversion
+    fails part-way (the 200 status has already been sent by then).
+    """
+    page_count = 0
+    try:
+        async for page_num, markdown in pages:
+            page_count += 1
+            yield json.dumps({"type": "page", "page": page_num, "markdown": markdown}, ensure_ascii=False) + "\n"
+
+        metadata: dict[str, Any] = {
+            "fileName": file_name,
+            "fileSize": str(file_size),
+            "creationDate": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+            "pageCount": page_count,
+        }
+        yield json.dumps({"type": "metadata", "metadata": metadata}) + "\n"
+    except Exception as e:
+        logger.error("[%s] Streaming conversion failed after %d pages: %s", request_id, page_count, e, exc_info=True)
+        yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+    finally:
+        await pages.aclose()
+        shutil.rmtree(folder_path, ignore_errors=True)
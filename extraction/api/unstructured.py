@@ -1,17 +1,26 @@
 import datetime
+import io
+from pathlib import Path
 
-from unstructured.partition.auto import partition 
-
-from fastapi import UploadFile, HTTPException, APIRouter, Header, Request
+from fastapi import UploadFile, HTTPException, APIRouter, Header, Query, Request
 
 from http import HTTPStatus
 
 from extraction.helper.unstructured.unstructuredHelper import UnstructuredHelper
-from extraction.helper.schemas.types import TextExtraction
+from extraction.helper.unstructured.spreadsheetHelper import convert_spreadsheet_to_markdown, native_spreadsheet_limits
+from extraction.helper.schemas.types import ImageMode, TextExtraction, UnstructuredStrategy
+from extraction.helper.common import logging as logutil
 from extraction.helper.common.auth import validate_endpoint_api_key
+from extraction.helper.common.cache import cached_extraction, make_cache_key
+from extraction.helper.common.imagestore import default_image_mode, image_output_options
+from extraction.helper.common.executor import get_engine_executor
+from extraction.helper.common.pdfrouting import routing_enabled, routing_thresholds
+from extraction.helper.common.uploads import check_upload
 
 from typing import Any
 
+logger = logutil.get_logger("unstructured-endpoint")
+
 router = APIRouter()
 
 helper_function = UnstructuredHelper()
@@ -36,6 +45,29 @@ helper_function = UnstructuredHelper()
 async def extract_text_document(
     request: Request,
     file: UploadFile,
+    fast_path: bool | None = Query(
+        None,
+        description="PDFs only: partition text-layer pages with the fast strategy and OCR only scanned or "
+        "image-heavy pages. Defaults to PDF_FAST_PATH_ROUTING.",
+    ),
+    strategy: UnstructuredStrategy | None = Query(
+        None,
+        description="Partition strategy for this request, replacing the per-file-type default. "
+        "Turns off PDF page routing.",
+    ),
+    max_rows: int | None = Query(
+        None, ge=0, description="CSV/Excel only: data rows kept per sheet, 0 for all. Defaults to SPREADSHEET_MAX_ROWS."
+    ),
+    max_columns: int | None = Query(
+        None,
+        ge=0,
+        description="CSV/Excel only: columns kept per sheet, 0 for all. Defaults to SPREADSHEET_MAX_COLUMNS.",
+    ),
+    image_mode: ImageMode | None = Query(
+        None,
+        description="How extracted images appear in the markdown: none (not extracted at all), reference "
+        "(/images/{id} links), inline (data URIs) or thumbnail (downscaled data URIs). Defaults to IMAGE_MODE.",
+    ),
     api_key: str | None = Header(None, alias="API_KEY", description="API key for endpoint authentication"),
 ):
     """
@@ -43,6 +75,11 @@ async def extract_text_document(
 
     Args:
         file (UploadFile): The uploaded file to extact text from
+        fast_path (bool | None): Route PDF pages between the fast and hi_res strategies
+        strategy (UnstructuredStrategy | None): Partition strategy overriding the file type's default
+        max_rows (int | None): Row cap per sheet for CSV and Excel files
+        max_columns (int | None): Column cap per sheet for CSV and Excel files
+        image_mode (ImageMode | None): How extracted images are written into the Markdown
 
     Returns:
         TextExtraction: The extracted text, metadata and token count for the uploaded file
@@ -58,52 +95,102 @@ async def extract_text_document(
     # 2. Oversized file 
     await helper_function.validate_uploaded_file(file)
 
+    # 3. Content that does not match its extension; hashed for the cache key in the same pass
+    upload = await check_upload(file, engine="unstructured")
+
     try:
         # retrieve parsing configuration based on file's extension
-        parsing_config = await helper_function.get_parsing_config(file.filename)
-        
-        # Extract text with OCR 
-        elements = partition(
-            file=file.file,
-            metadata_filename=file.filename,
-            content_type=file.content_type,
-            skip_infer_table_types=[],
-            **parsing_config
+        image_mode = image_mode or default_image_mode()
+        include_images = image_mode != ImageMode.NONE
+        parsing_config = await helper_function.get_parsing_config(
+            file.filename, strategy, include_images=include_images
         )
 
-        print(elements)
-
-        if elements is None:
-            raise HTTPException(
-                status_code=int(HTTPStatus.UNPROCESSABLE_ENTITY),
-                detail="Errors when extracting text"
-            )
-
-        # Convert extracted text to Markdown to facilitate LLM readability 
-        markdown: str = "\n".join(
-            [
-                helper_function.convert_unstructured_element_to_markdown(i, include_images=True)
-                for i in elements
-            ]
+        # An explicit strategy applies to every page, so there is nothing to route
+        use_routing = (
+            strategy is None and Path(file.filename).suffix.lower() == ".pdf" and routing_enabled(fast_path)
         )
+        options: dict[str, Any] = {
+            "extension": Path(file.filename).suffix,
+            "parsing_config": parsing_config,
+            "include_images": include_images,
+            "images": image_output_options(image_mode),
+        }
+        if use_routing:
+            options["routing"] = routing_thresholds()
+        # CSV and Excel rows are written straight to markdown tables instead of going through partition and HTML
+        limits = native_spreadsheet_limits(file.filename, max_rows, max_columns)
+        if limits is not None:
+            options = {"extension": Path(file.filename).suffix, "spreadsheet": limits}
+        cache_key = make_cache_key(upload.sha256, "unstructured", options)
+
+        async def extract(data: bytes) -> dict[str, Any]:
+            # Extract text with OCR on the unstructured engine pool so the event
+            # loop keeps serving other requests while layout inference runs.
+            # The upload's bytes belong to the shared run, not to this request's UploadFile.
+            executor = get_engine_executor("unstructured")
+            source = io.BytesIO(data)
+            page_routes = None
+            if limits is not None:
+                markdown = await executor.run(
+                    convert_spreadsheet_to_markdown,
+                    source,
+                    filename=file.filename,
+                    max_rows=limits["maxRows"],
+                    max_columns=limits["maxColumns"],
+                )
+            elif use_routing:
+                markdown, page_routes = await executor.run(
+                    helper_function.partition_pdf_with_routing,
+                    source,
+                    filename=file.filename,
+                    content_type=file.content_type,
+                    parsing_config=parsing_config,
+                    include_images=include_images,
+                    image_mode=image_mode,
+                )
+            else:
+                markdown = await executor.run(
+                    helper_function.partition_to_markdown,
+                    source,
+                    filename=file.filename,
+                    content_type=file.content_type,
+                    parsing_config=parsing_config,
+                    include_images=include_images,
+                    image_mode=image_mode,
+                )
+
+            if markdown is None:
+                raise HTTPException(
+                    status_code=int(HTTPStatus.UNPROCESSABLE_ENTITY),
+                    detail="Errors when extracting text"
+                )
+            return {"markdown": markdown, "pageRoutes": page_routes}
+
+        result, cache_hit = await cached_extraction(cache_key, extract, file)
 
         # Generating metadata 
         metadata: dict[str, Any] = {
             "fileName": file.filename,
-            "fileSize": str(file.size),
+            "fileSize": str(upload.size),
             "creationDate": datetime.datetime.now(
                 tz=datetime.timezone.utc
-            )
+            ),
+            "cacheHit": cache_hit,
+            "pageRoutes": result.get("pageRoutes"),
         }
 
-    except Exception as e:
-        print(e)
+    except HTTPException:
+        # Includes 503 from a full engine queue, which clients should retry
+        raise
+    except Exception as exc:
+        logger.error("[Error] Unstructured extraction failed: %s", exc, exc_info=True)
         raise HTTPException(
             status_code=int(HTTPStatus.UNPROCESSABLE_ENTITY),
             detail="Errors when extracting text"
         )
 
     return {
-            "markdown": markdown,
+            "markdown": result["markdown"],
             "metadata": metadata
         }
\ No newline at end of file
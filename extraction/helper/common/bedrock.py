@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Coroutine, Optional, TypeVar
+from urllib.parse import quote
+
+import boto3
+import certifi
+import httpx
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.config import Config as BotocoreConfig
+from botocore.exceptions import ClientError
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.common.ratelimit import get_llm_scheduler
+from extraction.helper.schemas.types import ModelProvider
+
+logger = logutil.get_logger("bedrock")
+
+T = TypeVar("T")
+
+
+def _pool_size() -> int:
+    """
+    Connections per client: BEDROCK_MAX_POOL_CONNECTIONS, or enough for the
+    Bedrock scheduler's concurrency limit (botocore's default of 10 otherwise
+    caps parallel calls and logs "Connection pool is full").
+    """
+    value = os.getenv("BEDROCK_MAX_POOL_CONNECTIONS")
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            logger.warning("Ignoring invalid BEDROCK_MAX_POOL_CONNECTIONS: %r", value)
+    return max(10, get_llm_scheduler(ModelProvider.AWS_BEDROCK.value).max_concurrency)
+
+
+def _credentials_key(
+    aws_access_key_id: Optional[str],
+    aws_secret_access_key: Optional[str],
+    aws_session_token: Optional[str],
+) -> str:
+    # Hashed so secrets never sit in a dict key that might end up in a log or repr
+    raw = "\0".join(value or "" for value in (aws_access_key_id, aws_secret_access_key, aws_session_token))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _BedrockEndpoint:
+    session: boto3.session.Session
+    client: Any
+
+
+_ENDPOINTS: dict[tuple, _BedrockEndpoint] = {}
+_ENDPOINTS_LOCK = threading.Lock()
+
+
+def _get_endpoint(
+    *,
+    region: str,
+    aws_access_key_id: Optional[str],
+    aws_secret_access_key: Optional[str],
+    aws_session_token: Optional[str],
+    read_timeout: float,
+    connect_timeout: float,
+) -> _BedrockEndpoint:
+    key = (
+        region,
+        _credentials_key(aws_access_key_id, aws_secret_access_key, aws_session_token),
+        read_timeout,
+        connect_timeout,
+    )
+    with _ENDPOINTS_LOCK:
+        endpoint = _ENDPOINTS.get(key)
+        if endpoint is None:
+            # boto3 sessions are not thread-safe, so each cached client gets its own, created under the lock
+            session = boto3.session.Session(
+                aws_access_key_id=aws_access_key_id or None,
+                aws_secret_access_key=aws_secret_access_key or None,
+                aws_session_token=aws_session_token or None,
+                region_name=region,
+            )
+            client = session.client(
+                "bedrock-runtime",
+                verify=certifi.where(),
+                config=BotocoreConfig(
+                    connect_timeout=connect_timeout,
+                    read_timeout=read_timeout,
+                    max_pool_connections=_pool_size(),
+                    tcp_keepalive=True,
+                    # Throttling is retried by the shared LLM scheduler
+                    retries={"total_max_attempts": 1, "mode": "standard"},
+                ),
+            )
+            endpoint = _BedrockEndpoint(session=session, client=client)
+            _ENDPOINTS[key] = endpoint
+            logger.info("Created Bedrock runtime client for %s", region)
+        return endpoint
+
+
+def get_bedrock_client(
+    *,
+    region: str,
+    aws_access_key_id: Optional[str] = None,
+    aws_secret_access_key: Optional[str] = None,
+    aws_session_token: Optional[str] = None,
+    read_timeout: float = 60,
+    connect_timeout: float = 5,
+):
+    """
+    Process-wide boto3 ``bedrock-runtime`` client for a region and set of
+    credentials (the default credential chain when no keys are given).
+
+    Clients are thread-safe, so reusing one avoids repeating credential
+    resolution, endpoint setup and TLS handshakes on every call. Botocore
+    retries are disabled; throttling is retried by the LLM scheduler.
+    """
+    return _get_endpoint(
+        region=region,
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+        aws_session_token=aws_session_token,
+        read_timeout=read_timeout,
+        connect_timeout=connect_timeout,
+    ).client
+
+
+class AsyncBedrockInvoker:
+    """
+    InvokeModel over a pooled ``httpx.AsyncClient``, signed with botocore's
+    SigV4 using the credentials of the matching cached boto3 session.
+
+    Errors are raised as botocore ``ClientError`` with the same code and
+    status the boto3 client would report, so throttling detection works for
+    both paths. Must only be used on the Bedrock event loop (see
+    ``run_on_bedrock_loop``).
+    """
+
+    def __init__(self, endpoint: _BedrockEndpoint, *, read_timeout: float, connect_timeout: float):
+        self._session = endpoint.session
+        self._endpoint_url = endpoint.client.meta.endpoint_url
+        self._region = endpoint.client.meta.region_name
+        pool = _pool_size()
+        self._http = httpx.AsyncClient(
+            verify=certifi.where(),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+        )
+
+    async def invoke_model(self, model_id: str, body: dict[str, Any]) -> dict[str, Any]:
+        """Invoke ``model_id`` with a JSON body and return the decoded JSON response."""
+        credentials = self._session.get_credentials()
+        if credentials is None:
+            raise RuntimeError("No AWS credentials found for Bedrock")
+
+        url = f"{self._endpoint_url}/model/{quote(model_id, safe='')}/invoke"
+        data = json.dumps(body).encode("utf-8")
+        request = AWSRequest(
+            method="POST",
+            url=url,
+            data=data,
+            headers={"Content-Type": "application/json", "Accept": "application/json"},
+        )
+        SigV4Auth(credentials.get_frozen_credentials(), "bedrock", self._region).add_auth(request)
+
+        response = await self._http.post(url, content=data, headers=dict(request.headers.items()))
+        if response.status_code >= 400:
+            raise _client_error(response)
+        return response.json()
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+def _client_error(response: httpx.Response) -> ClientError:
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = {}
+    error_type = response.headers.get("x-amzn-errortype", "")
+    # The header looks like "ThrottlingException:http://internal.amazon.com/coral/..."
+    code = error_type.split(":", 1)[0] or str(response.status_code)
+    message = payload.get("message") or payload.get("Message") or response.text[:500]
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": message},
+            "ResponseMetadata": {
+                "HTTPStatusCode": response.status_code,
+                "HTTPHeaders": {name.lower(): value for name, value in response.headers.items()},
+            },
+        },
+        "InvokeModel",
+    )
+
+
+_INVOKERS: dict[tuple, AsyncBedrockInvoker] = {}
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_PID: Optional[int] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _bedrock_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP, _LOOP_PID
+    with _LOOP_LOCK:
+        # A forked engine worker inherits the variable but not the thread running the loop
+        if _LOOP is None or _LOOP_PID != os.getpid():
+            _LOOP = asyncio.new_event_loop()
+            _LOOP_PID = os.getpid()
+            _INVOKERS.clear()
+            threading.Thread(target=_LOOP.run_forever, name="bedrock-loop", daemon=True).start()
+        return _LOOP
+
+
+def get_async_bedrock_invoker(
+    *,
+    region: str,
+    aws_access_key_id: Optional[str] = None,
+    aws_secret_access_key: Optional[str] = None,
+    aws_session_token: Optional[str] = None,
+    read_timeout: float = 60,
+    connect_timeout: float = 5,
+) -> AsyncBedrockInvoker:
+    """
+    Process-wide async invoker for a region and set of credentials. Call it
+    from code running on the Bedrock event loop.
+    """
+    endpoint = _get_endpoint(
+        region=region,
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+        aws_session_token=aws_session_token,
+        read_timeout=read_timeout,
+        connect_timeout=connect_timeout,
+    )
+    key = (
+        region,
+        _credentials_key(aws_access_key_id, aws_secret_access_key, aws_session_token),
+        read_timeout,
+        connect_timeout,
+    )
+    # Only touched from the loop thread, so no lock is needed
+    invoker = _INVOKERS.get(key)
+    if invoker is None:
+        invoker = AsyncBedrockInvoker(endpoint, read_timeout=read_timeout, connect_timeout=connect_timeout)
+        _INVOKERS[key] = invoker
+    return invoker
+
+
+def submit_to_bedrock_loop(coro: Coroutine[Any, Any, T]) -> Future[T]:
+    """
+    Schedule ``coro`` on the process-wide Bedrock event loop, which owns the
+    pooled async HTTP clients. Many calls then share one thread and one
+    connection pool however many callers wait on them.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _bedrock_loop())
+
+
+def run_on_bedrock_loop(coro: Coroutine[Any, Any, T]) -> T:
+    """Run ``coro`` on the Bedrock event loop and block until it finishes."""
+    return submit_to_bedrock_loop(coro).result()
@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from fastapi import UploadFile
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.common.imagestore import refresh_linked_images
+
+logger = logutil.get_logger("result-cache")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class TieredCache:
+    """
+    Two-tier cache for JSON-serializable values.
+
+    Entries live in an in-memory LRU bounded by item count and approximate size,
+    backed by a disk tier (one JSON file per key) bounded by total bytes. Both
+    tiers expire entries after ``ttl_seconds``. Disk hits are promoted to memory.
+    Thread-safe, so it can be used from engine worker threads as well as routes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        memory_items: int = 128,
+        memory_max_bytes: int = 256 * 1024 * 1024,
+        directory: str | Path | None = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+        ttl_seconds: float = 86400,
+    ):
+        self.name = name
+        self.memory_items = max(0, memory_items)
+        self.memory_max_bytes = max(0, memory_max_bytes)
+        self.directory = Path(directory) if directory else None
+        self.disk_max_bytes = max(0, disk_max_bytes)
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stats = {"memoryHits": 0, "diskHits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    # ------------------------------------------------------------------ public
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, size, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memoryHits"] += 1
+                    return value
+                self._memory_pop(key)
+
+        value, size, expires_at = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["diskHits"] += 1
+            self._memory_put(key, value, size, expires_at)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        size = len(payload)
+        now = time.time()
+        with self._lock:
+            self._stats["writes"] += 1
+            self._memory_put(key, value, size, now + self.ttl_seconds)
+        self._disk_put(key, payload)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["memoryHits"] + self._stats["diskHits"] + self._stats["misses"]
+            hits = self._stats["memoryHits"] + self._stats["diskHits"]
+            return {
+                **self._stats,
+                "hitRate": round(hits / lookups, 4) if lookups else 0.0,
+                "memoryItems": len(self._memory),
+                "memoryBytes": self._memory_bytes,
+                "diskBytes": self._disk_bytes,
+            }
+
+    # ------------------------------------------------------------------ memory
+
+    def _memory_pop(self, key: str) -> None:
+        _, size, _ = self._memory.pop(key)
+        self._memory_bytes -= size
+
+    def _memory_put(self, key: str, value: Any, size: int, expires_at: float) -> None:
+        if not self.memory_items or size > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory_pop(key)
+        self._memory[key] = (expires_at, size, value)
+        self._memory_bytes += size
+        while self._memory and (
+            len(self._memory) > self.memory_items or self._memory_bytes > self.memory_max_bytes
+        ):
+            oldest = next(iter(self._memory))
+            self._memory_pop(oldest)
+            self._stats["evictions"] += 1
+
+    # -------------------------------------------------------------------- disk
+
+    def _path_for(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _disk_get(self, key: str, now: float) -> tuple[Optional[Any], int, float]:
+        """Return (value, size, expires_at) from the disk tier, or (None, 0, 0) on a miss."""
+        if self.directory is None or not self.disk_max_bytes:
+            return None, 0, 0.0
+        path = self._path_for(key)
+        try:
+            stat = path.stat()
+            expires_at = stat.st_mtime + self.ttl_seconds
+            if expires_at <= now:
+                self._disk_remove(path, stat.st_size)
+                return None, 0, 0.0
+            payload = path.read_text(encoding="utf-8")
+            return json.loads(payload), len(payload), expires_at
+        except FileNotFoundError:
+            return None, 0, 0.0
+        except (OSError, ValueError) as exc:
+            logger.warning("Dropping unreadable %s cache entry %s: %s", self.name, key, exc)
+            self._disk_remove(path, None)
+            return None, 0, 0.0
+
+    def _disk_put(self, key: str, payload: str) -> None:
+        if self.directory is None or not self.disk_max_bytes:
+            return
+        data = payload.encode("utf-8")
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._path_for(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            previous = path.stat().st_size if path.exists() else 0
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("Failed to write %s cache entry %s: %s", self.name, key, exc)
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += len(data) - previous
+            over_limit = self._disk_bytes > self.disk_max_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _disk_remove(self, path: Path, size: Optional[int]) -> None:
+        try:
+            if size is None:
+                size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+
+    def _scan_disk_bytes(self) -> int:
+        assert self.directory is not None
+        return sum(p.stat().st_size for p in self.directory.glob("*/*.json") if p.is_file())
+
+    def _evict_disk(self) -> None:
+        """Drop expired entries, then the oldest ones, until the disk tier is under 90% of its limit."""
+        assert self.directory is not None
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.disk_max_bytes * 0.9)
+        evicted = 0
+        for mtime, size, path in entries:
+            if total <= target and mtime + self.ttl_seconds > now:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+            self._stats["evictions"] += evicted
+        if evicted:
+            logger.info("Evicted %d %s cache entries from disk", evicted, self.name)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid integer for %s", name)
+        return default
+
+
+def _env_flag(name: str, default: bool = True) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+_RESULT_CACHE: Optional[TieredCache] = None
+_RESULT_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache() -> Optional[TieredCache]:
+    """Process-wide extraction result cache configured from RESULT_CACHE_* env vars, or None if disabled."""
+    global _RESULT_CACHE
+    if not _env_flag("RESULT_CACHE_ENABLED", True):
+        return None
+    with _RESULT_CACHE_LOCK:
+        if _RESULT_CACHE is None:
+            _RESULT_CACHE = TieredCache(
+                "result",
+                memory_items=_env_int("RESULT_CACHE_MEMORY_ITEMS", 128),
+                memory_max_bytes=_env_int("RESULT_CACHE_MEMORY_MAX_MB", 256) * 1024 * 1024,
+                directory=os.getenv("RESULT_CACHE_DIR", "/tmp/extraction-cache/results") or None,
+                disk_max_bytes=_env_int("RESULT_CACHE_DISK_MAX_MB", 1024) * 1024 * 1024,
+                ttl_seconds=_env_int("RESULT_CACHE_TTL_SECONDS", 86400),
+            )
+        return _RESULT_CACHE
+
+
+_DESCRIPTION_CACHE: Optional[TieredCache] = None
+
+
+def get_description_cache() -> Optional[TieredCache]:
+    """
+    Process-wide cache of LLM image descriptions configured from
+    IMAGE_DESCRIPTION_CACHE_* env vars, or None if disabled.
+
+    Entries are small and images (logos, form templates) recur across
+    documents for a long time, so the defaults keep more items for longer
+    than the result cache.
+    """
+    global _DESCRIPTION_CACHE
+    if not _env_flag("IMAGE_DESCRIPTION_CACHE_ENABLED", True):
+        return None
+    with _RESULT_CACHE_LOCK:
+        if _DESCRIPTION_CACHE is None:
+            _DESCRIPTION_CACHE = TieredCache(
+                "image-description",
+                memory_items=_env_int("IMAGE_DESCRIPTION_CACHE_MEMORY_ITEMS", 4096),
+                memory_max_bytes=_env_int("IMAGE_DESCRIPTION_CACHE_MEMORY_MAX_MB", 32) * 1024 * 1024,
+                directory=os.getenv("IMAGE_DESCRIPTION_CACHE_DIR", "/tmp/extraction-cache/descriptions") or None,
+                disk_max_bytes=_env_int("IMAGE_DESCRIPTION_CACHE_DISK_MAX_MB", 256) * 1024 * 1024,
+                ttl_seconds=_env_int("IMAGE_DESCRIPTION_CACHE_TTL_SECONDS", 30 * 86400),
+            )
+        return _DESCRIPTION_CACHE
+
+
+def cache_stats() -> dict[str, Optional[dict[str, Any]]]:
+    """Stats for the result and image-description caches (None for a disabled or unused cache)."""
+    return {
+        "result": _RESULT_CACHE.stats() if _RESULT_CACHE is not None else None,
+        "imageDescription": _DESCRIPTION_CACHE.stats() if _DESCRIPTION_CACHE is not None else None,
+    }
+
+
+async def hash_upload(file: UploadFile) -> str:
+    """SHA-256 of the uploaded bytes. The upload is rewound so it can be read again."""
+    digest = hashlib.sha256()
+    await file.seek(0)
+    while chunk := await file.read(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    await file.seek(0)
+    return digest.hexdigest()
+
+
+def hash_file(path: str | Path) -> str:
+    """SHA-256 of a file on disk."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while chunk := fh.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_sha256: str, engine: str, options: dict[str, Any]) -> str:
+    """Cache key for one extraction: content hash plus engine plus every option that changes the output."""
+    options_json = json.dumps(options, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(f"{engine}\0{content_sha256}\0{options_json}".encode("utf-8")).hexdigest()
+
+
+# What an extraction reads: upload bytes, a file path, or an upload still attached to its request
+ExtractionSource = Union[bytes, str, Path, UploadFile]
+
+_INFLIGHT: dict[str, asyncio.Future] = {}
+
+
+def _link_into(path: str, directory: str) -> str:
+    target = os.path.join(directory, os.path.basename(path))
+    try:
+        os.link(path, target)
+    except OSError:
+        # Different filesystem, or links not supported
+        shutil.copyfile(path, target)
+    return target
+
+
+async def _own_source(source: ExtractionSource) -> tuple[bytes | str, Optional[str]]:
+    """
+    A copy of ``source`` that a shared run owns, so it outlives the request
+    that started the run: bytes as they are, an UploadFile read into bytes,
+    and a file hard-linked (or copied) into a new temp dir.
+
+    Returns (source for compute, temp dir to remove once the run is done).
+    """
+    if isinstance(source, bytes):
+        return source, None
+    if isinstance(source, UploadFile):
+        await source.seek(0)
+        data = await source.read()
+        await source.seek(0)
+        return data, None
+    directory = tempfile.mkdtemp(prefix="extraction-inflight-")
+    try:
+        return await asyncio.to_thread(_link_into, str(source), directory), directory
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+
+async def _lookup_or_compute(
+    key: str,
+    compute: Callable[[], Awaitable[dict[str, Any]]],
+) -> tuple[dict[str, Any], bool]:
+    cache = get_result_cache()
+    if cache is None:
+        return await compute(), False
+
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        # Linked images live in the image store, which expires and evicts them on its own schedule
+        if await asyncio.to_thread(refresh_linked_images, cached):
+            return cached, True
+        logger.info("Cached result %s links to evicted images; extracting again", key[:12])
+
+    result = await compute()
+    await asyncio.to_thread(cache.set, key, result)
+    return result, False
+
+
+def _finish_inflight(key: str, directory: Optional[str], future: asyncio.Future) -> None:
+    if _INFLIGHT.get(key) is future:
+        del _INFLIGHT[key]
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+async def cached_extraction(
+    key: str,
+    compute: Callable[[bytes | str], Awaitable[dict[str, Any]]],
+    source: ExtractionSource,
+) -> tuple[dict[str, Any], bool]:
+    """
+    Return (result, cache_hit) for an extraction, running ``compute(source)``
+    on a miss.
+
+    Concurrent calls with the same key are coalesced: the first one runs the
+    lookup and ``compute``, later ones attach to it and share its result (or
+    exception), so a burst of identical uploads costs one engine run. The shared
+    run is shielded, so one caller going away does not cancel it for the others.
+    Only successful results are stored.
+
+    The shared run gets its own copy of ``source`` (see _own_source), removed
+    when it finishes, because the caller that started it may clean up its
+    upload at any time. ``compute`` must read its input only from the argument
+    it is given, never from the caller's request, upload or temp folder.
+    """
+    inflight = _INFLIGHT.get(key)
+    if inflight is None:
+        owned, directory = await _own_source(source)
+        # Another caller may have started the same extraction while the input was copied
+        inflight = _INFLIGHT.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(_lookup_or_compute(key, lambda: compute(owned)))
+            _INFLIGHT[key] = inflight
+            inflight.add_done_callback(lambda future: _finish_inflight(key, directory, future))
+            return await asyncio.shield(inflight)
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+    logger.info("Attaching to in-flight extraction %s", key[:12])
+    return await asyncio.shield(inflight)
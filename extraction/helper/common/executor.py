@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import gc
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from extraction.helper.common import logging as logutil
+
+logger = logutil.get_logger("engine-executor")
+
+T = TypeVar("T")
+
+# Per-engine defaults. Each value can be overridden with environment variables
+# named <ENGINE>_EXECUTOR_MODE, <ENGINE>_MAX_WORKERS and <ENGINE>_MAX_QUEUE,
+# e.g. MARKER_EXECUTOR_MODE=fork or UNSTRUCTURED_MAX_WORKERS=4.
+ENGINE_DEFAULTS: dict[str, dict[str, Any]] = {
+    "marker": {"mode": "thread", "max_workers": 1, "max_queue": 8},
+    "markitdown": {"mode": "thread", "max_workers": 4, "max_queue": 16},
+    "unstructured": {"mode": "thread", "max_workers": 2, "max_queue": 8},
+}
+
+VALID_MODES = {"thread", "process", "fork"}
+
+_STREAM_END = object()
+
+
+class EngineExecutor:
+    """
+    Bounded executor for a single extraction engine.
+
+    Blocking engine calls are submitted to a dedicated thread or process pool so
+    the event loop keeps serving other requests. At most ``max_workers`` jobs run
+    at once and at most ``max_queue`` more may wait; anything beyond that is
+    rejected with 503 instead of piling up in memory.
+    """
+
+    def __init__(self, name: str, *, mode: str = "thread", max_workers: int = 1, max_queue: int = 0):
+        if mode not in VALID_MODES:
+            raise ValueError(f"Invalid executor mode for {name}: {mode!r}. Use one of: {sorted(VALID_MODES)}")
+        self.name = name
+        self.mode = mode
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of running plus queued jobs."""
+        return self.max_workers + self.max_queue
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs currently running or waiting for a worker."""
+        return self._pending
+
+    def _get_executor(self, *, allow_fork: bool = False) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                elif self.mode == "fork":
+                    if allow_fork or threading.active_count() == 1:
+                        # Everything allocated so far (preloaded model weights above all) goes to the
+                        # permanent generation, so the collector never writes to those pages and the
+                        # children keep sharing them copy-on-write.
+                        gc.collect()
+                        gc.freeze()
+                        context = multiprocessing.get_context("fork")
+                    else:
+                        # Another thread may hold the import, logging or allocator lock, and a forked
+                        # child would inherit it held forever
+                        logger.warning(
+                            "Starting %s workers with spawn instead of fork: %d threads are running, "
+                            "so the workers load their own models",
+                            self.name,
+                            threading.active_count(),
+                        )
+                        context = multiprocessing.get_context("spawn")
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=context,
+                        initializer=_init_forked_worker,
+                        initargs=(self.max_workers,),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"{self.name}-worker",
+                    )
+                logger.info(
+                    "Started %s executor for %s (workers=%d, queue=%d)",
+                    self.mode,
+                    self.name,
+                    self.max_workers,
+                    self.max_queue,
+                )
+            return self._executor
+
+    def start(self) -> None:
+        """
+        Create the pool now. In fork mode this forks every worker, so call it
+        once the engine's models are loaded for the workers to share them, and
+        only while no other thread is running (see warmup). A fork pool first
+        created by a request instead starts its workers with spawn if other
+        threads are running.
+        """
+        executor = self._get_executor(allow_fork=True)
+        if isinstance(executor, ProcessPoolExecutor):
+            # Fork-context pools start all their workers on the first submission
+            executor.submit(os.getpid).result()
+
+    def worker_pids(self) -> list[int]:
+        """PIDs of this engine's worker processes (empty in thread mode or before the pool starts)."""
+        executor = self._executor
+        if not isinstance(executor, ProcessPoolExecutor):
+            return []
+        return list(getattr(executor, "_processes", None) or {})
+
+    def _acquire_slot(self) -> None:
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise HTTPException(
+                    status_code=int(HTTPStatus.SERVICE_UNAVAILABLE),
+                    detail=f"The {self.name} engine is busy. Please retry later.",
+                )
+            self._pending += 1
+
+    def _release_slot(self, _future: Future | None = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future:
+        """
+        Submit a job to the engine pool.
+
+        Raises HTTPException(503) when the engine's queue is full. The slot is
+        released when the job finishes, even if the caller stopped waiting.
+        """
+        self._acquire_slot()
+        try:
+            future = self._get_executor().submit(func, *args, **kwargs)
+        except BaseException:
+            self._release_slot()
+            raise
+        future.add_done_callback(self._release_slot)
+        return future
+
+    async def run(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        """Run ``func(*args, **kwargs)`` on the engine pool and await its result."""
+        future = self.submit(func, *args, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    def stream(
+        self,
+        func: Callable[..., Iterator[T]],
+        /,
+        *args: Any,
+        buffer_size: int = 2,
+        **kwargs: Any,
+    ) -> AsyncIterator[T]:
+        """
+        Run the generator function ``func(*args, **kwargs)`` on the engine pool
+        and return an async iterator over the items it yields.
+
+        The engine slot is taken immediately, so a full queue raises
+        HTTPException(503) here rather than mid-stream. The producer blocks once
+        ``buffer_size`` items are waiting, so a slow consumer applies backpressure
+        instead of letting items pile up in memory. Closing the iterator early
+        (e.g. the client disconnected) stops the producer before its next item.
+        Generators cannot be sent to worker processes, so in process and fork
+        modes the producer runs on a thread while still counting against this
+        engine's capacity.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, buffer_size))
+        stop = threading.Event()
+
+        def put(item: Any) -> bool:
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    future.result(timeout=0.5)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    if stop.is_set():
+                        future.cancel()
+                        return False
+
+        released = threading.Event()
+        release_lock = threading.Lock()
+
+        def release(_future: Any = None) -> None:
+            with release_lock:
+                if released.is_set():
+                    return
+                released.set()
+            self._release_slot()
+
+        def produce() -> None:
+            error: Optional[BaseException] = None
+            try:
+                generator = func(*args, **kwargs)
+                try:
+                    for item in generator:
+                        if stop.is_set() or not put((item, None)):
+                            return
+                finally:
+                    generator.close()
+            except BaseException as exc:  # noqa: BLE001 - handed to the consumer
+                error = exc
+            finally:
+                # Free the slot before signalling the end, so the consumer can submit again right away
+                release()
+            if not stop.is_set():
+                put((_STREAM_END, error))
+
+        self._acquire_slot()
+        try:
+            if self.mode != "thread":
+                future = loop.run_in_executor(None, produce)
+            else:
+                future = self._get_executor().submit(produce)
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(release)
+
+        return _EngineStream(queue, stop)
+
+    def shutdown(self, *, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _init_forked_worker(workers: int) -> None:
+    # Torch sized its thread pool for the whole machine in the parent; split the cores between workers
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(1, workers)))
+
+
+class _EngineStream:
+    """Async iterator over items produced by EngineExecutor.stream. Closing it stops the producer."""
+
+    def __init__(self, queue: asyncio.Queue, stop: threading.Event):
+        self._queue = queue
+        self._stop = stop
+
+    def __aiter__(self) -> "_EngineStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._stop.is_set():
+            raise StopAsyncIteration
+        item, error = await self._queue.get()
+        if item is _STREAM_END:
+            self._stop.set()
+            if error is not None:
+                raise error
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self) -> None:
+        self._stop.set()
+
+    def __del__(self) -> None:
+        # Never iterated or abandoned without aclose(): still let the producer exit
+        self._stop.set()
+
+
+_EXECUTORS: dict[str, EngineExecutor] = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Ignoring invalid integer for %s: %r", name, value)
+        return default
+
+
+def get_engine_executor(engine: str) -> EngineExecutor:
+    """Return the process-wide executor for ``engine``, creating it from env config on first use."""
+    with _EXECUTORS_LOCK:
+        executor = _EXECUTORS.get(engine)
+        if executor is None:
+            defaults = ENGINE_DEFAULTS.get(engine, {"mode": "thread", "max_workers": 1, "max_queue": 0})
+            prefix = engine.upper()
+            executor = EngineExecutor(
+                engine,
+                mode=os.getenv(f"{prefix}_EXECUTOR_MODE", defaults["mode"]).strip().lower(),
+                max_workers=_env_int(f"{prefix}_MAX_WORKERS", defaults["max_workers"]),
+                max_queue=_env_int(f"{prefix}_MAX_QUEUE", defaults["max_queue"]),
+            )
+            _EXECUTORS[engine] = executor
+        return executor
+
+
+async def run_in_engine(engine: str, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """Run a blocking engine call off the event loop on that engine's bounded pool."""
+    return await get_engine_executor(engine).run(func, *args, **kwargs)
+
+
+def stream_in_engine(
+    engine: str,
+    func: Callable[..., Iterator[T]],
+    /,
+    *args: Any,
+    **kwargs: Any,
+) -> AsyncIterator[T]:
+    """Run a blocking generator on that engine's bounded pool and iterate its items asynchronously."""
+    return get_engine_executor(engine).stream(func, *args, **kwargs)
+
+
+def engine_worker_pids() -> dict[str, list[int]]:
+    """Worker process PIDs of every engine running in process or fork mode."""
+    with _EXECUTORS_LOCK:
+        executors = list(_EXECUTORS.values())
+    return {executor.name: executor.worker_pids() for executor in executors if executor.mode != "thread"}
+
+
+def shutdown_engine_executors(*, wait: bool = True) -> None:
+    with _EXECUTORS_LOCK:
+        executors = list(_EXECUTORS.values())
+        _EXECUTORS.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
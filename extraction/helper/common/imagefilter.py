@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import io
+import os
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from extraction.helper.common import logging as logutil
+
+logger = logutil.get_logger("image-filter")
+
+# Images are measured on a downsample no larger than this on either side
+SAMPLE_SIZE = 64
+# Grayscale step between neighbouring sample pixels that counts as an edge
+EDGE_STEP = 40
+# Longest side from which the flat-colour rule applies. Downsampling by 4x or more blends text strokes and
+# QR modules into in-between tones; smaller bilevel images (icons, QR codes, signatures) keep two colours.
+FLAT_MIN_SIDE = 4 * SAMPLE_SIZE
+
+
+def image_filter_thresholds() -> Optional[dict[str, float]]:
+    """
+    Prefilter thresholds from IMAGE_FILTER_* env vars, or None when
+    IMAGE_FILTER_ENABLED is off.
+
+    minVariance: grayscale variance below which an image is blank or one colour.
+    minEdgeDensity: fraction of edge pixels below which an image has no
+    detail at all (gradients, soft backgrounds).
+    maxFlatColors / minEntropy / maxFlatEdgeDensity: an image at least
+    FLAT_MIN_SIDE on its longest side, with at most this many colours, less
+    than this many bits of grayscale entropy and few edges along its flatter
+    axis is a plain shape or rule.
+    """
+    if os.getenv("IMAGE_FILTER_ENABLED", "true").strip().lower() not in {"1", "true", "yes", "on"}:
+        return None
+    defaults = {
+        "minVariance": ("IMAGE_FILTER_MIN_VARIANCE", 16.0),
+        "minEdgeDensity": ("IMAGE_FILTER_MIN_EDGE_DENSITY", 0.005),
+        "maxFlatColors": ("IMAGE_FILTER_MAX_FLAT_COLORS", 4.0),
+        "minEntropy": ("IMAGE_FILTER_MIN_ENTROPY", 2.0),
+        "maxFlatEdgeDensity": ("IMAGE_FILTER_MAX_FLAT_EDGE_DENSITY", 0.05),
+    }
+    thresholds = {}
+    for key, (name, default) in defaults.items():
+        try:
+            thresholds[key] = float(os.getenv(name, default))
+        except ValueError:
+            logger.warning("Ignoring invalid number for %s", name)
+            thresholds[key] = default
+    return thresholds
+
+
+def image_metrics(image_bytes: bytes) -> Optional[dict[str, float]]:
+    """
+    Variance, entropy (bits), unique colour count and edge density of an
+    encoded image, measured on a SAMPLE_SIZE downsample, plus its longest
+    side in pixels. ``axisEdgeDensity`` counts edges across rows and across
+    columns separately and keeps the smaller: a rule stretched along one axis
+    has none along it. JPEGs are decoded at reduced size. Returns None if the
+    image cannot be decoded.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            long_side = max(img.size)
+            img.draft("RGB", (SAMPLE_SIZE * 2, SAMPLE_SIZE * 2))
+            sample = img.convert("RGB")
+    except Exception as exc:  # noqa: BLE001 - undecodable images are left to the vision model
+        logger.debug("Could not measure image: %s", exc)
+        return None
+    sample.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BOX)
+
+    rgb = np.asarray(sample, dtype=np.uint8)
+    gray = np.asarray(sample.convert("L"), dtype=np.int16)
+
+    histogram = np.bincount(gray.ravel(), minlength=256) / gray.size
+    nonzero = histogram[histogram > 0]
+    entropy = float(-(nonzero * np.log2(nonzero)).sum())
+
+    # 5 bits per channel, so resampling noise does not count as extra colours
+    quantized = rgb.astype(np.uint32) >> 3
+    packed = (quantized[..., 0] << 10) | (quantized[..., 1] << 5) | quantized[..., 2]
+    unique_colors = int(np.unique(packed).size)
+
+    across_columns = np.zeros(gray.shape, dtype=bool)
+    across_rows = np.zeros(gray.shape, dtype=bool)
+    across_columns[:, 1:] = np.abs(np.diff(gray, axis=1)) > EDGE_STEP
+    across_rows[1:, :] = np.abs(np.diff(gray, axis=0)) > EDGE_STEP
+
+    return {
+        "variance": float(gray.var()),
+        "entropy": entropy,
+        "uniqueColors": unique_colors,
+        "edgeDensity": float((across_columns | across_rows).mean()),
+        "axisEdgeDensity": float(min(across_columns.mean(), across_rows.mean())),
+        "longSide": long_side,
+    }
+
+
+def decorative_reason(image_bytes: bytes, thresholds: dict[str, float]) -> Optional[str]:
+    """
+    Why an image is obviously not content, or None if it may be.
+
+    ``blank``: near-uniform (empty boxes, solid backgrounds, spacer images).
+    ``lowDetail``: no edges (gradients, soft backgrounds), or large, with only
+    a few colours and tones and few edges (dividers, rules, plain shapes).
+    Small bilevel images such as QR codes, signatures and icons with text
+    are always left to the model.
+    """
+    metrics = image_metrics(image_bytes)
+    if metrics is None:
+        return None
+    if metrics["variance"] < thresholds["minVariance"]:
+        return "blank"
+    if metrics["edgeDensity"] < thresholds["minEdgeDensity"]:
+        return "lowDetail"
+    if (
+        metrics["longSide"] >= FLAT_MIN_SIDE
+        and metrics["uniqueColors"] <= thresholds["maxFlatColors"]
+        and metrics["entropy"] < thresholds["minEntropy"]
+        and metrics["axisEdgeDensity"] < thresholds["maxFlatEdgeDensity"]
+    ):
+        return "lowDetail"
+    return None
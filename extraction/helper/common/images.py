@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+from PIL import Image, ImageChops
+
+from extraction.helper.common import logging as logutil
+
+logger = logutil.get_logger("image-dedup")
+
+DHASH_SIZE = 8
+# Near-duplicates must also have about the same shape, so a wide banner never matches a square logo
+MAX_ASPECT_RATIO_DIFFERENCE = 0.05
+# dHash alone merges different charts drawn from one template, so candidates are confirmed on
+# grayscale thumbnails: at most this fraction of pixels may differ by more than the pixel threshold.
+THUMBNAIL_SIZE = 128
+CONFIRM_PIXEL_THRESHOLD = 64
+CONFIRM_MAX_DIFFERENT_FRACTION = 0.001
+
+
+@dataclass
+class PerceptualFingerprint:
+    dhash: int
+    aspect_ratio: float
+    thumbnail: Image.Image
+
+
+def perceptual_fingerprint(image_bytes: bytes, hash_size: int = DHASH_SIZE) -> Optional[PerceptualFingerprint]:
+    """
+    Difference hash, aspect ratio and grayscale thumbnail of an encoded image.
+
+    The dHash reduces the image to (hash_size + 1) x hash_size grayscale pixels
+    and records whether each pixel is brighter than its right neighbour, so
+    re-encoded, rescaled or slightly recompressed copies hash (nearly) the
+    same. JPEGs are decoded at reduced size via draft mode. Returns None if
+    the bytes cannot be decoded.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            width, height = img.size
+            if not width or not height:
+                return None
+            img.draft("L", (THUMBNAIL_SIZE * 2, THUMBNAIL_SIZE * 2))
+            gray = img.convert("L")
+    except Exception as exc:  # noqa: BLE001 - undecodable images just skip perceptual matching
+        logger.debug("Could not fingerprint image: %s", exc)
+        return None
+
+    scale = THUMBNAIL_SIZE / max(width, height)
+    thumbnail = gray.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.Resampling.BOX)
+    small = gray.resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small)
+    # One bit per pair of neighbouring columns, row by row with the first bit most significant
+    bits = (pixels[:, :-1] > pixels[:, 1:]).ravel()
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big") >> (-bits.size % 8)
+    return PerceptualFingerprint(dhash=value, aspect_ratio=width / height, thumbnail=thumbnail)
+
+
+def _thumbnails_match(a: Image.Image, b: Image.Image) -> bool:
+    if a.size != b.size:
+        b = b.resize(a.size, Image.Resampling.BOX)
+    histogram = ImageChops.difference(a, b).histogram()
+    different = sum(histogram[CONFIRM_PIXEL_THRESHOLD + 1:])
+    return different <= CONFIRM_MAX_DIFFERENT_FRACTION * a.width * a.height
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+@dataclass
+class SeenImage:
+    """First occurrence of an image in a document."""
+
+    ref: str
+    page_num: int
+    image_num: int
+    # Whatever the caller produced for the first copy (encoded image, pending description, ...)
+    value: Any = None
+    fingerprint: Optional[PerceptualFingerprint] = None
+
+
+class ImageDeduplicator:
+    """
+    Per-document index of images seen so far.
+
+    ``find`` matches an image's raw bytes first by exact SHA-256 and then, if
+    ``hamming_threshold`` > 0, perceptually: same aspect ratio, dHash within
+    the threshold and matching thumbnails. A logo repeated on every page is
+    then processed once and referenced afterwards. Hashing the raw bytes first
+    means exact repeats are never decoded or re-encoded.
+    """
+
+    def __init__(self, *, hamming_threshold: int = 3):
+        self.hamming_threshold = max(0, hamming_threshold)
+        self._by_sha: dict[str, SeenImage] = {}
+        self._perceptual: list[SeenImage] = []
+        self.duplicates = 0
+
+    def find(self, image_bytes: bytes) -> tuple[str, Optional[PerceptualFingerprint], Optional[SeenImage]]:
+        """
+        Look up an image. Returns (sha256, fingerprint or None, first occurrence or None).
+
+        Pass the sha256 and fingerprint back to ``add`` when the image is new.
+        """
+        sha256 = hashlib.sha256(image_bytes).hexdigest()
+        seen = self._by_sha.get(sha256)
+        if seen is not None:
+            self.duplicates += 1
+            return sha256, None, seen
+
+        if not self.hamming_threshold:
+            return sha256, None, None
+        fingerprint = perceptual_fingerprint(image_bytes)
+        if fingerprint is None:
+            return sha256, None, None
+        for candidate in self._perceptual:
+            known = candidate.fingerprint
+            if (
+                abs(known.aspect_ratio - fingerprint.aspect_ratio) <= MAX_ASPECT_RATIO_DIFFERENCE * known.aspect_ratio
+                and hamming_distance(known.dhash, fingerprint.dhash) <= self.hamming_threshold
+                and _thumbnails_match(known.thumbnail, fingerprint.thumbnail)
+            ):
+                # Remember the exact bytes too, so the next identical copy skips fingerprinting
+                self._by_sha[sha256] = candidate
+                self.duplicates += 1
+                return sha256, fingerprint, candidate
+        return sha256, fingerprint, None
+
+    def add(
+        self,
+        sha256: str,
+        fingerprint: Optional[PerceptualFingerprint],
+        *,
+        page_num: int,
+        image_num: int,
+        value: Any = None,
+    ) -> SeenImage:
+        """Record the first occurrence of an image and return its entry."""
+        seen = SeenImage(ref=image_ref(sha256), page_num=page_num, image_num=image_num, value=value, fingerprint=fingerprint)
+        if fingerprint is not None:
+            self._perceptual.append(seen)
+        self._by_sha[sha256] = seen
+        return seen
+
+
+def image_ref(sha256: str) -> str:
+    """Markdown reference label for an image, e.g. ``img-3f2a9c1b7e0d``."""
+    return f"img-{sha256[:12]}"
+
+
+def image_markdown(alt: str, ref: str, link: Optional[str] = None) -> str:
+    """
+    Reference-style markdown image. Pass ``link`` (an image store URL or data
+    URI) on the first occurrence to include the single ``[ref]: ...``
+    definition every later reference resolves to.
+    """
+    tag = f"![{alt}][{ref}]"
+    if link is None:
+        return tag
+    return f"{tag}\n\n[{ref}]: {link}"
+
+
+def image_dedup_threshold() -> Optional[int]:
+    """
+    Hamming threshold from IMAGE_DEDUP_HAMMING_THRESHOLD (0 = exact matches
+    only), or None when IMAGE_DEDUP_ENABLED is off. Part of cache keys, since
+    it changes the markdown produced.
+    """
+    if os.getenv("IMAGE_DEDUP_ENABLED", "true").strip().lower() not in {"1", "true", "yes", "on"}:
+        return None
+    try:
+        return max(0, int(os.getenv("IMAGE_DEDUP_HAMMING_THRESHOLD", 3)))
+    except ValueError:
+        logger.warning("Ignoring invalid IMAGE_DEDUP_HAMMING_THRESHOLD")
+        return 3
+
+
+def new_image_deduplicator() -> Optional[ImageDeduplicator]:
+    """A deduplicator for one document, or None if deduplication is disabled."""
+    threshold = image_dedup_threshold()
+    if threshold is None:
+        return None
+    return ImageDeduplicator(hamming_threshold=threshold)
@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import base64
+import fcntl
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from PIL import Image
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.schemas.types import ImageMode
+
+logger = logutil.get_logger("image-store")
+
+IMAGE_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+    "image/jp2": ".jp2",
+}
+IMAGE_MIME_TYPES = {extension: mime for mime, extension in IMAGE_EXTENSIONS.items()}
+IMAGE_ID_REGEX = re.compile(r"^[0-9a-f]{64}\.(?:png|jpg|webp|gif|jp2)$")
+IMAGE_LINK_REGEX = re.compile(r"/images/([0-9a-f]{64}\.(?:png|jpg|webp|gif|jp2))")
+# Bytes stored, shared by every process using the directory; updated under an exclusive flock
+USAGE_FILE = ".usage"
+
+
+class ImageStore:
+    """
+    Content-addressed store for extracted images on local disk.
+
+    An image is stored once under the SHA-256 of its bytes, whichever document
+    and request it came from, and markdown links to it by that id. Storing an
+    image again (or serving a cached result that links to it, see touch)
+    refreshes its expiry. Entries expire ``ttl_seconds`` after they were last
+    stored, and the oldest are evicted once the store is over
+    ``disk_max_bytes``. Safe to share between threads and worker processes:
+    the byte count lives in a file in the store, so the cap covers every
+    process writing to it.
+    """
+
+    def __init__(self, directory: str | Path, *, ttl_seconds: float = 7 * 86400, disk_max_bytes: int = 2 * 1024**3):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_bytes = max(0, disk_max_bytes)
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stats = {"writes": 0, "reuses": 0, "hits": 0, "misses": 0, "evictions": 0}
+
+    def _path_for(self, image_id: str) -> Path:
+        return self.directory / image_id[:2] / image_id
+
+    def put(self, data: bytes, mime: str) -> str:
+        """Store ``data`` (encoded as ``mime``) and return its image id. Raises OSError if the store is unwritable."""
+        image_id = hashlib.sha256(data).hexdigest() + IMAGE_EXTENSIONS.get(mime, ".png")
+        path = self._path_for(image_id)
+        try:
+            # Already stored (this document or an earlier one): just push its expiry back
+            os.utime(path)
+            with self._lock:
+                self._stats["reuses"] += 1
+            return image_id
+        except FileNotFoundError:
+            pass
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{image_id}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._stats["writes"] += 1
+        if self._add_disk_bytes(len(data)) > self.disk_max_bytes:
+            self._evict()
+        return image_id
+
+    def get(self, image_id: str) -> Optional[tuple[Path, str]]:
+        """(path, mime type) of a stored image, or None if the id is invalid, unknown or expired."""
+        if not IMAGE_ID_REGEX.match(image_id):
+            return None
+        path = self._path_for(image_id)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and stat.st_mtime + self.ttl_seconds <= time.time():
+            try:
+                path.unlink()
+                self._add_disk_bytes(-stat.st_size)
+            except FileNotFoundError:
+                pass
+            stat = None
+        with self._lock:
+            self._stats["hits" if stat is not None else "misses"] += 1
+        if stat is None:
+            return None
+        return path, IMAGE_MIME_TYPES[path.suffix]
+
+    def touch(self, image_ids: list[str]) -> bool:
+        """
+        Push back the expiry of stored images, e.g. ones a cached result links
+        to. Returns False if any of them is no longer in the store.
+        """
+        available = True
+        for image_id in image_ids:
+            try:
+                if not IMAGE_ID_REGEX.match(image_id):
+                    raise FileNotFoundError(image_id)
+                os.utime(self._path_for(image_id))
+            except FileNotFoundError:
+                available = False
+        return available
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "diskBytes": self._disk_bytes}
+
+    def _scan_disk_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.directory.glob("*/*") if p.is_file())
+
+    @contextmanager
+    def _usage_lock(self) -> Iterator[Any]:
+        """The shared usage file, locked against every other thread and process using the store."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / USAGE_FILE, "a+b") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                fh.seek(0)
+                yield fh
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _write_usage(fh: Any, total: int) -> None:
+        fh.seek(0)
+        fh.truncate()
+        fh.write(str(total).encode("ascii"))
+        fh.flush()
+
+    def _add_disk_bytes(self, delta: int) -> int:
+        """Add ``delta`` to the shared byte count and return the new total."""
+        with self._usage_lock() as fh:
+            raw = fh.read().strip()
+            # First use of the directory: count what is there, which already includes this change
+            total = max(0, int(raw) + delta) if raw.isdigit() else self._scan_disk_bytes()
+            self._write_usage(fh, total)
+        with self._lock:
+            self._disk_bytes = total
+        return total
+
+    def _evict(self) -> None:
+        """
+        Drop expired images, then the least recently stored ones, until the
+        store is under 90% of its limit. Runs on a fresh scan, under the usage
+        lock, so processes do not evict at the same time and the shared count
+        is reset to what is really on disk.
+        """
+        with self._usage_lock() as fh:
+            total, evicted = self._evict_locked()
+            self._write_usage(fh, total)
+        with self._lock:
+            self._disk_bytes = total
+            self._stats["evictions"] += evicted
+        if evicted:
+            logger.info("Evicted %d images from the image store", evicted)
+
+    def _evict_locked(self) -> tuple[int, int]:
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.disk_max_bytes * 0.9)
+        evicted = 0
+        for mtime, size, path in entries:
+            if total <= target and mtime + self.ttl_seconds > now:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        return total, evicted
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid integer for %s", name)
+        return default
+
+
+_STORE: Optional[ImageStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """Process-wide image store configured from IMAGE_STORE_* env vars."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = ImageStore(
+                os.getenv("IMAGE_STORE_DIR") or "/tmp/extraction-cache/images",
+                ttl_seconds=_env_int("IMAGE_STORE_TTL_SECONDS", 7 * 86400),
+                disk_max_bytes=_env_int("IMAGE_STORE_DISK_MAX_MB", 2048) * 1024 * 1024,
+            )
+        return _STORE
+
+
+def image_store_stats() -> Optional[dict[str, Any]]:
+    """Stats for the image store, or None if it has not been used by this process."""
+    return _STORE.stats() if _STORE is not None else None
+
+
+def _strings(value: Any) -> Iterator[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+
+
+def refresh_linked_images(result: Any) -> bool:
+    """
+    Push back the expiry of every stored image a cached result links to.
+    Returns False if any of them has expired or been evicted, in which case
+    the result should be extracted again rather than served with broken links.
+    """
+    image_ids = sorted({match for text in _strings(result) for match in IMAGE_LINK_REGEX.findall(text)})
+    if not image_ids:
+        return True
+    return get_image_store().touch(image_ids)
+
+
+def default_image_mode() -> ImageMode:
+    """
+    IMAGE_MODE, used when a request does not pick one: ``reference`` (default)
+    links images from the store, ``inline`` embeds data URIs, ``thumbnail``
+    embeds downscaled copies and ``none`` leaves images out.
+    """
+    value = os.getenv("IMAGE_MODE", ImageMode.REFERENCE.value).strip().lower()
+    try:
+        return ImageMode(value)
+    except ValueError:
+        logger.warning("Ignoring invalid IMAGE_MODE %r", value)
+        return ImageMode.REFERENCE
+
+
+def image_base_url() -> str:
+    """IMAGE_BASE_URL prefixed to /images/{id} links; empty leaves them relative to this server."""
+    return (os.getenv("IMAGE_BASE_URL") or "").rstrip("/")
+
+
+def thumbnail_max_px() -> int:
+    """IMAGE_THUMBNAIL_MAX_PX: longest side of a thumbnail-mode image."""
+    return max(16, _env_int("IMAGE_THUMBNAIL_MAX_PX", 256))
+
+
+def image_output_options(mode: Optional[ImageMode] = None) -> dict[str, Any]:
+    """Settings that change how images are written into markdown, for cache keys."""
+    mode = mode or default_image_mode()
+    return {
+        "mode": mode.value,
+        "baseUrl": image_base_url() if mode == ImageMode.REFERENCE else None,
+        "thumbnailPx": thumbnail_max_px() if mode == ImageMode.THUMBNAIL else None,
+    }
+
+
+def make_thumbnail(image: bytes | Image.Image) -> Optional[bytes]:
+    """
+    JPEG no larger than IMAGE_THUMBNAIL_MAX_PX on its longest side, from
+    encoded bytes or a decoded PIL image. JPEGs are decoded at reduced size.
+    Returns None if the image cannot be decoded.
+    """
+    size = thumbnail_max_px()
+    try:
+        if isinstance(image, bytes):
+            with Image.open(io.BytesIO(image)) as img:
+                img.draft("RGB", (size, size))
+                thumb = img.convert("RGBA" if img.mode in ("P", "LA", "RGBA") else "RGB")
+        else:
+            thumb = image.copy()
+        thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+        if thumb.mode != "RGB":
+            background = Image.new("RGB", thumb.size, (255, 255, 255))
+            background.paste(thumb, mask=thumb.getchannel("A") if "A" in thumb.getbands() else None)
+            thumb = background
+        buffer = io.BytesIO()
+        thumb.save(buffer, format="JPEG", quality=75)
+        return buffer.getvalue()
+    except Exception as exc:  # noqa: BLE001 - the caller falls back to the full image
+        logger.debug("Could not make thumbnail: %s", exc)
+        return None
+
+
+def _data_uri(data: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def image_link(data: bytes, mime: str, *, mode: Optional[ImageMode] = None) -> str:
+    """
+    Link target for an extracted image in markdown: its /images/{id} URL in
+    the image store, a data URI in inline mode, or the data URI of a small
+    JPEG in thumbnail mode. Falls back to a data URI if the store cannot be
+    written, and to a store link if a thumbnail cannot be made.
+    """
+    mode = mode or default_image_mode()
+    if mode == ImageMode.THUMBNAIL:
+        thumbnail = make_thumbnail(data)
+        if thumbnail is not None:
+            # Images already smaller than their thumbnail are inlined as they are
+            return _data_uri(thumbnail, "image/jpeg") if len(thumbnail) < len(data) else _data_uri(data, mime)
+        mode = ImageMode.REFERENCE
+    if mode == ImageMode.REFERENCE:
+        try:
+            return f"{image_base_url()}/images/{get_image_store().put(data, mime)}"
+        except OSError as exc:
+            logger.warning("Image store unavailable, inlining image instead: %s", exc)
+    return _data_uri(data, mime)
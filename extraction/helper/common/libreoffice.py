@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import queue
+import select
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from extraction.helper.common import logging as logutil
+
+logger = logutil.get_logger("libreoffice")
+
+BRIDGE_SCRIPT = Path(__file__).resolve().parent / "libreoffice_bridge.py"
+# LibreOffice export filters by target extension
+EXPORT_FILTERS = {
+    "docx": "MS Word 2007 XML",
+    "xlsx": "Calc MS Excel 2007 XML",
+    "pdf": "writer_pdf_Export",
+}
+
+
+class LibreOfficeError(RuntimeError):
+    """A conversion failed or the worker running it had to be restarted."""
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s", name)
+        return default
+
+
+def _bridge_python() -> str:
+    """
+    Interpreter for the UNO bridge: LIBREOFFICE_PYTHON, this one if it can
+    import uno, else the system Python that python3-uno installs into.
+    """
+    configured = os.getenv("LIBREOFFICE_PYTHON")
+    if configured:
+        return configured
+    if importlib.util.find_spec("uno") is not None:
+        return sys.executable
+    return "/usr/bin/python3"
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _stop_process(process: Optional[subprocess.Popen]) -> None:
+    if process is None or process.poll() is not None:
+        return
+    try:
+        # soffice forks soffice.bin into the same process group
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=5)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+class LibreOfficeWorker:
+    """
+    One headless soffice process listening on a local UNO socket, plus the
+    bridge process that drives it. Started on first use and restarted after
+    ``max_conversions`` conversions, a timeout or a failed health check.
+    """
+
+    def __init__(self, index: int, *, binary: str, python: str, max_conversions: int, startup_timeout: float):
+        self.index = index
+        self.binary = binary
+        self.python = python
+        self.max_conversions = max_conversions
+        self.startup_timeout = startup_timeout
+        self.conversions = 0
+        self.last_used = 0.0
+        self._office: Optional[subprocess.Popen] = None
+        self._bridge: Optional[subprocess.Popen] = None
+        self._profile: Optional[str] = None
+        self._buffer = b""
+
+    @property
+    def running(self) -> bool:
+        return (
+            self._office is not None
+            and self._office.poll() is None
+            and self._bridge is not None
+            and self._bridge.poll() is None
+        )
+
+    def start(self) -> None:
+        self.stop()
+        port = _free_port()
+        # Each worker needs its own profile; instances sharing one hand requests to each other
+        self._profile = tempfile.mkdtemp(prefix=f"lo-worker-{self.index}-")
+        self._office = subprocess.Popen(
+            [
+                self.binary,
+                "--headless",
+                "--invisible",
+                "--nocrashreport",
+                "--nodefault",
+                "--nofirststartwizard",
+                "--nologo",
+                "--norestore",
+                f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext",
+                f"-env:UserInstallation=file://{self._profile}",
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self._bridge = subprocess.Popen(
+            [self.python, str(BRIDGE_SCRIPT), "--port", str(port), "--connect-timeout", str(self.startup_timeout)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self._buffer = b""
+        self.conversions = 0
+        start = time.monotonic()
+        try:
+            self._read_reply(self.startup_timeout + 5)
+        except BaseException:
+            self.stop()
+            raise
+        self.last_used = time.monotonic()
+        logger.info("Started LibreOffice worker %d on port %d in %.1fs", self.index, port, time.monotonic() - start)
+
+    def stop(self) -> None:
+        if self._bridge is not None and self._bridge.stdin is not None:
+            try:
+                self._bridge.stdin.close()
+            except OSError:
+                pass
+        _stop_process(self._bridge)
+        _stop_process(self._office)
+        self._bridge = None
+        self._office = None
+        if self._profile is not None:
+            shutil.rmtree(self._profile, ignore_errors=True)
+            self._profile = None
+
+    def _read_reply(self, timeout: float) -> dict[str, Any]:
+        assert self._bridge is not None and self._bridge.stdout is not None
+        fd = self._bridge.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"LibreOffice worker {self.index} did not answer within {timeout:.0f}s")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise LibreOfficeError(f"LibreOffice worker {self.index} exited")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def request(self, payload: dict[str, Any], timeout: float) -> dict[str, Any]:
+        assert self._bridge is not None and self._bridge.stdin is not None
+        try:
+            self._bridge.stdin.write(json.dumps(payload).encode("utf-8") + b"\n")
+            self._bridge.stdin.flush()
+        except (BrokenPipeError, OSError) as exc:
+            raise LibreOfficeError(f"LibreOffice worker {self.index} exited") from exc
+        reply = self._read_reply(timeout)
+        self.last_used = time.monotonic()
+        return reply
+
+
+class LibreOfficePool:
+    """
+    Fixed set of long-lived headless LibreOffice workers.
+
+    Starting soffice takes seconds, which dominates converting a small
+    ``.doc``; a pooled worker only pays for the conversion itself. Each conversion
+    borrows a worker, so at most ``size`` run at once. Workers are recycled
+    after ``max_conversions`` to bound LibreOffice's memory growth, killed and
+    restarted when a conversion times out, and pinged before reuse once they
+    have been idle for ``healthcheck_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        size: int = 2,
+        binary: str = "soffice",
+        python: Optional[str] = None,
+        max_conversions: int = 200,
+        conversion_timeout: float = 60,
+        startup_timeout: float = 30,
+        healthcheck_interval: float = 30,
+    ):
+        self.size = max(1, size)
+        self.conversion_timeout = conversion_timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._workers = [
+            LibreOfficeWorker(
+                index,
+                binary=binary,
+                python=python or _bridge_python(),
+                max_conversions=max(1, max_conversions),
+                startup_timeout=startup_timeout,
+            )
+            for index in range(self.size)
+        ]
+        self._idle: queue.Queue[LibreOfficeWorker] = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._stats_lock = threading.Lock()
+        self._stats = {"conversions": 0, "failures": 0, "timeouts": 0, "restarts": 0}
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _ready(self, worker: LibreOfficeWorker) -> None:
+        """Start, recycle or health-check ``worker`` before it takes a conversion."""
+        if worker.running and worker.conversions >= worker.max_conversions:
+            logger.info("Recycling LibreOffice worker %d after %d conversions", worker.index, worker.conversions)
+            worker.stop()
+        elif worker.running and time.monotonic() - worker.last_used > self.healthcheck_interval:
+            try:
+                if not worker.request({"op": "ping"}, timeout=5).get("ok"):
+                    raise LibreOfficeError("ping failed")
+            except (LibreOfficeError, TimeoutError, ValueError) as exc:
+                logger.warning("LibreOffice worker %d failed its health check: %s", worker.index, exc)
+                worker.stop()
+        if not worker.running:
+            if worker.conversions or worker.last_used:
+                self._count("restarts")
+            worker.start()
+
+    def warm(self) -> None:
+        """Start every idle worker now instead of on first use."""
+        workers = []
+        try:
+            while True:
+                workers.append(self._idle.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            for worker in workers:
+                self._ready(worker)
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+
+    def convert(self, input_path: str | Path, output_dir: str | Path, target_format: str) -> Path:
+        """
+        Convert ``input_path`` to ``target_format`` (``docx``, ``xlsx`` or
+        ``pdf``) in ``output_dir`` and return the new file's path.
+
+        Blocks until a worker is free. Raises LibreOfficeError if the
+        conversion fails or times out; the worker is restarted before its next
+        use in that case.
+        """
+        input_path = Path(input_path)
+        output_path = Path(output_dir) / f"{input_path.stem}.{target_format}"
+        try:
+            export_filter = EXPORT_FILTERS[target_format]
+        except KeyError:
+            raise ValueError(f"Unsupported LibreOffice target format: {target_format}") from None
+
+        worker = self._idle.get()
+        try:
+            self._ready(worker)
+            reply = worker.request(
+                {"op": "convert", "input": str(input_path), "output": str(output_path), "filter": export_filter},
+                timeout=self.conversion_timeout,
+            )
+            worker.conversions += 1
+        except TimeoutError as exc:
+            self._count("timeouts")
+            worker.stop()
+            raise LibreOfficeError(str(exc)) from exc
+        except (LibreOfficeError, OSError, ValueError) as exc:
+            self._count("failures")
+            worker.stop()
+            raise LibreOfficeError(str(exc)) from exc
+        finally:
+            self._idle.put(worker)
+
+        if not reply.get("ok") or not output_path.exists():
+            self._count("failures")
+            raise LibreOfficeError(reply.get("error") or f"LibreOffice produced no {target_format} output")
+        self._count("conversions")
+        return output_path
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["workers"] = self.size
+        stats["running"] = sum(1 for worker in self._workers if worker.running)
+        return stats
+
+    def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.stop()
+
+
+_POOL: Optional[LibreOfficePool] = None
+_POOL_PID: Optional[int] = None
+_POOL_LOCK = threading.Lock()
+
+
+def libreoffice_pool_enabled() -> bool:
+    """LIBREOFFICE_POOL_ENABLED (default true), and only if the soffice binary is installed."""
+    if not _env_flag("LIBREOFFICE_POOL_ENABLED", True):
+        return False
+    return shutil.which(os.getenv("LIBREOFFICE_BINARY", "soffice")) is not None
+
+
+def get_libreoffice_pool() -> Optional[LibreOfficePool]:
+    """Process-wide LibreOffice pool, or None when it is disabled or LibreOffice is not installed."""
+    global _POOL, _POOL_PID
+    if not libreoffice_pool_enabled():
+        return None
+    with _POOL_LOCK:
+        # Engine process workers are forked; they must not share the parent's soffice pipes
+        if _POOL is None or _POOL_PID != os.getpid():
+            _POOL = LibreOfficePool(
+                size=int(_env_number("LIBREOFFICE_POOL_SIZE", 2)),
+                binary=os.getenv("LIBREOFFICE_BINARY", "soffice"),
+                max_conversions=int(_env_number("LIBREOFFICE_MAX_CONVERSIONS", 200)),
+                conversion_timeout=_env_number("LIBREOFFICE_CONVERSION_TIMEOUT_SECONDS", 60),
+                startup_timeout=_env_number("LIBREOFFICE_STARTUP_TIMEOUT_SECONDS", 30),
+                healthcheck_interval=_env_number("LIBREOFFICE_HEALTHCHECK_SECONDS", 30),
+            )
+            _POOL_PID = os.getpid()
+        return _POOL
+
+
+def libreoffice_stats() -> Optional[dict[str, Any]]:
+    """Counters for /metrics, or None if this process has not used the pool."""
+    if _POOL is None or _POOL_PID != os.getpid():
+        return None
+    return _POOL.stats()
+
+
+def shutdown_libreoffice_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL_PID == os.getpid():
+            _POOL.shutdown()
+        _POOL = None
@@ -0,0 +1,90 @@
+"""
+UNO client for one headless LibreOffice worker.
+
+Run by extraction.helper.common.libreoffice with a Python that can import
+``uno`` (Debian's python3-uno is built for /usr/bin/python3, not the
+server's interpreter), so it must not import anything from the app.
+
+It connects to the soffice instance listening on ``--port`` and then reads
+one JSON request per line on stdin, answering each with one JSON line on
+stdout:
+
+    {"op": "ping"}                                          -> {"ok": true}
+    {"op": "convert", "input": ..., "output": ..., "filter": ...} -> {"ok": true}
+
+Failures are answered with {"ok": false, "error": "..."}.
+"""
+import argparse
+import json
+import sys
+import time
+
+import uno
+from com.sun.star.beans import PropertyValue
+from com.sun.star.connection import NoConnectException
+
+
+def _property(name, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+def _connect(port, timeout):
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+    url = f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            context = resolver.resolve(url)
+            break
+        except NoConnectException:
+            # soffice opens the socket a few seconds after it starts
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+    return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+
+def _convert(desktop, request):
+    document = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(request["input"]),
+        "_blank",
+        0,
+        (_property("Hidden", True), _property("ReadOnly", True), _property("UpdateDocMode", 0)),
+    )
+    if document is None:
+        raise RuntimeError("LibreOffice could not open the document")
+    try:
+        document.storeToURL(uno.systemPathToFileUrl(request["output"]), (_property("FilterName", request["filter"]),))
+    finally:
+        document.close(True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--connect-timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    desktop = _connect(args.port, args.connect_timeout)
+    print(json.dumps({"ok": True, "ready": True}), flush=True)
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        try:
+            if request.get("op") == "convert":
+                _convert(desktop, request)
+            else:
+                # Listing open components round-trips through the office process
+                desktop.getComponents()
+            reply = {"ok": True}
+        except Exception as exc:  # noqa: BLE001 - reported to the pool
+            reply = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        print(json.dumps(reply), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+KIB = 1024
+
+# smaps_rollup fields reported, by response key
+_SMAPS_FIELDS = {
+    "Rss": "rssMb",
+    "Pss": "pssMb",
+    "Shared_Clean": "sharedCleanMb",
+    "Shared_Dirty": "sharedDirtyMb",
+    "Private_Clean": "privateCleanMb",
+    "Private_Dirty": "privateDirtyMb",
+}
+
+
+def process_memory(pid: int) -> Optional[dict[str, float]]:
+    """
+    Memory of one process in MiB, from /proc/<pid>/smaps_rollup.
+
+    RSS counts shared pages in full for every process that maps them, so
+    summing it over forked workers overstates their footprint. PSS splits each
+    shared page between the processes sharing it and adds up to the real
+    total. Falls back to VmRSS from /proc/<pid>/status where smaps_rollup is
+    missing, and returns None if the process is gone or /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            lines = fh.readlines()
+    except OSError:
+        return _status_rss(pid)
+    memory: dict[str, float] = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in _SMAPS_FIELDS:
+            memory[_SMAPS_FIELDS[parts[0].rstrip(":")]] = round(int(parts[1]) / KIB, 1)
+    return memory or _status_rss(pid)
+
+
+def _status_rss(pid: int) -> Optional[dict[str, float]]:
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return {"rssMb": round(int(line.split()[1]) / KIB, 1)}
+    except OSError:
+        pass
+    return None
+
+
+def memory_report(worker_pids: dict[str, list[int]]) -> dict:
+    """
+    Memory of this server process and of each group of worker processes, with
+    per-group RSS and PSS totals for sizing pods.
+    """
+    groups = {}
+    for name, pids in worker_pids.items():
+        workers = []
+        for pid in pids:
+            memory = process_memory(pid)
+            if memory is not None:
+                workers.append({"pid": pid, **memory})
+        groups[name] = {
+            "workers": workers,
+            "totalRssMb": round(sum(worker.get("rssMb", 0.0) for worker in workers), 1),
+            "totalPssMb": round(sum(worker.get("pssMb", 0.0) for worker in workers), 1),
+        }
+    return {"server": {"pid": os.getpid(), **(process_memory(os.getpid()) or {})}, "workers": groups}
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Optional
+
+from pypdf import PdfReader
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.schemas.types import PageRoute
+
+logger = logutil.get_logger("pdf-routing")
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+# Form XObjects can nest; deeper levels are not worth walking for a coverage estimate
+MAX_FORM_DEPTH = 3
+
+
+@dataclass
+class PageClassification:
+    """Routing decision for one PDF page, from its text layer and image coverage."""
+
+    page: int
+    text_chars: int
+    image_coverage: float
+    route: PageRoute
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "page": self.page,
+            "route": self.route.value,
+            "textChars": self.text_chars,
+            "imageCoverage": round(self.image_coverage, 3),
+        }
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s", name)
+        return default
+
+
+def routing_enabled(override: Optional[bool] = None) -> bool:
+    """Whether to route PDF pages: the request's ``fast_path`` value if given, else PDF_FAST_PATH_ROUTING."""
+    if override is not None:
+        return override
+    return _env_flag("PDF_FAST_PATH_ROUTING", False)
+
+
+def routing_thresholds() -> dict[str, float]:
+    """
+    Classifier thresholds from PDF_ROUTING_MIN_TEXT_CHARS and
+    PDF_ROUTING_MAX_IMAGE_COVERAGE. Part of cache keys, since they change
+    which pages are OCRed.
+    """
+    return {
+        "minTextChars": int(_env_float("PDF_ROUTING_MIN_TEXT_CHARS", 100)),
+        "maxImageCoverage": _env_float("PDF_ROUTING_MAX_IMAGE_COVERAGE", 0.5),
+    }
+
+
+# Literal strings (escapes allowed, unbalanced nesting is not) and hex strings: the operands of text-showing operators
+_STRING_RE = re.compile(rb"\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>", re.S)
+# With strings blanked out, the only operators that matter for image coverage. Operands are read
+# back from just before cm and Do; matching them up front backtracks badly on path-heavy pages.
+_GRAPHICS_RE = re.compile(rb"(?<![\w/.])(q|Q|BI|cm|Do)(?![\w])")
+_CM_OPERANDS_RE = re.compile(rb"((?:[-+]?(?:\d+\.?\d*|\.\d+)\s+){6})$")
+_DO_OPERAND_RE = re.compile(rb"(/[^\s/\[\]()<>{}%]+)\s*$")
+# Longest operand text looked at before cm / Do
+_OPERAND_WINDOW = 160
+
+
+def _multiply(m: tuple[float, ...], n: tuple[float, ...]) -> tuple[float, ...]:
+    """Affine product m x n in PDF's [a b c d e f] row-vector convention."""
+    a1, b1, c1, d1, e1, f1 = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (
+        a1 * a2 + b1 * c2,
+        a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2,
+        c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2,
+        e1 * b2 + f1 * d2 + f2,
+    )
+
+
+def _string_length(token: bytes) -> int:
+    if token.startswith(b"<"):
+        return len(re.sub(rb"\s", b"", token[1:-1])) // 2
+    return len(token) - 2 - token.count(b"\\")
+
+
+def _scan_content(data: bytes, resources: Any, ctm: tuple[float, ...], depth: int = 0) -> tuple[int, float]:
+    """
+    Return (text bytes shown, page-space image area) for a content stream.
+
+    This is a regex scan rather than a full parse: pypdf's tokenizer is pure
+    Python and costs more than the routing saves on vector-heavy pages.
+    Images are drawn into the unit square, so each covers |det(CTM)| at the
+    moment ``Do`` (or an inline image) paints it.
+    """
+    text_bytes = 0
+
+    def blank(match: re.Match) -> bytes:
+        nonlocal text_bytes
+        text_bytes += _string_length(match.group(0))
+        return b"()"
+
+    data = _STRING_RE.sub(blank, data)
+
+    xobjects = {}
+    if resources is not None and "/XObject" in resources:
+        xobjects = resources["/XObject"].get_object()
+
+    area = 0.0
+    stack: list[tuple[float, ...]] = []
+    for match in _GRAPHICS_RE.finditer(data):
+        op = match.group(1)
+        if op == b"q":
+            stack.append(ctm)
+        elif op == b"Q":
+            if stack:
+                ctm = stack.pop()
+        elif op == b"BI":
+            area += abs(ctm[0] * ctm[3] - ctm[1] * ctm[2])
+        elif op == b"cm":
+            operands = _CM_OPERANDS_RE.search(data, max(0, match.start() - _OPERAND_WINDOW), match.start())
+            if operands is not None:
+                ctm = _multiply(tuple(float(value) for value in operands.group(1).split()), ctm)
+        else:
+            operand = _DO_OPERAND_RE.search(data, max(0, match.start() - _OPERAND_WINDOW), match.start())
+            xobject = xobjects.get(operand.group(1).decode("latin-1")) if operand is not None else None
+            if xobject is None:
+                continue
+            xobject = xobject.get_object()
+            subtype = xobject.get("/Subtype")
+            if subtype == "/Image":
+                area += abs(ctm[0] * ctm[3] - ctm[1] * ctm[2])
+            elif subtype == "/Form" and depth < MAX_FORM_DEPTH:
+                matrix = xobject.get("/Matrix")
+                form_ctm = _multiply(tuple(float(value) for value in matrix), ctm) if matrix else ctm
+                form_text, form_area = _scan_content(
+                    xobject.get_data(), xobject.get("/Resources", resources), form_ctm, depth + 1
+                )
+                text_bytes += form_text
+                area += form_area
+    return text_bytes, area
+
+
+def route_page(text_chars: int, image_coverage: float, *, min_text_chars: int, max_image_coverage: float) -> PageRoute:
+    """
+    OCR pages that are mostly image (scans, slides exported as pictures) or
+    that carry images but almost no text layer; everything else is read from
+    its text layer. Pages with neither text nor images have nothing to OCR.
+    """
+    if image_coverage >= max_image_coverage:
+        return PageRoute.OCR
+    if text_chars < min_text_chars and image_coverage > 0:
+        return PageRoute.OCR
+    return PageRoute.TEXT
+
+
+def classify_pdf(source: str | Path | BinaryIO) -> Optional[list[PageClassification]]:
+    """
+    Classify every page of a PDF for routing, using pypdf only (no rendering).
+
+    Text density is the number of bytes the page's text operators show
+    (about one per character, two for CID fonts); image coverage is the
+    fraction of the page area painted by images.
+    Returns None if the PDF cannot be read, in which case callers should run
+    their full pipeline. A file object is rewound afterwards.
+    """
+    thresholds = routing_thresholds()
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        reader = PdfReader(source)
+        pages = []
+        for index, page in enumerate(reader.pages):
+            box = page.mediabox
+            page_area = abs(float(box.width) * float(box.height)) or 1.0
+            contents = page.get_contents()
+            text_chars, painted = (
+                _scan_content(contents.get_data(), page.get("/Resources"), IDENTITY) if contents is not None else (0, 0.0)
+            )
+            coverage = min(1.0, painted / page_area)
+            pages.append(
+                PageClassification(
+                    page=index + 1,
+                    text_chars=text_chars,
+                    image_coverage=coverage,
+                    route=route_page(
+                        text_chars,
+                        coverage,
+                        min_text_chars=thresholds["minTextChars"],
+                        max_image_coverage=thresholds["maxImageCoverage"],
+                    ),
+                )
+            )
+        return pages
+    except Exception as exc:  # noqa: BLE001 - fall back to the full pipeline
+        logger.warning("PDF page classification failed; routing every page to the full pipeline: %s", exc)
+        return None
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def page_runs(pages: list[PageClassification]) -> list[tuple[PageRoute, list[PageClassification]]]:
+    """Group consecutive pages with the same route, in page order."""
+    runs: list[tuple[PageRoute, list[PageClassification]]] = []
+    for page in pages:
+        if runs and runs[-1][0] == page.route:
+            runs[-1][1].append(page)
+        else:
+            runs.append((page.route, [page]))
+    return runs
@@ -0,0 +1,442 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Iterable, Optional, TypeVar, Union
+
+from extraction.helper.common import logging as logutil
+
+logger = logutil.get_logger("llm-scheduler")
+
+T = TypeVar("T")
+
+# Bedrock error codes and HTTP statuses that mean "slow down" rather than "this request is wrong"
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+THROTTLING_STATUS_CODES = {429, 503}
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute limiter shared by threads.
+
+    The bucket holds up to one minute of tokens and refills continuously.
+    ``acquire`` blocks until the requested tokens are available (``acquire_async``
+    awaits instead); ``adjust`` corrects the balance once a call's real usage
+    is known.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self, tokens: float) -> float:
+        """Take ``tokens`` if available and return 0, otherwise return the seconds until they will be."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float) -> float:
+        """Take ``tokens`` (capped at the bucket size), sleeping until they are available. Returns seconds waited."""
+        tokens = min(float(tokens), self.capacity)
+        waited = 0.0
+        while delay := self._take(tokens):
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def acquire_async(self, tokens: float) -> float:
+        """Like ``acquire`` but waits with asyncio.sleep."""
+        tokens = min(float(tokens), self.capacity)
+        waited = 0.0
+        while delay := self._take(tokens):
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+    def adjust(self, tokens: float) -> None:
+        """Charge (positive) or refund (negative) tokens. The balance may go negative after an underestimate."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - tokens)
+
+
+class ConcurrencyGate:
+    """
+    Concurrency slots shared by threads and event loops.
+
+    Waiters queue in arrival order. Threads block on an event in ``acquire``;
+    coroutines await a future in ``acquire_async``, so waiting holds no
+    thread. ``release`` hands the slot straight to the next waiter, waking
+    coroutines on their own loop.
+    """
+
+    def __init__(self, slots: int):
+        self._free = slots
+        self._lock = threading.Lock()
+        self._waiters: deque[Union[threading.Event, tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = deque()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, future))
+                except ValueError:
+                    pass
+            # Cancelled after the slot arrived; a future cancelled before then is passed on by _wake
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def _wake(self, future: asyncio.Future) -> None:
+        # Runs on the waiter's loop
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(self._wake, future)
+                    return
+                except RuntimeError:
+                    # The waiter's loop has closed
+                    continue
+            self._free += 1
+
+    def __enter__(self) -> "ConcurrencyGate":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+def _error_code(exc: BaseException) -> Optional[str]:
+    # botocore ClientError keeps the service error in exc.response["Error"]["Code"]
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    return None
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        if isinstance(response, dict):
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        else:
+            status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_throttling_error(exc: BaseException) -> bool:
+    """True for provider errors that should be retried after backing off (Bedrock throttling, HTTP 429/503)."""
+    return _error_code(exc) in THROTTLING_ERROR_CODES or _status_code(exc) in THROTTLING_STATUS_CODES
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """The server's Retry-After hint in seconds, if the error carries one."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None and isinstance(response, dict):
+        headers = response.get("ResponseMetadata", {}).get("HTTPHeaders")
+    if not headers:
+        return None
+    for name in ("retry-after-ms", "retry-after"):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            continue
+        return seconds / 1000 if name == "retry-after-ms" else seconds
+    return None
+
+
+def estimate_tokens(
+    text: str = "",
+    *,
+    image_sizes: Iterable[tuple[int, int]] = (),
+    output_tokens: int = 500,
+) -> int:
+    """
+    Rough token cost of a request for rate limiting: ~4 characters per text
+    token, ~750 pixels per image token (capped at 1600 per image), plus the
+    expected response length. Real usage is charged back after the call.
+    """
+    image_tokens = sum(min(1600, math.ceil(width * height / 750)) for width, height in image_sizes)
+    return math.ceil(len(text) / 4) + image_tokens + output_tokens
+
+
+class LLMScheduler:
+    """
+    Process-wide gate for calls to one LLM provider.
+
+    Limits how many calls run at once and how many tokens are spent per minute,
+    and retries throttled calls with exponential backoff and jitter (honouring
+    Retry-After when the provider sends it). Other errors are raised
+    immediately. ``call`` blocks and is safe to use from many threads;
+    ``acall`` runs coroutine functions under the same limits without holding
+    a thread while it waits.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        *,
+        max_concurrency: int = 4,
+        tokens_per_minute: int = 0,
+        max_retries: int = 5,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 30.0,
+    ):
+        self.provider = provider
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._slots = ConcurrencyGate(self.max_concurrency)
+        self._bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "throttled": 0,
+            "failures": 0,
+            "tokens": 0,
+            "inputTokens": 0,
+            "outputTokens": 0,
+            "cacheReadInputTokens": 0,
+            "cacheWriteInputTokens": 0,
+            "rateLimitWaitSeconds": 0.0,
+        }
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def record_usage(
+        self,
+        *,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cache_read_input_tokens: int = 0,
+        cache_write_input_tokens: int = 0,
+    ) -> None:
+        """Add one call's token breakdown, as reported by the provider, to the stats."""
+        with self._lock:
+            self._stats["inputTokens"] += input_tokens
+            self._stats["outputTokens"] += output_tokens
+            self._stats["cacheReadInputTokens"] += cache_read_input_tokens
+            self._stats["cacheWriteInputTokens"] += cache_write_input_tokens
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = retry_after_seconds(exc)
+        if hinted is not None:
+            return min(self.retry_max_seconds, hinted)
+        # Full jitter keeps concurrent callers from retrying in lockstep
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+
+    def _settle(self, result: T, estimated_tokens: int, usage: Callable[[T], Optional[int]] | None) -> None:
+        used = usage(result) if usage is not None else None
+        if used is not None:
+            self._count("tokens", used)
+            if self._bucket is not None:
+                self._bucket.adjust(used - estimated_tokens)
+
+    def _retry_delay(self, error: Exception, attempt: int, estimated_tokens: int) -> float:
+        """Seconds to wait before retrying a failed call; re-raises errors that should not be retried."""
+        if self._bucket is not None and estimated_tokens:
+            # A rejected call did not spend its reservation
+            self._bucket.adjust(-estimated_tokens)
+        if not is_throttling_error(error) or attempt >= self.max_retries:
+            self._count("failures")
+            raise error
+
+        self._count("throttled")
+        delay = self._backoff(attempt, error)
+        logger.warning(
+            "%s throttled (%s); retrying in %.1fs (%d/%d)",
+            self.provider,
+            _error_code(error) or _status_code(error),
+            delay,
+            attempt + 1,
+            self.max_retries,
+        )
+        return delay
+
+    def call(
+        self,
+        func: Callable[..., T],
+        /,
+        *args: Any,
+        estimated_tokens: int = 0,
+        usage: Callable[[T], Optional[int]] | None = None,
+        **kwargs: Any,
+    ) -> T:
+        """
+        Run ``func(*args, **kwargs)`` within this provider's limits.
+
+        ``estimated_tokens`` is reserved from the per-minute budget before the
+        call. If ``usage`` is given it maps the result to the tokens actually
+        used, and the budget is corrected by the difference.
+        """
+        attempt = 0
+        while True:
+            if self._bucket is not None and estimated_tokens:
+                waited = self._bucket.acquire(estimated_tokens)
+                if waited:
+                    self._count("rateLimitWaitSeconds", waited)
+
+            with self._slots:
+                self._count("calls")
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as exc:
+                    error = exc
+                else:
+                    error = None
+
+            if error is None:
+                self._settle(result, estimated_tokens, usage)
+                return result
+
+            time.sleep(self._retry_delay(error, attempt, estimated_tokens))
+            attempt += 1
+
+    async def acall(
+        self,
+        func: Callable[..., Awaitable[T]],
+        /,
+        *args: Any,
+        estimated_tokens: int = 0,
+        usage: Callable[[T], Optional[int]] | None = None,
+        **kwargs: Any,
+    ) -> T:
+        """Await ``func(*args, **kwargs)`` within this provider's limits. See ``call``."""
+        attempt = 0
+        while True:
+            if self._bucket is not None and estimated_tokens:
+                waited = await self._bucket.acquire_async(estimated_tokens)
+                if waited:
+                    self._count("rateLimitWaitSeconds", waited)
+
+            await self._slots.acquire_async()
+            try:
+                self._count("calls")
+                result = await func(*args, **kwargs)
+            except Exception as exc:
+                error = exc
+            else:
+                error = None
+            finally:
+                self._slots.release()
+
+            if error is None:
+                self._settle(result, estimated_tokens, usage)
+                return result
+
+            await asyncio.sleep(self._retry_delay(error, attempt, estimated_tokens))
+            attempt += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "rateLimitWaitSeconds": round(self._stats["rateLimitWaitSeconds"], 3),
+                "maxConcurrency": self.max_concurrency,
+                "tokensPerMinute": int(self._bucket.capacity) if self._bucket is not None else None,
+            }
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning("Ignoring invalid number for %s: %r", name, value)
+        return default
+
+
+_SCHEDULERS: dict[str, LLMScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_llm_scheduler(provider: str) -> LLMScheduler:
+    """
+    Return the process-wide scheduler for ``provider`` (a ModelProvider value).
+
+    Configured from LLM_<PROVIDER>_MAX_CONCURRENCY (default 4) and
+    LLM_<PROVIDER>_TOKENS_PER_MINUTE (default 0, unlimited), e.g.
+    LLM_AWS_BEDROCK_TOKENS_PER_MINUTE, plus LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_SECONDS and LLM_RETRY_MAX_SECONDS shared by all providers.
+    """
+    with _SCHEDULERS_LOCK:
+        scheduler = _SCHEDULERS.get(provider)
+        if scheduler is None:
+            prefix = f"LLM_{provider.upper()}"
+            scheduler = LLMScheduler(
+                provider,
+                max_concurrency=int(_env_number(f"{prefix}_MAX_CONCURRENCY", 4)),
+                tokens_per_minute=int(_env_number(f"{prefix}_TOKENS_PER_MINUTE", 0)),
+                max_retries=int(_env_number("LLM_MAX_RETRIES", 5)),
+                retry_base_seconds=_env_number("LLM_RETRY_BASE_SECONDS", 1.0),
+                retry_max_seconds=_env_number("LLM_RETRY_MAX_SECONDS", 30.0),
+            )
+            _SCHEDULERS[provider] = scheduler
+        return scheduler
+
+
+def llm_scheduler_stats() -> dict[str, dict[str, Any]]:
+    """Stats for every scheduler created so far, keyed by provider."""
+    with _SCHEDULERS_LOCK:
+        schedulers = dict(_SCHEDULERS)
+    return {provider: scheduler.stats() for provider, scheduler in schedulers.items()}
@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.requests import ClientDisconnect
+
+from extraction.helper.common import logging as logutil
+
+logger = logutil.get_logger("uploads")
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Allowance for multipart boundaries and part headers when comparing Content-Length to a file size limit
+MULTIPART_OVERHEAD = 64 * 1024
+# Size limits in MiB per engine, overridable with <ENGINE>_MAX_UPLOAD_MB
+UPLOAD_LIMIT_DEFAULTS_MB = {"marker": 50, "markitdown": 50, "unstructured": 10}
+# Route prefix -> engine whose limit applies before the body is read; None means the largest limit
+UPLOAD_ROUTES: dict[str, Optional[str]] = {
+    "/marker": "marker",
+    "/markitdown": "markitdown",
+    "/unstructured": "unstructured",
+    "/jobs": None,
+}
+
+# Leading bytes of each binary format. Text formats have no signature and are checked for NUL bytes instead.
+# BMP is checked separately: "BM" alone is also how plenty of text files start.
+_SIGNATURES: dict[str, tuple[bytes, ...]] = {
+    "pdf": (b"%PDF-",),
+    "ole": (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",),
+    "zip": (b"PK\x03\x04", b"PK\x05\x06"),
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "gif": (b"GIF87a", b"GIF89a"),
+    "tiff": (b"II*\x00", b"MM\x00*"),
+}
+# What an upload's extension says its content must be. Extensions not listed are not sniffed.
+EXTENSION_KINDS = {
+    ".pdf": "pdf",
+    ".doc": "ole",
+    ".xls": "ole",
+    ".ppt": "ole",
+    ".msg": "ole",
+    ".docx": "zip",
+    ".xlsx": "zip",
+    ".pptx": "zip",
+    ".epub": "zip",
+    ".zip": "zip",
+    ".png": "png",
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".gif": "gif",
+    ".bmp": "bmp",
+    ".tif": "tiff",
+    ".tiff": "tiff",
+    ".webp": "webp",
+    ".csv": "text",
+    ".txt": "text",
+    ".md": "text",
+    ".json": "text",
+    ".xml": "text",
+    ".html": "text",
+    ".htm": "text",
+}
+
+
+def upload_limit(engine: str) -> int:
+    """Largest upload accepted for ``engine``, in bytes."""
+    default = UPLOAD_LIMIT_DEFAULTS_MB.get(engine, max(UPLOAD_LIMIT_DEFAULTS_MB.values()))
+    name = f"{engine.upper()}_MAX_UPLOAD_MB"
+    try:
+        megabytes = float(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s", name)
+        megabytes = default
+    return int(megabytes * 1024 * 1024)
+
+
+def _limit_detail(limit: int) -> str:
+    return f"File size exceeds {limit / (1024 * 1024):g}MB"
+
+
+def matches_kind(head: bytes, kind: str) -> bool:
+    """Whether a file's first bytes fit ``kind`` (a key of _SIGNATURES, ``bmp``, ``webp`` or ``text``)."""
+    if kind == "pdf":
+        # The PDF header may follow a few bytes of junk; readers accept it anywhere in the first KiB
+        return b"%PDF-" in head[:1024]
+    if kind == "bmp":
+        # "BM", the file size, then four reserved zero bytes
+        return head.startswith(b"BM") and head[6:10] == b"\x00\x00\x00\x00"
+    if kind == "webp":
+        return head[:4] == b"RIFF" and head[8:12] == b"WEBP"
+    if kind == "text":
+        # UTF-16 text is full of NUL bytes but always starts with a byte order mark when Excel or Notepad writes it
+        return head.startswith((b"\xff\xfe", b"\xfe\xff")) or b"\x00" not in head[:8192]
+    return head.startswith(_SIGNATURES[kind])
+
+
+def sniff_kind(head: bytes) -> Optional[str]:
+    """
+    Format of a file from its first bytes: a key of _SIGNATURES, ``bmp``,
+    ``webp``, ``text`` (no NUL bytes), or None if it is none of those. Only
+    signatures at the very start count.
+    """
+    for kind, signatures in _SIGNATURES.items():
+        if head.startswith(signatures):
+            return kind
+    for kind in ("bmp", "webp", "text"):
+        if matches_kind(head, kind):
+            return kind
+    return None
+
+
+def check_file_type(filename: str, head: bytes, *, required_kind: Optional[str] = None) -> str:
+    """
+    Reject an upload whose leading bytes do not match ``required_kind``, or
+    the kind its extension implies. Only that kind is checked for, so text
+    that happens to start like a binary signature is still accepted as text.
+    Returns the kind the content was accepted as.
+    """
+    expected = required_kind or EXTENSION_KINDS.get(Path(filename).suffix.lower())
+    if expected is None:
+        return sniff_kind(head) or "unknown"
+    if not matches_kind(head, expected):
+        logger.info("Rejected %s: content sniffed as %s, expected %s", filename, sniff_kind(head) or "unknown", expected)
+        if required_kind is not None:
+            detail = f"File content is not a {required_kind.upper()}"
+        else:
+            detail = f"File content does not match its {Path(filename).suffix.lower()} extension"
+        raise HTTPException(status_code=int(HTTPStatus.UNSUPPORTED_MEDIA_TYPE), detail=detail)
+    return expected
+
+
+@dataclass
+class StoredUpload:
+    """
+    An upload after validation: where it is, its SHA-256, size and sniffed
+    kind. Uploads kept in memory have ``data`` set and no ``path``.
+    """
+
+    path: Optional[Path]
+    sha256: str
+    size: int
+    kind: str
+    data: Optional[bytes] = None
+
+    @property
+    def source(self) -> str | bytes | None:
+        """What to hand an engine: the upload's bytes if it was kept in memory, else its path."""
+        if self.data is not None:
+            return self.data
+        return str(self.path) if self.path is not None else None
+
+
+def upload_memory_limit() -> int:
+    """Largest upload kept in memory instead of on disk (UPLOAD_MEMORY_MAX_MB, 0 = always disk), in bytes."""
+    try:
+        megabytes = float(os.getenv("UPLOAD_MEMORY_MAX_MB", 8))
+    except ValueError:
+        logger.warning("Ignoring invalid UPLOAD_MEMORY_MAX_MB")
+        megabytes = 8
+    return int(max(0.0, megabytes) * 1024 * 1024)
+
+
+async def _stream_upload(
+    chunks,
+    *,
+    filename: str,
+    engine: str,
+    required_kind: Optional[str],
+    destination: Optional[Path],
+    memory_limit: int = 0,
+) -> StoredUpload:
+    limit = upload_limit(engine)
+    digest = hashlib.sha256()
+    size = 0
+    kind = None
+    buffered: list[bytes] = []
+    out = None
+    try:
+        async for chunk in chunks:
+            if kind is None:
+                # Checked before anything is kept, on the first chunk only
+                kind = check_file_type(filename, chunk, required_kind=required_kind)
+            size += len(chunk)
+            if size > limit:
+                raise HTTPException(status_code=int(HTTPStatus.REQUEST_ENTITY_TOO_LARGE), detail=_limit_detail(limit))
+            digest.update(chunk)
+            if destination is None:
+                continue
+            if out is None and size <= memory_limit:
+                buffered.append(chunk)
+                continue
+            if out is None:
+                # Past the memory limit (or none was given): spill what is buffered and write the rest through
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                out = open(destination, "wb")
+                out.writelines(buffered)
+                buffered.clear()
+            out.write(chunk)
+        if kind is None:
+            raise HTTPException(status_code=int(HTTPStatus.BAD_REQUEST), detail="Uploaded file is empty")
+    except ClientDisconnect as exc:
+        # Also how UploadSizeLimitMiddleware cuts off a body that runs past the limit
+        if out is not None:
+            out.close()
+            destination.unlink(missing_ok=True)
+        raise HTTPException(status_code=int(HTTPStatus.BAD_REQUEST), detail="Upload was interrupted") from exc
+    except BaseException:
+        if out is not None:
+            out.close()
+            destination.unlink(missing_ok=True)
+        raise
+    if out is not None:
+        out.close()
+    elif destination is not None:
+        return StoredUpload(path=None, sha256=digest.hexdigest(), size=size, kind=kind, data=b"".join(buffered))
+    return StoredUpload(path=destination, sha256=digest.hexdigest(), size=size, kind=kind)
+
+
+async def _upload_chunks(file: UploadFile):
+    await file.seek(0)
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+async def check_upload(file: UploadFile, *, engine: str, required_kind: Optional[str] = None) -> StoredUpload:
+    """
+    Validate a multipart upload where it is (no copy) and hash it in the same
+    pass. Raises 413 past the engine's limit and 415 if its content does not
+    match ``required_kind`` or its extension. The upload is rewound afterwards.
+    """
+    if file.size is not None and file.size > upload_limit(engine):
+        raise HTTPException(
+            status_code=int(HTTPStatus.REQUEST_ENTITY_TOO_LARGE), detail=_limit_detail(upload_limit(engine))
+        )
+    stored = await _stream_upload(
+        _upload_chunks(file),
+        filename=file.filename or "",
+        engine=engine,
+        required_kind=required_kind,
+        destination=None,
+    )
+    await file.seek(0)
+    return stored
+
+
+async def save_upload(
+    file: UploadFile,
+    destination: str | Path,
+    *,
+    engine: str,
+    required_kind: Optional[str] = None,
+    keep_in_memory: bool = False,
+) -> StoredUpload:
+    """
+    Write a multipart upload to ``destination`` in chunks, checking its type on
+    the first chunk and its size and SHA-256 as it goes, so a rejected upload
+    costs no more than one chunk of disk I/O.
+
+    With ``keep_in_memory``, uploads up to UPLOAD_MEMORY_MAX_MB are returned in
+    ``data`` instead and ``destination`` (and its folder) is only created for
+    larger ones.
+    """
+    if file.size is not None and file.size > upload_limit(engine):
+        raise HTTPException(
+            status_code=int(HTTPStatus.REQUEST_ENTITY_TOO_LARGE), detail=_limit_detail(upload_limit(engine))
+        )
+    return await _stream_upload(
+        _upload_chunks(file),
+        filename=file.filename or "",
+        engine=engine,
+        required_kind=required_kind,
+        destination=Path(destination),
+        memory_limit=upload_memory_limit() if keep_in_memory else 0,
+    )
+
+
+async def save_request_body(
+    request,
+    destination: str | Path,
+    *,
+    filename: str,
+    engine: str,
+    required_kind: Optional[str] = None,
+    keep_in_memory: bool = False,
+) -> StoredUpload:
+    """Like save_upload, for a raw (non-multipart) request body, read from the client as it arrives."""
+    return await _stream_upload(
+        (chunk async for chunk in request.stream() if chunk),
+        filename=filename,
+        engine=engine,
+        required_kind=required_kind,
+        destination=Path(destination),
+        memory_limit=upload_memory_limit() if keep_in_memory else 0,
+    )
+
+
+@contextmanager
+def memory_file(data: bytes, *, suffix: str = "") -> Iterator[str]:
+    """
+    A path to ``data`` for libraries that only open files by name.
+
+    On Linux the bytes go into a memfd and the path is its /proc entry, so
+    nothing touches the filesystem; elsewhere they are written to a temporary
+    file that is removed on exit.
+    """
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create(f"upload{suffix}", os.MFD_CLOEXEC)
+        try:
+            with open(fd, "wb", closefd=False) as handle:
+                handle.write(data)
+            yield f"/proc/self/fd/{fd}"
+        finally:
+            os.close(fd)
+        return
+    handle = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    try:
+        with handle:
+            handle.write(data)
+        yield handle.name
+    finally:
+        os.unlink(handle.name)
+
+
+def _route_limit(path: str) -> Optional[int]:
+    for prefix, engine in UPLOAD_ROUTES.items():
+        if path == prefix or path.startswith(prefix + "/"):
+            if engine is None:
+                return max(upload_limit(name) for name in UPLOAD_LIMIT_DEFAULTS_MB)
+            return upload_limit(engine)
+    return None
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject request bodies larger than the target engine's upload limit before
+    they are parsed.
+
+    A Content-Length over the limit gets 413 without a byte of the body being
+    read. Bodies without one (chunked uploads) are counted as they arrive and
+    cut off with 413 as soon as they pass the limit, instead of being spooled
+    to disk in full first. Routes and engines are mapped in UPLOAD_ROUTES.
+
+    The check allows MULTIPART_OVERHEAD on top of the limit for form framing;
+    save_upload and check_upload enforce the exact limit on the file itself,
+    including the engine's own limit for /jobs.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope.get("method") not in {"POST", "PUT"}:
+            await self.app(scope, receive, send)
+            return
+        limit = _route_limit(scope.get("path", ""))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit + MULTIPART_OVERHEAD:
+            await _send_too_large(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> dict:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit + MULTIPART_OVERHEAD:
+                    exceeded = True
+                    # Looks like a disconnect to the app, which stops reading and gives up on the request
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: dict) -> None:
+            nonlocal response_started
+            if exceeded:
+                # The app's own error for the cut-off body is replaced by the 413 below
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            await _send_too_large(send, limit)
+
+
+async def _send_too_large(send: Any, limit: int) -> None:
+    body = json.dumps({"detail": _limit_detail(limit)}).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": int(HTTPStatus.REQUEST_ENTITY_TOO_LARGE),
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
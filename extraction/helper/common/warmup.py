@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+from extraction.helper.common import logging as logutil
+
+logger = logutil.get_logger("warmup")
+
+DEFAULT_WARMUP_PDF = Path(__file__).resolve().parents[3] / "sample_docs" / "sample_docs.pdf"
+
+
+def _preload_marker(warmup_pdf: Optional[str]) -> None:
+    from extraction.helper.marker.markerHelper import preload_models
+
+    preload_models(warmup_pdf)
+
+
+def _preload_unstructured(warmup_pdf: Optional[str]) -> None:
+    from extraction.helper.unstructured.unstructuredHelper import UnstructuredHelper
+
+    UnstructuredHelper.preload_models(warmup_pdf)
+
+
+def _preload_libreoffice(_warmup_pdf: Optional[str]) -> None:
+    from extraction.helper.common.libreoffice import get_libreoffice_pool
+
+    pool = get_libreoffice_pool()
+    if pool is None:
+        raise RuntimeError("LibreOffice pool is disabled or soffice is not installed")
+    pool.warm()
+
+
+# Engines that load models (or start worker processes) and can be preloaded at startup.
+ENGINE_PRELOADERS: dict[str, Callable[[Optional[str]], None]] = {
+    "marker": _preload_marker,
+    "unstructured": _preload_unstructured,
+    "libreoffice": _preload_libreoffice,
+}
+
+
+class EngineState:
+    """Load state of a single engine, as reported by /ready."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = "pending"
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "loadSeconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+_STATES: dict[str, EngineState] = {}
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def configured_engines() -> list[str]:
+    """Engines listed in PRELOAD_ENGINES (comma separated), e.g. ``marker,unstructured``."""
+    raw = os.getenv("PRELOAD_ENGINES", "")
+    engines: list[str] = []
+    for name in (part.strip().lower() for part in raw.split(",")):
+        if not name:
+            continue
+        if name not in ENGINE_PRELOADERS:
+            logger.warning("Ignoring unknown engine in PRELOAD_ENGINES: %s", name)
+            continue
+        if name not in engines:
+            engines.append(name)
+    return engines
+
+
+def _warmup_pdf() -> Optional[str]:
+    if not _env_flag("WARMUP_INFERENCE"):
+        return None
+    path = Path(os.getenv("WARMUP_SAMPLE_PDF") or DEFAULT_WARMUP_PDF)
+    if not path.exists():
+        logger.warning("Warm-up sample %s not found; skipping warm-up inference", path)
+        return None
+    return str(path)
+
+
+def _forks_workers(engine: str) -> bool:
+    from extraction.helper.common.executor import ENGINE_DEFAULTS, get_engine_executor
+
+    return engine in ENGINE_DEFAULTS and get_engine_executor(engine).mode == "fork"
+
+
+def _load_engine(state: EngineState, warmup_pdf: Optional[str]) -> None:
+    state.status = "loading"
+    start = time.perf_counter()
+    forked = _forks_workers(state.name)
+    if forked and warmup_pdf is not None:
+        # Inference starts thread pools (OpenMP, torch) that do not survive a fork
+        logger.info("Skipping warm-up inference for %s: its workers are forked from this process", state.name)
+        warmup_pdf = None
+    try:
+        ENGINE_PRELOADERS[state.name](warmup_pdf)
+    except Exception as exc:  # noqa: BLE001
+        state.status = "failed"
+        state.error = str(exc)
+        logger.error("Failed to preload %s: %s", state.name, exc, exc_info=True)
+    else:
+        # Fork engines stay loading until their workers are started
+        if not forked:
+            state.status = "ready"
+        logger.info("Preloaded %s in %.1fs", state.name, time.perf_counter() - start)
+    finally:
+        state.load_seconds = round(time.perf_counter() - start, 3)
+
+
+def _start_forked_workers(states: list[EngineState]) -> None:
+    """
+    Fork the workers of each loaded fork-mode engine, one engine at a time.
+
+    Called on the event loop thread once every preload has finished and its
+    threads have exited, before the server takes requests, so no other thread
+    is importing, loading or logging (and holding a lock the children would
+    inherit) while it forks.
+    """
+    from extraction.helper.common.executor import get_engine_executor
+
+    for state in states:
+        if state.status != "loading":
+            continue
+        start = time.perf_counter()
+        try:
+            # The weights are loaded, so the workers share them copy-on-write
+            get_engine_executor(state.name).start()
+        except Exception as exc:  # noqa: BLE001
+            state.status = "failed"
+            state.error = str(exc)
+            logger.error("Failed to start %s workers: %s", state.name, exc, exc_info=True)
+        else:
+            state.status = "ready"
+            logger.info("Forked %s workers in %.1fs", state.name, time.perf_counter() - start)
+        finally:
+            state.load_seconds = round((state.load_seconds or 0) + time.perf_counter() - start, 3)
+
+
+async def start_preloading() -> Optional[asyncio.Future]:
+    """
+    Register the engines in PRELOAD_ENGINES as pending and load them.
+
+    Engines load in parallel, off the event loop. Normally they load in the
+    background, and the returned future finishes when they are done, so the
+    server can answer /ready (with 503) while models are still loading. If
+    any engine runs in fork mode, this waits for every preload instead and then
+    forks the workers before returning, so before the server starts serving.
+    """
+    engines = configured_engines()
+    for name in engines:
+        _STATES[name] = EngineState(name)
+    if not engines:
+        return None
+
+    warmup_pdf = _warmup_pdf()
+    logger.info("Preloading engines: %s (warm-up inference: %s)", ", ".join(engines), bool(warmup_pdf))
+    loop = asyncio.get_running_loop()
+    # Own threads rather than the loop's default executor, so they can be joined before forking
+    pool = ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix="preload")
+    loads = asyncio.gather(
+        *(loop.run_in_executor(pool, _load_engine, _STATES[name], warmup_pdf) for name in engines)
+    )
+    forked = [_STATES[name] for name in engines if _forks_workers(name)]
+    if not forked:
+        loads.add_done_callback(lambda _: pool.shutdown(wait=False))
+        return loads
+    try:
+        await loads
+    finally:
+        pool.shutdown(wait=True)
+    _start_forked_workers(forked)
+    return None
+
+
+def readiness() -> tuple[bool, dict[str, dict]]:
+    """Return (ready, per-engine state). Ready once every preloaded engine has loaded."""
+    engines = {name: state.to_dict() for name, state in _STATES.items()}
+    ready = all(state.status == "ready" for state in _STATES.values())
+    return ready, engines
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import os
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.common.cache import cached_extraction, hash_file, make_cache_key
+from extraction.helper.common.imagestore import default_image_mode, image_output_options
+from extraction.helper.common.executor import run_in_engine
+from extraction.helper.common.markdown import sanitize_markdown_output
+from extraction.helper.common.pdfrouting import routing_enabled, routing_thresholds
+from extraction.helper.jobs.store import JobStore
+from extraction.helper.schemas.types import ExtractionEngine, ImageMode, UnstructuredStrategy
+
+logger = logutil.get_logger("job-runner")
+
+# (cache engine name, cache key options, coroutine function producing the result from the input's path)
+Preparation = tuple[str, dict[str, Any], Callable[[str], Awaitable[dict[str, Any]]]]
+
+
+def _image_mode(job: dict[str, Any]) -> ImageMode:
+    mode = job["options"].get("imageMode")
+    return ImageMode(mode) if mode else default_image_mode()
+
+
+def _partition_file(
+    file_path: str,
+    *,
+    filename: str | None,
+    content_type: str | None,
+    parsing_config: dict[str, Any],
+    use_routing: bool = False,
+    spreadsheet_limits: Optional[dict[str, Optional[int]]] = None,
+    image_mode: Optional[ImageMode] = None,
+) -> tuple[str | None, list[dict[str, Any]] | None]:
+    from extraction.helper.unstructured.spreadsheetHelper import convert_spreadsheet_to_markdown
+    from extraction.helper.unstructured.unstructuredHelper import UnstructuredHelper
+
+    with open(file_path, "rb") as fh:
+        if spreadsheet_limits is not None:
+            markdown = convert_spreadsheet_to_markdown(
+                fh,
+                filename=filename,
+                max_rows=spreadsheet_limits["maxRows"],
+                max_columns=spreadsheet_limits["maxColumns"],
+            )
+            return markdown, None
+        if use_routing:
+            return UnstructuredHelper.partition_pdf_with_routing(
+                fh,
+                filename=filename,
+                content_type=content_type,
+                parsing_config=parsing_config,
+                include_images=image_mode != ImageMode.NONE,
+                image_mode=image_mode,
+            )
+        markdown = UnstructuredHelper.partition_to_markdown(
+            fh,
+            filename=filename,
+            content_type=content_type,
+            parsing_config=parsing_config,
+            include_images=image_mode != ImageMode.NONE,
+            image_mode=image_mode,
+        )
+        return markdown, None
+
+
+async def _prepare_marker(job: dict[str, Any]) -> Preparation:
+    from extraction.helper.marker.markerHelper import convert_pdf_to_markdown, convert_pdf_to_markdown_with_routing
+
+    use_routing = routing_enabled()
+    image_mode = _image_mode(job)
+    include_images = image_mode != ImageMode.NONE
+
+    async def compute(input_path: str) -> dict[str, Any]:
+        page_routes = None
+        if use_routing:
+            text, page_routes = await run_in_engine(
+                "marker",
+                convert_pdf_to_markdown_with_routing,
+                input_pdf=input_path,
+                include_images=include_images,
+                image_mode=image_mode,
+            )
+        else:
+            text = await run_in_engine(
+                "marker",
+                convert_pdf_to_markdown,
+                input_pdf=input_path,
+                include_images=include_images,
+                image_mode=image_mode,
+            )
+        return {"markdown": sanitize_markdown_output(text or ""), "pageRoutes": page_routes}
+
+    options: dict[str, Any] = {"include_images": include_images, "images": image_output_options(image_mode)}
+    if use_routing:
+        options["routing"] = routing_thresholds()
+    return "marker", options, compute
+
+
+async def _prepare_marker_structured(job: dict[str, Any]) -> Preparation:
+    from extraction.helper.marker.markerHelper import extract_structured_markdown_and_json, structured_llm_fingerprint
+
+    schema = job["options"]["schema"]
+    image_mode = _image_mode(job)
+    include_images = image_mode != ImageMode.NONE
+
+    async def compute(input_path: str) -> dict[str, Any]:
+        markdown, analysis, document_json = await run_in_engine(
+            "marker",
+            extract_structured_markdown_and_json,
+            input_pdf=input_path,
+            schema=schema,
+            include_images=include_images,
+            image_mode=image_mode,
+        )
+        return {
+            "markdown": sanitize_markdown_output(markdown or ""),
+            "structured": json.loads(document_json),
+            "analysis": analysis,
+        }
+
+    options = {
+        "schema": schema,
+        "include_images": include_images,
+        "images": image_output_options(image_mode),
+        "llm": structured_llm_fingerprint(),
+    }
+    return "marker-structured", options, compute
+
+
+async def _prepare_markitdown(job: dict[str, Any]) -> Preparation:
+    from extraction.helper.markitdown.markitdownHelper import conversion_fingerprint, convert_file_to_markdown
+
+    is_pdf_upload = bool(job["options"].get("isPdf"))
+    image_mode = _image_mode(job)
+
+    async def compute(input_path: str) -> dict[str, Any]:
+        text = await run_in_engine(
+            "markitdown",
+            convert_file_to_markdown,
+            input_path,
+            is_pdf_upload=is_pdf_upload,
+            request_id=job["id"],
+            image_mode=image_mode,
+        )
+        if is_pdf_upload:
+            text = sanitize_markdown_output(text or "")
+        return {"markdown": text}
+
+    options = {
+        "extension": os.path.splitext((job["file_name"] or "").lower())[1],
+        **conversion_fingerprint(is_pdf_upload=is_pdf_upload, image_mode=image_mode),
+    }
+    return "markitdown", options, compute
+
+
+async def _prepare_unstructured(job: dict[str, Any]) -> Preparation:
+    from extraction.helper.unstructured.spreadsheetHelper import native_spreadsheet_limits
+    from extraction.helper.unstructured.unstructuredHelper import UnstructuredHelper
+
+    strategy = job["options"].get("strategy")
+    image_mode = _image_mode(job)
+    include_images = image_mode != ImageMode.NONE
+    parsing_config = await UnstructuredHelper().get_parsing_config(
+        job["file_name"], UnstructuredStrategy(strategy) if strategy else None, include_images=include_images
+    )
+    use_routing = strategy is None and Path(job["file_name"]).suffix.lower() == ".pdf" and routing_enabled()
+    limits = native_spreadsheet_limits(
+        job["file_name"], job["options"].get("maxRows"), job["options"].get("maxColumns")
+    )
+
+    async def compute(input_path: str) -> dict[str, Any]:
+        markdown, page_routes = await run_in_engine(
+            "unstructured",
+            _partition_file,
+            input_path,
+            filename=job["file_name"],
+            content_type=job["content_type"],
+            parsing_config=parsing_config,
+            use_routing=use_routing,
+            spreadsheet_limits=limits,
+            image_mode=image_mode,
+        )
+        if markdown is None:
+            raise HTTPException(
+                status_code=int(HTTPStatus.UNPROCESSABLE_ENTITY),
+                detail="Errors when extracting text",
+            )
+        return {"markdown": markdown, "pageRoutes": page_routes}
+
+    options: dict[str, Any] = {
+        "extension": Path(job["file_name"]).suffix,
+        "parsing_config": parsing_config,
+        "include_images": include_images,
+        "images": image_output_options(image_mode),
+    }
+    if use_routing:
+        options["routing"] = routing_thresholds()
+    if limits is not None:
+        options = {"extension": Path(job["file_name"]).suffix, "spreadsheet": limits}
+    return "unstructured", options, compute
+
+
+_PREPARERS = {
+    ExtractionEngine.MARKER: _prepare_marker,
+    ExtractionEngine.MARKER_STRUCTURED: _prepare_marker_structured,
+    ExtractionEngine.MARKITDOWN: _prepare_markitdown,
+    ExtractionEngine.UNSTRUCTURED: _prepare_unstructured,
+}
+
+
+async def run_job_extraction(job: dict[str, Any]) -> dict[str, Any]:
+    """
+    Run one stored job through its engine and return the same body the
+    synchronous /extracts route would have returned.
+
+    Uses the same executors, result cache keys and in-flight coalescing as the
+    routes, so a job and a direct request for the same document share work.
+    """
+    engine = ExtractionEngine(job["engine"])
+    cache_engine, options, compute = await _PREPARERS[engine](job)
+    content_sha256 = await asyncio.to_thread(hash_file, job["input_path"])
+    result, cache_hit = await cached_extraction(
+        make_cache_key(content_sha256, cache_engine, options), compute, job["input_path"]
+    )
+
+    # Copy before moving routing into metadata: the result may be the cached object itself
+    result = dict(result)
+    page_routes = result.pop("pageRoutes", None)
+    metadata: dict[str, Any] = {
+        "fileName": job["file_name"],
+        "fileSize": str(job["file_size"]),
+        "creationDate": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+        "cacheHit": cache_hit,
+    }
+    if page_routes is not None:
+        metadata["pageRoutes"] = page_routes
+    return {**result, "metadata": metadata}
+
+
+class JobWorkers:
+    """
+    Background workers that drain the job store.
+
+    Workers claim jobs from the store (so jobs survive restarts and can be
+    shared by several server processes), run them and record the result. A
+    cleanup task periodically purges expired jobs.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        *,
+        concurrency: int = 2,
+        poll_interval: float = 1.0,
+        cleanup_interval: float = 300.0,
+    ):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.cleanup_interval = cleanup_interval
+        self._wake = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._work(n)) for n in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._cleanup()))
+        logger.info("Started %d job workers", self.concurrency)
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was submitted."""
+        self._wake.set()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    async def _work(self, worker_num: int) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim_next)
+            if job is None:
+                await self._wait_for_work()
+                continue
+
+            job_id = job["id"]
+            logger.info("[%s] Worker %d running %s job", job_id, worker_num, job["engine"])
+            try:
+                result = await run_job_extraction(job)
+            except asyncio.CancelledError:
+                # Shutting down: leave the job for the next start
+                await asyncio.to_thread(self.store.requeue, job_id)
+                raise
+            except HTTPException as exc:
+                if exc.status_code == int(HTTPStatus.SERVICE_UNAVAILABLE):
+                    logger.info("[%s] Engine busy; requeueing job", job_id)
+                    await asyncio.to_thread(self.store.requeue, job_id)
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await asyncio.to_thread(self.store.fail, job_id, str(exc.detail))
+            except Exception as exc:  # noqa: BLE001
+                logger.error("[%s] Job failed: %s", job_id, exc, exc_info=True)
+                await asyncio.to_thread(self.store.fail, job_id, str(exc))
+            else:
+                await asyncio.to_thread(self.store.complete, job_id, result)
+                logger.info("[%s] Job succeeded", job_id)
+
+    async def _cleanup(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.store.purge_expired)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Job cleanup failed: %s", exc)
+            await asyncio.sleep(self.cleanup_interval)
+
+
+_WORKERS: Optional[JobWorkers] = None
+
+
+def get_job_workers() -> JobWorkers:
+    """Process-wide job workers configured from JOB_WORKERS, JOB_POLL_INTERVAL_SECONDS and JOB_CLEANUP_INTERVAL_SECONDS."""
+    global _WORKERS
+    if _WORKERS is None:
+        from extraction.helper.jobs.store import get_job_store
+
+        _WORKERS = JobWorkers(
+            get_job_store(),
+            concurrency=int(os.getenv("JOB_WORKERS", 2)),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL_SECONDS", 1.0)),
+            cleanup_interval=float(os.getenv("JOB_CLEANUP_INTERVAL_SECONDS", 300)),
+        )
+    return _WORKERS
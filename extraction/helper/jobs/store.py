@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+from uuid import uuid4
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.schemas.types import JobStatus
+
+logger = logutil.get_logger("job-store")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    engine TEXT NOT NULL,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL,
+    file_name TEXT,
+    file_size INTEGER,
+    content_type TEXT,
+    input_path TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at);
+"""
+
+
+class JobStore:
+    """
+    SQLite-backed store for extraction jobs and their results.
+
+    Each job owns a directory under ``root`` holding its uploaded input until the
+    job finishes. Several worker processes can share one store: jobs are claimed
+    inside an immediate transaction, so each queued job runs once.
+    """
+
+    def __init__(self, root: str | Path, *, ttl_seconds: float = 86400, stale_seconds: float = 3600):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.root / "jobs.sqlite3", isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def new_job_id(self) -> str:
+        return str(uuid4())
+
+    def create(
+        self,
+        job_id: str,
+        *,
+        engine: str,
+        options: dict[str, Any],
+        file_name: str | None,
+        file_size: int | None,
+        content_type: str | None,
+        input_path: str,
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, engine, status, options, file_name, file_size, content_type, input_path,"
+                " created_at, updated_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    engine,
+                    JobStatus.QUEUED.value,
+                    json.dumps(options),
+                    file_name,
+                    file_size,
+                    content_type,
+                    input_path,
+                    now,
+                    now,
+                    now + self.ttl_seconds,
+                ),
+            )
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ? AND expires_at > ?", (job_id, time.time())
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def claim_next(self) -> Optional[dict[str, Any]]:
+        """
+        Mark the oldest queued job as running and return it, or None if the queue is empty.
+
+        Jobs left running for longer than ``stale_seconds`` (e.g. the worker died)
+        are claimed again.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE (status = ? OR (status = ? AND updated_at < ?)) AND expires_at > ?"
+                    " ORDER BY created_at LIMIT 1",
+                    (JobStatus.QUEUED.value, JobStatus.RUNNING.value, now - self.stale_seconds, now),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                        (JobStatus.RUNNING.value, now, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._row_to_dict(row)
+        job["status"] = JobStatus.RUNNING.value
+        return job
+
+    def requeue(self, job_id: str) -> None:
+        """Put a claimed job back in the queue, e.g. when its engine is saturated."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                (JobStatus.QUEUED.value, time.time(), job_id),
+            )
+
+    def complete(self, job_id: str, result: dict[str, Any]) -> None:
+        self._finish(job_id, JobStatus.SUCCEEDED, result=json.dumps(result, default=str), error=None)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._finish(job_id, JobStatus.FAILED, result=None, error=error)
+
+    def _finish(self, job_id: str, status: JobStatus, *, result: str | None, error: str | None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, input_path = NULL, updated_at = ?,"
+                " expires_at = ? WHERE id = ?",
+                (status.value, result, error, now, now + self.ttl_seconds, job_id),
+            )
+        # The input is no longer needed once the job has a final state
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def purge_expired(self) -> int:
+        """Delete expired jobs and their files. Returns the number of jobs removed."""
+        now = time.time()
+        with self._lock:
+            ids = [row["id"] for row in self._conn.execute("SELECT id FROM jobs WHERE expires_at <= ?", (now,))]
+            if ids:
+                self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in ids])
+        for job_id in ids:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        if ids:
+            logger.info("Purged %d expired jobs", len(ids))
+        return len(ids)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> dict[str, Any]:
+        job = dict(row)
+        job["options"] = json.loads(job["options"]) if job["options"] else {}
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+_STORE: Optional[JobStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Process-wide job store configured from JOBS_DIR, JOB_TTL_SECONDS and JOB_STALE_SECONDS."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = JobStore(
+                os.getenv("JOBS_DIR", "/tmp/extraction-jobs"),
+                ttl_seconds=float(os.getenv("JOB_TTL_SECONDS", 86400)),
+                stale_seconds=float(os.getenv("JOB_STALE_SECONDS", 3600)),
+            )
+        return _STORE
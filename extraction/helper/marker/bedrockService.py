@@ -1,23 +1,70 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
-import time
-from typing import Annotated, List
+from typing import Annotated, Any, List
 
-import boto3
 import PIL
-import certifi
-from botocore.config import Config as BotocoreConfig
 from marker.logger import get_logger
 from marker.schema.blocks import Block
 from marker.services import BaseService
 from pydantic import BaseModel
 
+from extraction.helper.common.bedrock import get_async_bedrock_invoker, run_on_bedrock_loop, submit_to_bedrock_loop
+from extraction.helper.common.ratelimit import estimate_tokens, get_llm_scheduler, is_throttling_error
+from extraction.helper.schemas.types import ModelProvider
+
 logger = get_logger()
 
+# Bedrock Claude models that accept cache_control blocks; others reject the field
+PROMPT_CACHING_MODELS = (
+    "claude-3-5-haiku",
+    "claude-3-5-sonnet-20241022",
+    "claude-3-7-sonnet",
+    "claude-sonnet-4",
+    "claude-opus-4",
+    "claude-haiku-4",
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _system_prompt(response_schema: type[BaseModel]) -> str:
+    """System prompt for a response schema, built once per schema. The schema is sent as compact JSON."""
+    schema_json = json.dumps(response_schema.model_json_schema(), separators=(",", ":"))
+    return (
+        "Follow the instructions given by the user prompt. "
+        "You must provide your response in JSON format matching this schema:\n\n"
+        f"{schema_json}\n\n"
+        "Respond only with the JSON schema, nothing else."
+    )
+
+
+def prompt_caching_supported(model_id: str, setting: str = "auto") -> bool:
+    """
+    Whether to mark the system prompt for provider-side caching: ``true`` or
+    ``false`` force it, ``auto`` enables it for models in PROMPT_CACHING_MODELS.
+    """
+    setting = (setting or "auto").strip().lower()
+    if setting in {"1", "true", "yes", "on"}:
+        return True
+    if setting in {"0", "false", "no", "off"}:
+        return False
+    return any(name in model_id for name in PROMPT_CACHING_MODELS)
+
 
 class BedrockClaudeService(BaseService):
-    """Marker-compatible LLM service backed by AWS Bedrock Claude models."""
+    """
+    Marker-compatible LLM service backed by AWS Bedrock Claude models.
+
+    Calls run on the shared Bedrock event loop over a pooled HTTP client, so
+    concurrent block calls share connections. Throttled calls are retried by
+    the provider's LLM scheduler; the service itself only retries answers that
+    are empty or do not match the schema. Marker calls the service
+    synchronously from its own worker threads, and each of those threads
+    waits for its call to finish. Only async callers awaiting ``acall`` avoid
+    holding a thread per call.
+    """
 
     bedrock_model_id: Annotated[
         str,
@@ -28,6 +75,10 @@ class BedrockClaudeService(BaseService):
     aws_secret_access_key = None
     aws_session_token = None
     anthropic_version: Annotated[str, "Anthropic Bedrock protocol version."] = "bedrock-2023-05-31"
+    bedrock_prompt_caching: Annotated[
+        str,
+        "Mark the system prompt for Bedrock prompt caching: auto (supported models only), true or false.",
+    ] = "auto"
 
     def process_images(self, images: List[PIL.Image.Image]) -> list:
         if isinstance(images, PIL.Image.Image):
@@ -45,23 +96,26 @@ class BedrockClaudeService(BaseService):
             for img in images
         ]
 
-    def _get_client(self):
-        kwargs = {
-            "service_name": "bedrock-runtime",
-            "region_name": self.aws_region,
-            "verify": certifi.where(),
-            "config": BotocoreConfig(
-                connect_timeout=5,
-                read_timeout=self.timeout,
-                retries={"max_attempts": max(1, self.max_retries + 1), "mode": "standard"},
-            ),
-        }
-        if self.aws_access_key_id and self.aws_secret_access_key:
-            kwargs["aws_access_key_id"] = self.aws_access_key_id
-            kwargs["aws_secret_access_key"] = self.aws_secret_access_key
-        if self.aws_session_token:
-            kwargs["aws_session_token"] = self.aws_session_token
-        return boto3.client(**kwargs)
+    def _get_invoker(self, timeout: int):
+        return get_async_bedrock_invoker(
+            region=self.aws_region,
+            aws_access_key_id=self.aws_access_key_id,
+            aws_secret_access_key=self.aws_secret_access_key,
+            aws_session_token=self.aws_session_token,
+            read_timeout=timeout,
+        )
+
+    @staticmethod
+    def _tokens_used(payload: dict) -> int | None:
+        usage = payload.get("usage") or {}
+        if not usage:
+            return None
+        # Cache reads are cheap and not counted; cache writes are processed like normal input
+        return (
+            int(usage.get("input_tokens", 0))
+            + int(usage.get("cache_creation_input_tokens", 0))
+            + int(usage.get("output_tokens", 0))
+        )
 
     def _validate_response(self, response_text: str, schema: type[BaseModel]) -> dict:
         text = response_text.strip()
@@ -82,34 +136,25 @@ class BedrockClaudeService(BaseService):
                     payload["document_json"] = json.dumps(payload["document_json"], ensure_ascii=False)
                 return schema.model_validate(payload).model_dump()
 
-    def __call__(
+    def _build_request(
         self,
         prompt: str,
         image: PIL.Image.Image | List[PIL.Image.Image] | None,
-        block: Block | None,
         response_schema: type[BaseModel],
-        max_retries: int | None = None,
-        timeout: int | None = None,
-    ):
-        if max_retries is None:
-            max_retries = self.max_retries
-        if timeout is None:
-            timeout = self.timeout
-
-        schema_example = response_schema.model_json_schema()
-        system_prompt = (
-            "Follow the instructions given by the user prompt. "
-            "You must provide your response in JSON format matching this schema:\n\n"
-            f"{json.dumps(schema_example, indent=2)}\n\n"
-            "Respond only with the JSON schema, nothing else."
-        )
+    ) -> tuple[dict[str, Any], int]:
+        """Return the InvokeModel body and its estimated token cost."""
+        system_prompt = _system_prompt(response_schema)
+        system: str | list[dict[str, Any]] = system_prompt
+        if prompt_caching_supported(self.bedrock_model_id, self.bedrock_prompt_caching):
+            # The schema prompt repeats for every block; let Bedrock cache it
+            system = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
 
         image_data = self.format_image_for_llm(image)
         body = {
             "anthropic_version": self.anthropic_version,
             "max_tokens": self.max_output_tokens or 4096,
             "temperature": 0,
-            "system": system_prompt,
+            "system": system,
             "messages": [
                 {
                     "role": "user",
@@ -121,43 +166,119 @@ class BedrockClaudeService(BaseService):
             ],
         }
 
+        if image is None:
+            images = []
+        elif isinstance(image, list):
+            images = image
+        else:
+            images = [image]
+        estimated = estimate_tokens(
+            system_prompt + prompt,
+            image_sizes=[img.size for img in images],
+            output_tokens=min(body["max_tokens"], 1000),
+        )
+        return body, estimated
+
+    async def _call_with_retries(
+        self,
+        body: dict[str, Any],
+        estimated: int,
+        block: Block | None,
+        response_schema: type[BaseModel],
+        max_retries: int,
+        timeout: int,
+    ) -> dict:
+        # Runs on the Bedrock event loop. The scheduler retries throttled calls with backoff; this loop only
+        # asks again when an answer is empty or does not match the schema.
         total_tries = max_retries + 1
-        client = self._get_client()
+        invoker = self._get_invoker(timeout)
+        scheduler = get_llm_scheduler(ModelProvider.AWS_BEDROCK.value)
         for tries in range(1, total_tries + 1):
             try:
-                response = client.invoke_model(
-                    modelId=self.bedrock_model_id,
-                    body=json.dumps(body),
+                payload = await scheduler.acall(
+                    invoker.invoke_model,
+                    self.bedrock_model_id,
+                    body,
+                    estimated_tokens=estimated,
+                    usage=self._tokens_used,
                 )
-                try:
-                    payload = json.loads(response["body"].read())
-                finally:
-                    response["body"].close()
+            except Exception as exc:  # noqa: BLE001
+                if is_throttling_error(exc):
+                    # The scheduler has already backed off and given up; more calls would only add to the load
+                    raise
+                logger.error("Bedrock structured extraction failed: %s", exc)
+                return {}
+
+            usage = payload.get("usage") or {}
+            scheduler.record_usage(
+                input_tokens=int(usage.get("input_tokens", 0)),
+                output_tokens=int(usage.get("output_tokens", 0)),
+                cache_read_input_tokens=int(usage.get("cache_read_input_tokens", 0)),
+                cache_write_input_tokens=int(usage.get("cache_creation_input_tokens", 0)),
+            )
+            logger.debug("Bedrock structured extraction usage: %s", usage)
 
+            try:
                 content = payload.get("content", [])
                 if not content:
                     raise RuntimeError("Bedrock returned empty content")
-
-                response_text = str(content[0].get("text", ""))
-                out = self._validate_response(response_text, response_schema)
-                if block:
-                    block.update_metadata(llm_request_count=1)
-                return out
+                out = self._validate_response(str(content[0].get("text", "")), response_schema)
             except Exception as exc:  # noqa: BLE001
                 if tries == total_tries:
-                    logger.error(
-                        "Bedrock structured extraction failed after retries: %s",
-                        exc,
-                    )
+                    logger.error("Bedrock structured extraction failed after retries: %s", exc)
                     break
-                wait_time = tries * self.retry_wait_time
                 logger.warning(
-                    "Bedrock structured extraction error: %s. Retrying in %s seconds... (%s/%s)",
+                    "Bedrock structured extraction returned an unusable answer: %s. Retrying... (%s/%s)",
                     exc,
-                    wait_time,
                     tries,
                     total_tries,
                 )
-                time.sleep(wait_time)
+                continue
+
+            if block:
+                block.update_metadata(llm_request_count=1, llm_tokens_used=self._tokens_used(payload) or 0)
+            return out
 
         return {}
+
+    async def acall(
+        self,
+        prompt: str,
+        image: PIL.Image.Image | List[PIL.Image.Image] | None,
+        block: Block | None,
+        response_schema: type[BaseModel],
+        max_retries: int | None = None,
+        timeout: int | None = None,
+    ) -> dict:
+        """
+        Async version of ``__call__`` for use from any event loop. Waiting on
+        it holds no thread; marker's own processors still go through
+        ``__call__``.
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+        if timeout is None:
+            timeout = self.timeout
+        body, estimated = self._build_request(prompt, image, response_schema)
+        future = submit_to_bedrock_loop(
+            self._call_with_retries(body, estimated, block, response_schema, max_retries, timeout)
+        )
+        return await asyncio.wrap_future(future)
+
+    def __call__(
+        self,
+        prompt: str,
+        image: PIL.Image.Image | List[PIL.Image.Image] | None,
+        block: Block | None,
+        response_schema: type[BaseModel],
+        max_retries: int | None = None,
+        timeout: int | None = None,
+    ):
+        if max_retries is None:
+            max_retries = self.max_retries
+        if timeout is None:
+            timeout = self.timeout
+        body, estimated = self._build_request(prompt, image, response_schema)
+        return run_on_bedrock_loop(
+            self._call_with_retries(body, estimated, block, response_schema, max_retries, timeout)
+        )
@@ -2,69 +2,236 @@ from __future__ import annotations
 
 import json
 import os
-import base64
 import io
 import re
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
 from dotenv import load_dotenv
 from marker.converters.extraction import ExtractionConverter
 from marker.converters.pdf import PdfConverter
 from marker.models import create_model_dict
 from marker.output import text_from_rendered
+from pypdf import PdfReader
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.common.imagestore import default_image_mode, image_link, make_thumbnail
+from extraction.helper.common.pdfrouting import classify_pdf
+from extraction.helper.common.uploads import memory_file
+from extraction.helper.schemas.types import ImageMode, PageRoute
 
 
 _ARTIFACT_CACHE: dict[str, Any] | None = None
+_ARTIFACT_LOCK = threading.Lock()
+
+# Separator marker inserts between pages when paginate_output is enabled, e.g. "{0}" + 48 dashes.
+PAGE_SEPARATOR_REGEX = re.compile(r"\n*\{\d+\}-{48}\n\n")
 
 load_dotenv()
 
+logger = logutil.get_logger("marker-helper")
+
 
 def _get_marker_artifacts() -> dict[str, Any]:
     global _ARTIFACT_CACHE
-    if _ARTIFACT_CACHE is None:
-        _ARTIFACT_CACHE = create_model_dict()
-    return _ARTIFACT_CACHE
+    with _ARTIFACT_LOCK:
+        if _ARTIFACT_CACHE is None:
+            _ARTIFACT_CACHE = create_model_dict()
+        return _ARTIFACT_CACHE
+
+
+def preload_models(warmup_pdf: str | Path | None = None) -> None:
+    """Load marker's model artifacts and optionally run one conversion to warm them up."""
+    _get_marker_artifacts()
+    if warmup_pdf is not None:
+        convert_pdf_to_markdown(warmup_pdf, include_images=False)
+
+def _resolve_pdf_path(input_pdf: str | Path | bytes, *, purpose: str) -> Path | bytes:
+    # Small uploads arrive as the PDF's bytes rather than a path
+    if isinstance(input_pdf, bytes):
+        return input_pdf
+    input_pdf_path = Path(input_pdf).expanduser().resolve()
+    if input_pdf_path.suffix.lower() != ".pdf":
+        raise ValueError(f"{purpose} expects a PDF input file.")
+    if not input_pdf_path.exists():
+        raise FileNotFoundError(f"Input PDF not found: {input_pdf_path}")
+    return input_pdf_path
+
+
+@contextmanager
+def _converter_input(input_pdf: Path | bytes) -> Iterator[str]:
+    """Path for marker's converters, which only open files by name; in-memory PDFs get a memfd path."""
+    if isinstance(input_pdf, bytes):
+        with memory_file(input_pdf, suffix=".pdf") as path:
+            yield path
+    else:
+        yield str(input_pdf)
+
+
+def _pdf_stream(input_pdf: Path | bytes) -> Path | io.BytesIO:
+    """What pypdf should read: the path, or a buffer over the in-memory PDF."""
+    return io.BytesIO(input_pdf) if isinstance(input_pdf, bytes) else input_pdf
+
+
+def _render_pdf(
+    input_pdf_path: Path | bytes,
+    *,
+    include_images: bool,
+    paginate: bool = False,
+    page_range: list[int] | None = None,
+) -> tuple[str, dict[str, Any]]:
+    """Run the marker pipeline (layout, OCR, ...) once and return (markdown, images). ``page_range`` is 0-based."""
+    config: dict[str, Any] = {"extract_images": bool(include_images)}
+    if paginate:
+        config["paginate_output"] = True
+    if page_range is not None:
+        config["page_range"] = page_range
+    converter = PdfConverter(artifact_dict=_get_marker_artifacts(), config=config)
+    with _converter_input(input_pdf_path) as path:
+        rendered = converter(path)
+    text, _, images = text_from_rendered(rendered)
+    return text, images
+
+
+def _strip_page_separators(markdown: str) -> str:
+    return PAGE_SEPARATOR_REGEX.sub("\n\n", markdown)
+
 
 def convert_pdf_to_markdown(
-    input_pdf: str | Path,
+    input_pdf: str | Path | bytes,
     output_dir: str | Path | None = None,
     *,
     include_images: bool = True,
+    image_mode: ImageMode | None = None,
 ) -> str:
     """Convert a PDF to markdown using marker-pdf official Python API."""
-    input_pdf_path = Path(input_pdf).expanduser().resolve()
+    input_pdf_path = _resolve_pdf_path(input_pdf, purpose="Marker conversion")
     if output_dir is not None:
         Path(output_dir).expanduser().resolve().mkdir(parents=True, exist_ok=True)
 
-    if input_pdf_path.suffix.lower() != ".pdf":
-        raise ValueError("Marker conversion expects a PDF input file.")
-    if not input_pdf_path.exists():
-        raise FileNotFoundError(f"Input PDF not found: {input_pdf_path}")
-
-    config: dict[str, Any] = {"extract_images": bool(include_images)}
-    converter = PdfConverter(artifact_dict=_get_marker_artifacts(), config=config)
-    rendered = converter(str(input_pdf_path))
-    text, _, images = text_from_rendered(rendered)
+    text, images = _render_pdf(input_pdf_path, include_images=include_images)
     markdown = text.strip()
     if include_images and images:
-        markdown = _inline_marker_images(markdown, images)
+        markdown = _inline_marker_images(markdown, images, mode=image_mode)
     return markdown
 
 
+def convert_pdf_to_markdown_with_routing(
+    input_pdf: str | Path | bytes,
+    *,
+    include_images: bool = True,
+    image_mode: ImageMode | None = None,
+) -> tuple[str, list[dict[str, Any]] | None]:
+    """
+    Convert a PDF, running marker's models only on scanned or image-heavy pages.
+
+    Pages with a usable text layer are read with pypdf; the rest go through one
+    marker pass restricted to those pages (``page_range``). Text-layer pages
+    come out as plain text, so headings and tables on them are not rebuilt.
+    Returns (markdown, page_routes); page_routes is None if the PDF could not
+    be classified and was converted as a whole.
+    """
+    input_pdf_path = _resolve_pdf_path(input_pdf, purpose="Marker conversion")
+    pages = classify_pdf(_pdf_stream(input_pdf_path))
+    if pages is None or all(page.route == PageRoute.OCR for page in pages):
+        markdown = convert_pdf_to_markdown(input_pdf_path, include_images=include_images, image_mode=image_mode)
+        return markdown, [page.to_dict() for page in pages] if pages is not None else None
+
+    ocr_pages = [page.page - 1 for page in pages if page.route == PageRoute.OCR]
+    ocr_markdown: dict[int, str] = {}
+    images: dict[str, Any] = {}
+    if ocr_pages:
+        paginated, images = _render_pdf(
+            input_pdf_path, include_images=include_images, paginate=True, page_range=ocr_pages
+        )
+        chunks = PAGE_SEPARATOR_REGEX.split(paginated)
+        if chunks and not chunks[0].strip():
+            chunks = chunks[1:]
+        if len(chunks) != len(ocr_pages):
+            logger.warning(
+                "Marker returned %d pages for %d OCR pages; converting the whole PDF instead",
+                len(chunks),
+                len(ocr_pages),
+            )
+            markdown = convert_pdf_to_markdown(input_pdf_path, include_images=include_images, image_mode=image_mode)
+            return markdown, None
+        ocr_markdown = dict(zip(ocr_pages, chunks))
+
+    reader = PdfReader(_pdf_stream(input_pdf_path))
+    parts = []
+    for index, page in enumerate(reader.pages):
+        if index in ocr_markdown:
+            parts.append(ocr_markdown[index].strip())
+        else:
+            parts.append((page.extract_text() or "").strip())
+    markdown = "\n\n".join(part for part in parts if part)
+    if include_images and images:
+        markdown = _inline_marker_images(markdown, images, mode=image_mode)
+    return markdown, [page.to_dict() for page in pages]
+
+
+def convert_pdf_to_markdown_with_pages(
+    input_pdf: str | Path | bytes,
+    *,
+    include_images: bool = True,
+    image_mode: ImageMode | None = None,
+) -> tuple[str, str]:
+    """
+    Run marker once and return (markdown, paginated_markdown).
+
+    ``markdown`` matches convert_pdf_to_markdown output. ``paginated_markdown``
+    keeps marker's page separators and image file references (no base64), which
+    is the form ExtractionConverter expects as ``existing_markdown``.
+    """
+    input_pdf_path = _resolve_pdf_path(input_pdf, purpose="Marker conversion")
+
+    paginated, images = _render_pdf(input_pdf_path, include_images=include_images, paginate=True)
+    markdown = _strip_page_separators(paginated).strip()
+    if include_images and images:
+        markdown = _inline_marker_images(markdown, images, mode=image_mode)
+    return markdown, paginated
+
+
+def extract_structured_markdown_and_json(
+    input_pdf: str | Path | bytes,
+    schema: dict[str, Any],
+    *,
+    include_images: bool = True,
+    image_mode: ImageMode | None = None,
+) -> tuple[str, str, str]:
+    """
+    Single-pass structured extraction returning (markdown, analysis, document_json).
+
+    The marker models run once; the rendered pages feed both the markdown
+    response and the LLM extraction stage.
+    """
+    markdown, paginated = convert_pdf_to_markdown_with_pages(
+        input_pdf, include_images=include_images, image_mode=image_mode
+    )
+    analysis, document_json = extract_structured_json(
+        input_pdf=input_pdf,
+        schema=schema,
+        existing_markdown=paginated,
+    )
+    return markdown, analysis, document_json
+
+
 def extract_structured_json(
-    input_pdf: str | Path,
+    input_pdf: str | Path | bytes,
     schema: dict[str, Any],
     *,
     existing_markdown: str | None = None,
 ) -> tuple[str, str]:
-    """Run marker beta structured extraction and return (analysis, document_json)."""
-    input_pdf_path = Path(input_pdf).expanduser().resolve()
+    """
+    Run marker beta structured extraction and return (analysis, document_json).
 
-    if input_pdf_path.suffix.lower() != ".pdf":
-        raise ValueError("Structured extraction expects a PDF input file.")
-    if not input_pdf_path.exists():
-        raise FileNotFoundError(f"Input PDF not found: {input_pdf_path}")
+    ``existing_markdown`` must be paginated marker output (see
+    convert_pdf_to_markdown_with_pages); when given, marker skips its layout/OCR
+    pipeline and only runs the LLM extraction stage.
+    """
+    input_pdf_path = _resolve_pdf_path(input_pdf, purpose="Structured extraction")
 
     llm_service, llm_config = _resolve_structured_llm_config()
     config: dict[str, Any] = {
@@ -81,7 +248,8 @@ def extract_structured_json(
         llm_service=llm_service,
     )
     try:
-        rendered = converter(str(input_pdf_path))
+        with _converter_input(input_pdf_path) as path:
+            rendered = converter(path)
     except AttributeError as exc:
         if "analysis" in str(exc):
             raise RuntimeError(
@@ -100,6 +268,15 @@ def extract_structured_json(
     return rendered.analysis.strip(), rendered.document_json.strip()
 
 
+def structured_llm_fingerprint() -> dict[str, Any]:
+    """Non-secret description of the configured structured-extraction LLM (service and model), for cache keys."""
+    llm_service, llm_config = _resolve_structured_llm_config()
+    return {
+        "service": llm_service,
+        **{key: value for key, value in llm_config.items() if "model" in key or "deployment" in key},
+    }
+
+
 def _resolve_structured_llm_config() -> tuple[str, dict[str, Any]]:
     backend = os.getenv("MARKER_STRUCTURED_LLM_BACKEND", "auto").strip().lower()
 
@@ -115,6 +292,7 @@ def _resolve_structured_llm_config() -> tuple[str, dict[str, Any]]:
                 "aws_access_key_id": os.getenv("AWS_ACCESS_KEY_ID"),
                 "aws_secret_access_key": os.getenv("AWS_SECRET_ACCESS_KEY"),
                 "aws_session_token": os.getenv("AWS_SESSION_TOKEN"),
+                "bedrock_prompt_caching": os.getenv("BEDROCK_PROMPT_CACHING", "auto"),
             },
         )
 
@@ -216,7 +394,8 @@ def _resolve_structured_llm_config() -> tuple[str, dict[str, Any]]:
     )
 
 
-def _inline_marker_images(markdown: str, images: dict[str, Any]) -> str:
+def _inline_marker_images(markdown: str, images: dict[str, Any], *, mode: ImageMode | None = None) -> str:
+    mode = mode or default_image_mode()
     pattern = re.compile(r"!\[(?P<alt>[^\]]*)\]\((?P<src>[^)]+)\)")
 
     def replace(match: re.Match[str]) -> str:
@@ -229,6 +408,12 @@ def _inline_marker_images(markdown: str, images: dict[str, Any]) -> str:
         if image_obj is None:
             return match.group(0)
 
+        if mode == ImageMode.THUMBNAIL:
+            # Downscale the decoded image directly rather than encoding it at full size first
+            thumbnail = make_thumbnail(image_obj)
+            if thumbnail is not None:
+                return f"![{alt}]({image_link(thumbnail, 'image/jpeg', mode=ImageMode.INLINE)})"
+
         suffix = Path(image_key).suffix.lower()
         img_format = "PNG"
         mime_type = "image/png"
@@ -241,8 +426,8 @@ def _inline_marker_images(markdown: str, images: dict[str, Any]) -> str:
 
         buffer = io.BytesIO()
         image_obj.save(buffer, format=img_format)
-        encoded = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        return f"![{alt}](data:{mime_type};base64,{encoded})"
+        link_mode = ImageMode.REFERENCE if mode == ImageMode.THUMBNAIL else mode
+        return f"![{alt}]({image_link(buffer.getvalue(), mime_type, mode=link_mode)})"
 
     return pattern.sub(replace, markdown)
 
@@ -1,28 +1,291 @@
 import io
 import base64
+import os
+import hashlib
 import json 
-from extraction.helper.schemas.types import ModelProvider
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+from extraction.helper.schemas.types import ImageMode, ModelProvider
 from pypdf import PdfReader
 from extraction.helper.common import logging as logutil 
+from extraction.helper.common.cache import get_description_cache, make_cache_key
+from extraction.helper.common.imagestore import image_link
+from extraction.helper.common.imagefilter import decorative_reason, image_filter_thresholds
+from extraction.helper.common.images import ImageDeduplicator, SeenImage, image_markdown, new_image_deduplicator
+from extraction.helper.common.ratelimit import estimate_tokens, get_llm_scheduler
 from PIL import Image, ImageFile
 from openai import AzureOpenAI 
 
 
 logger = logutil.get_logger("markitdown-endpoint")
+
+
+@dataclass
+class _PageImage:
+    """An image on a page of the optimized conversion, waiting for its description."""
+
+    image_num: int
+    mime: str | None = None
+    data: bytes | None = None
+    ref: str | None = None
+    description: Future | None = None
+    # Set when this image repeats an earlier one; its description is reused
+    duplicate_of: SeenImage | None = None
+
+
+@dataclass
+class ImageStats:
+    """Per-document image counts from the optimized conversion."""
+
+    described: int = 0
+    repeated: int = 0
+    # Dropped by the local prefilter before any LLM call, by reason
+    prefiltered: Counter = field(default_factory=Counter)
+    # Described as SKIP by the model
+    skipped_by_model: int = 0
+    # Failed validation, conversion or description
+    invalid: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "described": self.described,
+            "repeated": self.repeated,
+            "prefiltered": dict(self.prefiltered),
+            "skippedByModel": self.skipped_by_model,
+            "invalid": self.invalid,
+        }
+
+
+@dataclass
+class _BatchImage:
+    """An image queued for a batched description call."""
+
+    image_b64: str
+    mime: str
+    sha256: str
+    size: tuple[int, int]
+    page_index: int
+    description: Future = field(default_factory=Future)
+
+
+class _DescriptionBatcher:
+    """
+    Submits a document's image descriptions to the thread pool.
+
+    With a batch size of 1 every image is its own call. Otherwise images are
+    queued and sent ``batch_size`` at a time in one call (0 = one call per
+    page). A partly filled queue is sent as soon as a page in it is about to
+    be finished, so batching never holds back output.
+    """
+
+    def __init__(
+        self,
+        helper: "PDFToMarkdown",
+        pool: ThreadPoolExecutor,
+        client,
+        model_name: str,
+        model_provider: ModelProvider,
+        *,
+        request_id: str,
+        batch_size: int = 1,
+    ):
+        self.helper = helper
+        self.pool = pool
+        self.client = client
+        self.model_name = model_name
+        self.model_provider = model_provider
+        self.request_id = request_id
+        self.batch_size = batch_size
+        self._queue: list[_BatchImage] = []
+        # Call appropriate description function based on provider
+        if model_provider == ModelProvider.AZURE_OPENAI:
+            self.describe = helper._describe_image_azure
+        elif model_provider == ModelProvider.AWS_BEDROCK:
+            self.describe = helper._describe_image_bedrock
+        else:
+            self.describe = None
+
+    def submit(self, image_b64: str, mime: str, *, sha256: str, size: tuple[int, int], page_index: int) -> Future:
+        """Queue or submit an image; the returned future resolves to its description ("" on failure)."""
+        if self.batch_size == 1:
+            return self.pool.submit(
+                self.helper._describe_image_cached,
+                self.describe,
+                self.client,
+                self.model_name,
+                image_b64,
+                mime,
+                model_provider=self.model_provider,
+                image_sha256=sha256,
+                request_id=self.request_id,
+                page_index=page_index,
+                estimated_tokens=estimate_tokens(IMAGE_DESCRIPTION_PROMPT, image_sizes=[size]),
+            )
+        image = _BatchImage(image_b64, mime, sha256, size, page_index)
+        self._queue.append(image)
+        if self.batch_size and len(self._queue) >= self.batch_size:
+            self.flush()
+        return image.description
+
+    def end_page(self) -> None:
+        if self.batch_size == 0:
+            self.flush()
+
+    def flush_through(self, page_num: int) -> None:
+        """Send the queue if it holds images from ``page_num`` or earlier."""
+        if self._queue and self._queue[0].page_index < page_num:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._queue:
+            return
+        images, self._queue = self._queue, []
+        self.pool.submit(
+            self.helper._describe_batch_cached,
+            self.describe,
+            self.client,
+            self.model_name,
+            images,
+            model_provider=self.model_provider,
+            request_id=self.request_id,
+        )
+
+
+IMAGE_DESCRIPTION_PROMPT = "If the image contains any text, information, data, or content (including posters, signs, charts, tables, diagrams, forms, screenshots, documents, or any readable material), extract and transcribe ALL visible text and information exactly word-for-word. Output only the raw extracted content without any introductory phrases like 'this image shows' or 'the image contains'. For non-text content like charts or diagrams, provide the exact data, values, labels, and structural information present. If the image is purely decorative (logos, icons, backgrounds, dividers) with no meaningful information, reply exactly with SKIP and nothing else."
+IMAGE_DESCRIPTION_TEMPERATURE = 0.2
+IMAGE_DESCRIPTION_MAX_TOKENS = 4000
+# Part of the description cache key: changing the prompt or sampling settings invalidates cached descriptions
+IMAGE_DESCRIPTION_PROMPT_VERSION = hashlib.sha256(
+    f"{IMAGE_DESCRIPTION_PROMPT}\0{IMAGE_DESCRIPTION_TEMPERATURE}\0{IMAGE_DESCRIPTION_MAX_TOKENS}".encode("utf-8")
+).hexdigest()[:12]
+# Several images per call: the same instructions, answered as JSON with one entry per image
+IMAGE_DESCRIPTION_BATCH_PROMPT = (
+    "You are given {count} images, labelled Image 1 to Image {count}. Follow these instructions for each image "
+    "separately: "
+    + IMAGE_DESCRIPTION_PROMPT
+    + ' Reply with only a JSON object and no other text, in the form {"images": [{"index": 1, "description": "..."}]},'
+    " with exactly one entry per image in order. Each description is what you would reply for that image alone,"
+    " SKIP included."
+)
+# Output budget of one batched call, however many images it holds
+IMAGE_DESCRIPTION_BATCH_MAX_TOKENS = 8192
+
+
+def image_description_batch_size() -> int:
+    """
+    IMAGE_DESCRIPTION_BATCH_SIZE: images described per vision call. 1 (the
+    default) makes one call per image, 0 one call per page.
+    """
+    try:
+        return max(0, int(os.getenv("IMAGE_DESCRIPTION_BATCH_SIZE", "1")))
+    except ValueError:
+        logger.warning("Ignoring invalid integer for IMAGE_DESCRIPTION_BATCH_SIZE")
+        return 1
+
+
+def _parse_batch_descriptions(text: str, count: int) -> list[str] | None:
+    """
+    Split a batched answer into ``count`` descriptions, in image order. Returns
+    None unless it holds exactly one description for each image.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        payload = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    entries = payload.get("images") if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or len(entries) != count:
+        return None
+    descriptions: dict[int, str] = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            return None
+        index, description = entry.get("index"), entry.get("description")
+        if not isinstance(index, int) or not isinstance(description, str):
+            return None
+        descriptions[index] = description.strip()
+    if set(descriptions) != set(range(1, count + 1)):
+        return None
+    return [descriptions[n] for n in range(1, count + 1)]
+
+# Largest side sent to vision models; larger images are downscaled
+VISION_MAX_DIMENSION = 2048
+# IMAGE_PIPELINE_PROFILE: "quality" keeps LANCZOS and optimized JPEGs, "fast"
+# trades a little sharpness and size for less CPU per image
+IMAGE_PIPELINE_PROFILES = {
+    "quality": {"resample": Image.Resampling.LANCZOS, "reducing_gap": 3.0, "quality": 85, "optimize": True},
+    "fast": {"resample": Image.Resampling.BILINEAR, "reducing_gap": 1.0, "quality": 80, "optimize": False},
+}
+
+
+def image_pipeline_profile() -> str:
+    profile = os.getenv("IMAGE_PIPELINE_PROFILE", "quality").strip().lower()
+    if profile not in IMAGE_PIPELINE_PROFILES:
+        logger.warning("Ignoring invalid IMAGE_PIPELINE_PROFILE %r", profile)
+        return "quality"
+    return profile
+
+
+def _encode_for_vision(img: Image.Image) -> bytes:
+    """
+    Encode ``img`` as a JPEG no larger than VISION_MAX_DIMENSION on either
+    side, flattening transparency onto white.
+
+    A JPEG that has not been decoded yet is decoded straight at a reduced
+    scale (``draft``), and the remaining downscale starts with an integer
+    ``reduce`` step, so large scans cost a fraction of a full decode and
+    LANCZOS pass.
+    """
+    settings = IMAGE_PIPELINE_PROFILES[image_pipeline_profile()]
+    scale = min(1.0, VISION_MAX_DIMENSION / max(img.size))
+    if scale < 1.0:
+        target = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+        if img.format == "JPEG":
+            img.draft(img.mode, target)
+        if img.size != target:
+            img = img.resize(target, settings["resample"], reducing_gap=settings["reducing_gap"])
+
+    # Convert to RGB if necessary (remove alpha channel, handle grayscale)
+    if img.mode in ("RGBA", "LA", "P"):
+        # Create white background for transparency
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    elif img.mode == "1":
+        img = img.convert("L")
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    output_buffer = io.BytesIO()
+    img.save(output_buffer, format="JPEG", quality=settings["quality"], optimize=settings["optimize"])
+    return output_buffer.getvalue()
+
+
+def _open_pdf(pdf_path: str | bytes) -> PdfReader:
+    """Read a PDF from its path, or from its bytes when the upload was kept in memory."""
+    return PdfReader(io.BytesIO(pdf_path) if isinstance(pdf_path, bytes) else pdf_path)
+
+
 class PDFToMarkdown:
     def __init__(self):
         pass
 
     def convert_pdf_to_markdown_local(
         self,
-        pdf_path: str,
+        pdf_path: str | bytes,
         *,
         request_id: str = "markitdown-fallback",
         include_images: bool = True,
+        image_mode: ImageMode | None = None,
         include_page_text: bool = True,
     ) -> str:
         """Fallback PDF conversion using pypdf text + extracted inline images."""
-        reader = PdfReader(pdf_path)
+        reader = _open_pdf(pdf_path)
         markdown_output: list[str] = []
 
         if include_page_text:
@@ -36,53 +299,137 @@ class PDFToMarkdown:
                     logger.warning("[%s] Could not extract page text for page %d: %s", request_id, page_num, exc)
 
         if include_images:
-            image_markdown = self.extract_pdf_images_markdown(pdf_path, request_id=request_id)
+            image_markdown = self.extract_pdf_images_markdown(pdf_path, request_id=request_id, image_mode=image_mode)
             if image_markdown:
                 markdown_output.append("---\n\n## Extracted Images\n\n" + image_markdown)
 
         return "\n\n".join(markdown_output).strip()
 
-    def extract_pdf_images_markdown(self, pdf_path: str, *, request_id: str = "markitdown") -> str:
-        """Extract embedded PDF images and return markdown image tags with data URLs."""
-        reader = PdfReader(pdf_path)
-        image_blocks: list[str] = []
+    def iter_pdf_pages_local(
+        self,
+        pdf_path: str | bytes,
+        *,
+        request_id: str = "markitdown-stream",
+        include_images: bool = True,
+        image_mode: ImageMode | None = None,
+        include_page_text: bool = True,
+    ) -> Iterator[tuple[int, str]]:
+        """
+        Page-by-page variant of convert_pdf_to_markdown_local.
+
+        Yields (page_number, markdown) as each page is converted, with the page's
+        images inlined after its text instead of collected at the end, so callers
+        can stream pages without holding the whole document in memory. Repeated
+        images reference the definition emitted with their first occurrence.
+        """
+        reader = _open_pdf(pdf_path)
+        dedup = new_image_deduplicator()
 
         for i, page in enumerate(reader.pages):
             page_num = i + 1
-            images_info = self._extract_images_via_page_images(page)
-            if not images_info:
-                # Fallback to legacy XObject scan for PDFs where page.images is empty.
-                images_info = self.extract_images_from_page(page)
-            if not images_info:
-                continue
-
-            for j, (image_mime, image_bytes) in enumerate(images_info):
+            page_output: list[str] = []
+            if include_page_text:
                 try:
-                    processed_bytes, processed_mime = self._validate_and_resize_image_for_azure(
-                        image_bytes,
-                        image_mime,
-                        request_id,
-                        j + 1,
-                        page_num,
-                    )
-                    if not processed_bytes or not processed_mime:
-                        continue
-
-                    image_b64 = base64.b64encode(processed_bytes).decode("utf-8")
-                    image_blocks.append(
-                        f"![Image {j + 1} on Page {page_num}](data:{processed_mime};base64,{image_b64})"
-                    )
+                    text = (page.extract_text() or "").strip()
+                    if text:
+                        page_output.append(text)
                 except Exception as exc:
-                    logger.warning(
-                        "[%s] Failed to inline image %d on page %d: %s",
-                        request_id,
-                        j + 1,
-                        page_num,
-                        exc,
-                    )
+                    logger.warning("[%s] Could not extract page text for page %d: %s", request_id, page_num, exc)
+
+            if include_images:
+                page_output.extend(
+                    self._page_image_blocks(page, page_num, request_id=request_id, dedup=dedup, image_mode=image_mode)
+                )
+
+            yield page_num, "\n\n".join(page_output).strip()
+
+    def extract_pdf_images_markdown(
+        self,
+        pdf_path: str | bytes,
+        *,
+        request_id: str = "markitdown",
+        image_mode: ImageMode | None = None,
+    ) -> str:
+        """
+        Extract embedded PDF images and return markdown image tags, linking
+        each to the image store or inlining it (full size or as a thumbnail)
+        per ``image_mode``, which defaults to IMAGE_MODE.
+
+        Unless IMAGE_DEDUP_ENABLED is off, images are reference-style and each
+        distinct image (exact or perceptual match) is encoded once; repeats
+        only add a reference to it.
+        """
+        reader = _open_pdf(pdf_path)
+        image_blocks: list[str] = []
+        dedup = new_image_deduplicator()
+
+        for i, page in enumerate(reader.pages):
+            image_blocks.extend(
+                self._page_image_blocks(page, i + 1, request_id=request_id, dedup=dedup, image_mode=image_mode)
+            )
+
+        if dedup is not None and dedup.duplicates:
+            logger.info("[%s] Referenced %d repeated images instead of inlining them again", request_id, dedup.duplicates)
 
         return "\n\n".join(image_blocks).strip()
 
+    def _page_image_blocks(
+        self,
+        page,
+        page_num: int,
+        *,
+        request_id: str,
+        dedup: ImageDeduplicator | None = None,
+        image_mode: ImageMode | None = None,
+    ) -> list[str]:
+        """Markdown image tags for the embedded images of one page, linked or inlined per ``image_mode``."""
+        image_blocks: list[str] = []
+        images_info = self._extract_images_via_page_images(page)
+        if not images_info:
+            # Fallback to legacy XObject scan for PDFs where page.images is empty.
+            images_info = self.extract_images_from_page(page)
+        if not images_info:
+            return image_blocks
+
+        for j, (image_mime, image_bytes) in enumerate(images_info):
+            try:
+                if dedup is not None:
+                    sha256, hashed, seen = dedup.find(image_bytes)
+                    if seen is not None:
+                        # Repeat of an earlier image: reference its definition instead of re-encoding it
+                        if seen.value is not None:
+                            image_blocks.append(image_markdown(f"Image {j + 1} on Page {page_num}", seen.ref))
+                        continue
+
+                processed_bytes, processed_mime = self._validate_and_resize_image_for_azure(
+                    image_bytes,
+                    image_mime,
+                    request_id,
+                    j + 1,
+                    page_num,
+                )
+                if not processed_bytes or not processed_mime:
+                    if dedup is not None:
+                        dedup.add(sha256, hashed, page_num=page_num, image_num=j + 1)
+                    continue
+
+                link = image_link(processed_bytes, processed_mime, mode=image_mode)
+                if dedup is None:
+                    image_blocks.append(f"![Image {j + 1} on Page {page_num}]({link})")
+                else:
+                    seen = dedup.add(sha256, hashed, page_num=page_num, image_num=j + 1, value=processed_mime)
+                    image_blocks.append(image_markdown(f"Image {j + 1} on Page {page_num}", seen.ref, link))
+            except Exception as exc:
+                logger.warning(
+                    "[%s] Failed to inline image %d on page %d: %s",
+                    request_id,
+                    j + 1,
+                    page_num,
+                    exc,
+                )
+
+        return image_blocks
+
     def _extract_images_via_page_images(self, page) -> list[tuple[str, bytes]]:
         """Extract images using pypdf's ImageFile API (more robust across filter types)."""
         results: list[tuple[str, bytes]] = []
@@ -115,7 +462,11 @@ class PDFToMarkdown:
 
     def _convert_image_to_jpeg(self, image_data: bytes, width: int, height: int, format_type: str) -> tuple[bytes | None, str | None]:
         """Convert various image formats to JPEG for Azure OpenAI compatibility.
-        
+
+        The image is decoded once and encoded once, already fitted to the
+        vision size limit, so _validate_and_resize_image_for_azure passes the
+        result through without decoding it again.
+
         Returns tuple of (converted_bytes, mime_type) or (None, None) if conversion fails.
         """
         try:
@@ -158,17 +509,6 @@ class PDFToMarkdown:
             else:  # Generic
                 try:
                     with Image.open(io.BytesIO(image_data)) as img:
-                        # Convert to RGB if necessary (remove alpha channel, handle grayscale)
-                        if img.mode in ("RGBA", "P"):
-                            # Create white background for transparency
-                            background = Image.new("RGB", img.size, (255, 255, 255))
-                            if img.mode == "P":
-                                img = img.convert("RGBA")
-                            background.paste(img, mask=img.split()[-1] if img.mode == "RGBA" else None)
-                            img = background
-                        elif img.mode not in ("RGB", "L"):
-                            img = img.convert("RGB")
-
                         # Validate image dimensions
                         if img.width < 10 or img.height < 10:
                             logger.debug(f"Image too small: {img.width}x{img.height}")
@@ -178,15 +518,15 @@ class PDFToMarkdown:
                             logger.debug(f"Image too large: {img.width}x{img.height}")
                             return None, None
 
-                        # Convert to JPEG
-                        output_buffer = io.BytesIO()
-                        img.save(output_buffer, format="JPEG", quality=85, optimize=True)
-                        jpeg_data = output_buffer.getvalue()
-                        
+                        jpeg_data = _encode_for_vision(img)
                         logger.debug(f"Successfully converted {format_type} image to JPEG ({len(jpeg_data)} bytes)")
                         return jpeg_data, "image/jpeg"
                 except Exception:
                     return None, None
+
+            jpeg_data = _encode_for_vision(img)
+            logger.debug(f"Successfully converted {format_type} image to JPEG ({len(jpeg_data)} bytes)")
+            return jpeg_data, "image/jpeg"
             
         except Exception as e:
             logger.debug(f"Failed to convert {format_type} image: {e}")
@@ -312,7 +652,10 @@ class PDFToMarkdown:
 
     def _validate_and_resize_image_for_azure(self, image_bytes: bytes, image_mime: str, request_id: str, image_num: int, page_num: int) -> tuple[bytes | None, str | None]:
         """Validate and potentially resize image before sending to Azure OpenAI.
-        
+
+        RGB or grayscale JPEGs within VISION_MAX_DIMENSION are returned as they
+        are; anything else is re-encoded once by _encode_for_vision.
+
         Returns tuple of (processed_image_bytes, mime_type) or (None, None) if invalid.
         """
         # Check file size limits (Azure OpenAI has a 20MB limit, but we'll be more conservative)
@@ -329,12 +672,11 @@ class PDFToMarkdown:
                         request_id, image_num, page_num, len(image_bytes))
             return None, None
         
-        # Process and potentially resize image using PIL
+        # Process and potentially resize image using PIL. Opening only reads the
+        # header; pixels are decoded at most once, and not at all for JPEGs
+        # that already meet the limits.
         try:
-            # Load image
             with Image.open(io.BytesIO(image_bytes)) as img:
-                original_size = (img.width, img.height)
-                
                 # Check minimum dimensions
                 if img.width < 10 or img.height < 10:
                     logger.debug("[%s] Skipping image %d on page %d - dimensions too small (%dx%d)", 
@@ -347,127 +689,144 @@ class PDFToMarkdown:
                     logger.debug("[%s] Skipping image %d on page %d - extreme aspect ratio (%.1f)", 
                             request_id, image_num, page_num, aspect_ratio)
                     return None, None
-                
-                # Resize if dimensions are too large (common for vision APIs: 2048x2048 max)
-                MAX_DIMENSION = 2048
-                needs_resize = img.width > MAX_DIMENSION or img.height > MAX_DIMENSION
-                
-                if needs_resize:
-                    # Calculate new size maintaining aspect ratio
-                    scale_factor = min(MAX_DIMENSION / img.width, MAX_DIMENSION / img.height)
-                    new_width = int(img.width * scale_factor)
-                    new_height = int(img.height * scale_factor)
-                    
-                    logger.info("[%s] Resizing image %d on page %d from %dx%d to %dx%d (scale: %.2f)", 
-                            request_id, image_num, page_num, img.width, img.height, 
-                            new_width, new_height, scale_factor)
-                    
-                    # Resize with high quality
-                    img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    img = img_resized
-                
-                # Convert to RGB if necessary (remove alpha channel, handle grayscale)
-                if img.mode in ("RGBA", "P"):
-                    # Create white background for transparency
-                    background = Image.new("RGB", img.size, (255, 255, 255))
-                    if img.mode == "P":
-                        img = img.convert("RGBA")
-                    background.paste(img, mask=img.split()[-1] if img.mode == "RGBA" else None)
-                    img = background
-                elif img.mode not in ("RGB", "L"):
-                    img = img.convert("RGB")
-                
-                # Convert to JPEG for consistency
-                output_buffer = io.BytesIO()
-                img.save(output_buffer, format="JPEG", quality=85, optimize=True)
-                processed_bytes = output_buffer.getvalue()
-                processed_mime = "image/jpeg"
-                
-                if needs_resize:
-                    logger.debug("[%s] Image %d on page %d processed: %s -> %s, %d -> %d bytes", 
-                                request_id, image_num, page_num, 
-                                f"{original_size[0]}x{original_size[1]}", f"{img.width}x{img.height}",
-                                len(image_bytes), len(processed_bytes))
-                else:
-                    logger.debug("[%s] Image %d on page %d processed: %dx%d, %d bytes", 
-                                request_id, image_num, page_num, img.width, img.height, len(processed_bytes))
-                
-                return processed_bytes, processed_mime
+
+                if img.format == "JPEG" and img.mode in ("RGB", "L") and max(img.size) <= VISION_MAX_DIMENSION:
+                    logger.debug("[%s] Image %d on page %d passed through: %dx%d, %d bytes",
+                                request_id, image_num, page_num, img.width, img.height, len(image_bytes))
+                    return image_bytes, "image/jpeg"
+
+                original_size = img.size
+                processed_bytes = _encode_for_vision(img)
+                logger.debug("[%s] Image %d on page %d processed: %dx%d %s, %d -> %d bytes",
+                            request_id, image_num, page_num, original_size[0], original_size[1],
+                            image_mime, len(image_bytes), len(processed_bytes))
+                return processed_bytes, "image/jpeg"
             
         except Exception as e:
             logger.warning("[%s] Skipping image %d on page %d - processing failed: %s", 
                         request_id, image_num, page_num, e)
             return None, None
 
-    def _describe_image_azure(self, client: AzureOpenAI, deployment: str, image_b64: str, image_mime: str, *, request_id: str, page_index: int) -> str:
+    @staticmethod
+    def _image_label(images: list[tuple[str, str]], image_index: int) -> list[dict[str, str]]:
+        """Text part naming an image in a batched call; single-image calls carry no label."""
+        return [{"type": "text", "text": f"Image {image_index + 1}:"}] if len(images) > 1 else []
+
+    def _request_description_azure(
+        self,
+        client: AzureOpenAI,
+        deployment: str,
+        images: list[tuple[str, str]],
+        *,
+        prompt: str = IMAGE_DESCRIPTION_PROMPT,
+        max_tokens: int = IMAGE_DESCRIPTION_MAX_TOKENS,
+    ) -> tuple[str, int | None]:
+        """
+        One Azure OpenAI vision call with ``images`` as (base64, mime) pairs.
+        Returns (answer, total tokens used); errors propagate for the scheduler.
+        """
+        content: list[dict[str, Any]] = [{"type": "text", "text": prompt}]
+        for n, (image_b64, image_mime) in enumerate(images):
+            content.extend(self._image_label(images, n))
+            content.append({"type": "image_url", "image_url": {"url": f"data:{image_mime};base64,{image_b64}"}})
+        # Throttling is retried by the shared LLM scheduler, not by the SDK
+        response = client.with_options(max_retries=0).chat.completions.create(
+            model=deployment,
+            messages=[{"role": "user", "content": content}],
+            temperature=IMAGE_DESCRIPTION_TEMPERATURE,
+            max_tokens=max_tokens,
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            get_llm_scheduler(ModelProvider.AZURE_OPENAI.value).record_usage(
+                input_tokens=usage.prompt_tokens or 0,
+                output_tokens=usage.completion_tokens or 0,
+            )
+        return (response.choices[0].message.content or "").strip(), getattr(usage, "total_tokens", None)
+
+    def _describe_image_azure(self, client: AzureOpenAI, deployment: str, image_b64: str, image_mime: str, *, request_id: str, page_index: int, estimated_tokens: int = 0) -> str:
         try:
-            response = client.chat.completions.create(
-                model=deployment,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": "If the image contains any text, information, data, or content (including posters, signs, charts, tables, diagrams, forms, screenshots, documents, or any readable material), extract and transcribe ALL visible text and information exactly word-for-word. Output only the raw extracted content without any introductory phrases like 'this image shows' or 'the image contains'. For non-text content like charts or diagrams, provide the exact data, values, labels, and structural information present. If the image is purely decorative (logos, icons, backgrounds, dividers) with no meaningful information, reply exactly with SKIP and nothing else."},
-                            {"type": "image_url", "image_url": {"url": f"data:{image_mime};base64,{image_b64}"}},
-                        ],
-                    }
-                ],
-                temperature=0.2,
-                max_tokens=4000,
+            description, _ = get_llm_scheduler(ModelProvider.AZURE_OPENAI.value).call(
+                self._request_description_azure,
+                client,
+                deployment,
+                [(image_b64, image_mime)],
+                estimated_tokens=estimated_tokens,
+                usage=lambda result: result[1],
             )
             logger.info("[%s] Image description success for page %s", request_id, page_index + 1)
-            return (response.choices[0].message.content or "").strip()
+            return description
         except Exception as exc:
             logger.error("[%s] Image description failed for page %s: %s", request_id, page_index + 1, exc, exc_info=True)
             return ""
 
+    def _request_description_bedrock(
+        self,
+        client,
+        model_id: str,
+        images: list[tuple[str, str]],
+        *,
+        prompt: str = IMAGE_DESCRIPTION_PROMPT,
+        max_tokens: int = IMAGE_DESCRIPTION_MAX_TOKENS,
+    ) -> tuple[str, int | None]:
+        """
+        One Bedrock vision call with ``images`` as (base64, mime) pairs. Returns
+        (answer, input + output tokens used); errors propagate for the scheduler.
+        """
+        # Prepare the message for Claude 3.5 Sonnet
+        content: list[dict[str, Any]] = [{"type": "text", "text": prompt}]
+        for n, (image_b64, image_mime) in enumerate(images):
+            content.extend(self._image_label(images, n))
+            content.append({"type": "image", "source": {"type": "base64", "media_type": image_mime, "data": image_b64}})
+        message = {"role": "user", "content": content}
+
+        # Prepare the request body for Bedrock
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "temperature": IMAGE_DESCRIPTION_TEMPERATURE,
+            "messages": [message]
+        }
+
+        # Invoke the model
+        response = client.invoke_model(
+            modelId=model_id,
+            body=json.dumps(body)
+        )
 
-    def _describe_image_bedrock(self, client, model_id: str, image_b64: str, image_mime: str, *, request_id: str, page_index: int) -> str:
+        # Parse the response and add explicit timeout & streaming read close 
         try:
-            # Prepare the message for Claude 3.5 Sonnet
-            message = {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "If the image contains any text, information, data, or content (including posters, signs, charts, tables, diagrams, forms, screenshots, documents, or any readable material), extract and transcribe ALL visible text and information exactly word-for-word. Output only the raw extracted content without any introductory phrases like 'this image shows' or 'the image contains'. For non-text content like charts or diagrams, provide the exact data, values, labels, and structural information present. If the image is purely decorative (logos, icons, backgrounds, dividers) with no meaningful information, reply exactly with SKIP and nothing else."
-                    },
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": image_mime,
-                            "data": image_b64
-                        }
-                    }
-                ]
-            }
-            
-            # Prepare the request body for Bedrock
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 4000,
-                "temperature": 0.2,
-                "messages": [message]
-            }
-            
-            # Invoke the model
-            response = client.invoke_model(
-                modelId=model_id,
-                body=json.dumps(body)
+            response_body = json.loads(response['body'].read())
+        finally:
+            # Ensure that the stream is closed 
+            response["body"].close()
+
+        usage = response_body.get("usage") or {}
+        tokens_used = None
+        if usage:
+            tokens_used = int(usage.get("input_tokens", 0)) + int(usage.get("output_tokens", 0))
+            get_llm_scheduler(ModelProvider.AWS_BEDROCK.value).record_usage(
+                input_tokens=int(usage.get("input_tokens", 0)),
+                output_tokens=int(usage.get("output_tokens", 0)),
             )
-            
-            # Parse the response and add explicit timeout & streaming read close 
-            try:
-                response_body = json.loads(response['body'].read())
-            finally:
-                # Ensure that the stream is closed 
-                response["body"].close()
 
-            content = response_body.get('content', [])
-            
-            if content and len(content) > 0:
-                text_content = content[0].get('text', '').strip()
+        content = response_body.get('content', [])
+        if content and len(content) > 0:
+            return content[0].get('text', '').strip(), tokens_used
+        return "", tokens_used
+
+    def _describe_image_bedrock(self, client, model_id: str, image_b64: str, image_mime: str, *, request_id: str, page_index: int, estimated_tokens: int = 0) -> str:
+        try:
+            text_content, _ = get_llm_scheduler(ModelProvider.AWS_BEDROCK.value).call(
+                self._request_description_bedrock,
+                client,
+                model_id,
+                [(image_b64, image_mime)],
+                estimated_tokens=estimated_tokens,
+                usage=lambda result: result[1],
+            )
+
+            if text_content:
                 logger.info("[%s] Bedrock image description success for page %s", request_id, page_index + 1)
                 return text_content
             else:
@@ -478,9 +837,166 @@ class PDFToMarkdown:
             logger.error("[%s] Bedrock image description failed for page %s: %s", request_id, page_index + 1, exc, exc_info=True)
             return ""
         
+    def _describe_image_cached(
+        self,
+        describe,
+        client,
+        model_name: str,
+        image_b64: str,
+        image_mime: str,
+        *,
+        model_provider: ModelProvider,
+        image_sha256: str,
+        request_id: str,
+        page_index: int,
+        estimated_tokens: int = 0,
+    ) -> str:
+        """
+        Return a cached description for the image if one exists for this
+        provider, model and prompt version; otherwise call ``describe`` and cache
+        its answer. SKIP answers are cached too, failures (empty) are not.
+        """
+        cache = get_description_cache()
+        key = None
+        if cache is not None:
+            key = self._description_cache_key(image_sha256, model_provider, model_name)
+            cached = cache.get(key)
+            if cached is not None:
+                logger.debug("[%s] Image description cache hit for page %s", request_id, page_index + 1)
+                return cached["description"]
+
+        description = describe(
+            client,
+            model_name,
+            image_b64,
+            image_mime,
+            request_id=request_id,
+            page_index=page_index,
+            estimated_tokens=estimated_tokens,
+        )
+        if key is not None and description:
+            cache.set(key, {"description": description})
+        return description
+
+    @staticmethod
+    def _description_cache_key(image_sha256: str, model_provider: ModelProvider, model_name: str) -> str:
+        return make_cache_key(
+            image_sha256,
+            "image-description",
+            {
+                "provider": ModelProvider(model_provider).value,
+                "model": model_name,
+                "prompt": IMAGE_DESCRIPTION_PROMPT_VERSION,
+            },
+        )
+
+    def _describe_images_batch(
+        self,
+        client,
+        model_name: str,
+        images: list[_BatchImage],
+        *,
+        model_provider: ModelProvider,
+        request_id: str,
+    ) -> list[str] | None:
+        """
+        Describe several images in one vision call. Returns one description per
+        image, in order, or None if the call failed or its answer could not be
+        split back per image.
+        """
+        if model_provider == ModelProvider.AZURE_OPENAI:
+            request = self._request_description_azure
+        else:
+            request = self._request_description_bedrock
+        prompt = IMAGE_DESCRIPTION_BATCH_PROMPT.replace("{count}", str(len(images)))
+        pages = ", ".join(sorted({str(image.page_index + 1) for image in images}, key=int))
+        try:
+            text, _ = get_llm_scheduler(ModelProvider(model_provider).value).call(
+                request,
+                client,
+                model_name,
+                [(image.image_b64, image.mime) for image in images],
+                prompt=prompt,
+                max_tokens=min(IMAGE_DESCRIPTION_MAX_TOKENS * len(images), IMAGE_DESCRIPTION_BATCH_MAX_TOKENS),
+                estimated_tokens=estimate_tokens(
+                    prompt, image_sizes=[image.size for image in images], output_tokens=500 * len(images)
+                ),
+                usage=lambda result: result[1],
+            )
+        except Exception as exc:
+            logger.warning("[%s] Batched description of %d images on pages %s failed: %s", request_id, len(images), pages, exc)
+            return None
+        descriptions = _parse_batch_descriptions(text, len(images))
+        if descriptions is None:
+            logger.warning("[%s] Could not split batched description of %d images on pages %s", request_id, len(images), pages)
+        else:
+            logger.info("[%s] Batched image description success for %d images on pages %s", request_id, len(images), pages)
+        return descriptions
+
+    def _describe_batch_cached(
+        self,
+        describe,
+        client,
+        model_name: str,
+        images: list[_BatchImage],
+        *,
+        model_provider: ModelProvider,
+        request_id: str,
+    ) -> None:
+        """
+        Resolve the description futures of queued images: cached descriptions
+        first, then one batched call for the rest. Images are described one by
+        one with ``describe`` if the batched call fails or cannot be split.
+        """
+        try:
+            cache = get_description_cache()
+            uncached: list[_BatchImage] = []
+            for image in images:
+                cached = None
+                if cache is not None:
+                    cached = cache.get(self._description_cache_key(image.sha256, model_provider, model_name))
+                if cached is not None:
+                    image.description.set_result(cached["description"])
+                else:
+                    uncached.append(image)
+
+            descriptions = None
+            if len(uncached) > 1:
+                descriptions = self._describe_images_batch(
+                    client, model_name, uncached, model_provider=model_provider, request_id=request_id
+                )
+            if descriptions is None:
+                for image in uncached:
+                    image.description.set_result(
+                        self._describe_image_cached(
+                            describe,
+                            client,
+                            model_name,
+                            image.image_b64,
+                            image.mime,
+                            model_provider=model_provider,
+                            image_sha256=image.sha256,
+                            request_id=request_id,
+                            page_index=image.page_index,
+                            estimated_tokens=estimate_tokens(IMAGE_DESCRIPTION_PROMPT, image_sizes=[image.size]),
+                        )
+                    )
+                return
+            for image, description in zip(uncached, descriptions):
+                if cache is not None and description:
+                    cache.set(self._description_cache_key(image.sha256, model_provider, model_name), {"description": description})
+                image.description.set_result(description)
+        except Exception as exc:
+            logger.error("[%s] Batched image description failed: %s", request_id, exc, exc_info=True)
+        finally:
+            # Anything left unresolved is treated as a failed description
+            for image in images:
+                if not image.description.done():
+                    image.description.set_result("")
+
     def convert_pdf_to_markdown_optimized(
         self,
-        pdf_path: str, 
+        pdf_path: str | bytes,
         client, 
         model_name: str, 
         model_provider: ModelProvider,
@@ -488,6 +1004,8 @@ class PDFToMarkdown:
         request_id: str, 
         include_images: bool = True,
         include_page_text: bool = True,
+        image_mode: ImageMode | None = None,
+        stats: ImageStats | None = None,
     ) -> str: 
         """
         Enriched PDF conversion:
@@ -495,97 +1013,330 @@ class PDFToMarkdown:
             - Extracts embedded images and obtain AI descriptions 
             - include_images=False -> Only description will be included
             - include_page_text=False -> Skip pypdf page text extraction
+
+        Images are described concurrently within the provider's LLM scheduler
+        limits; the output keeps page and image order. Blank and decorative
+        images are dropped before any LLM call (see imagefilter), and
+        IMAGE_DESCRIPTION_BATCH_SIZE packs several images into one call. Pass
+        ``stats`` to collect how many images were described or skipped, and why.
         """
-        reader = PdfReader(pdf_path)
         markdown_output: list[str] = []
 
-        for i, page in enumerate(reader.pages):
-            page_num = i + 1 
-            logger.info("[%s] Processing Page %d", request_id, page_num)
+        for _, page_output in self._iter_pages_optimized(
+            pdf_path,
+            client,
+            model_name,
+            model_provider,
+            request_id=request_id,
+            include_images=include_images,
+            include_page_text=include_page_text,
+            image_mode=image_mode,
+            stats=stats,
+        ):
+            markdown_output.extend(page_output)
 
-            # Extract text from the page locally 
-            if include_page_text:
-                try:
-                    text = (page.extract_text() or "").strip()
-                    if text:
-                        markdown_output.append(text)
+        return "\n\n".join(markdown_output).strip()
 
-                except Exception as e:
-                    logger.warning("[%s] Could not extract text from page %d: %s", request_id, page_num, e)
+    def iter_pdf_pages_optimized(
+        self,
+        pdf_path: str | bytes,
+        client,
+        model_name: str,
+        model_provider: ModelProvider,
+        *,
+        request_id: str,
+        include_images: bool = True,
+        include_page_text: bool = True,
+        image_mode: ImageMode | None = None,
+        stats: ImageStats | None = None,
+    ) -> Iterator[tuple[int, str]]:
+        """Page-by-page variant of convert_pdf_to_markdown_optimized, yielding (page_number, markdown)."""
+        for page_num, page_output in self._iter_pages_optimized(
+            pdf_path,
+            client,
+            model_name,
+            model_provider,
+            request_id=request_id,
+            include_images=include_images,
+            include_page_text=include_page_text,
+            image_mode=image_mode,
+            stats=stats,
+        ):
+            yield page_num, "\n\n".join(page_output).strip()
 
-            # Extract and describe only embedded images (robust: scan XObjects and only accept JPEG/JP2)
-            images_info = self.extract_images_from_page(page)
-            if images_info:
-                logger.info("[%s] Found %d extractable images on page %d", request_id, len(images_info),page_num)
-                processed_images = 0
-                skipped_images = 0
+    def _iter_pages_optimized(
+        self,
+        pdf_path: str | bytes,
+        client,
+        model_name: str,
+        model_provider: ModelProvider,
+        *,
+        request_id: str,
+        include_images: bool,
+        include_page_text: bool,
+        image_mode: ImageMode | None = None,
+        stats: ImageStats | None = None,
+    ) -> Iterator[tuple[int, list[str]]]:
+        """
+        Yield (page_number, markdown fragments) in page order.
 
-                for j, (image_mime, image_bytes) in enumerate(images_info):
-                    try:
-                        logger.debug("[%s] Processing image %d/%d on page %d (%s, %d bytes)", request_id, j + 1, len(images_info), page_num, image_mime, len(image_bytes))
+        Pages are read ahead of the one being yielded and their image
+        descriptions are submitted to a thread pool, so descriptions for several
+        pages are in flight at once. The scheduler caps concurrency and token
+        rate across all requests in the process. Repeated images (exact or
+        perceptual match) are described once and referenced afterwards. With
+        IMAGE_DESCRIPTION_BATCH_SIZE other than 1, several images share one call.
+        """
+        reader = _open_pdf(pdf_path)
+        stats = stats if stats is not None else ImageStats()
+        image_filter = image_filter_thresholds()
+        scheduler = get_llm_scheduler(ModelProvider(model_provider).value)
+        lookahead = max(2, 2 * scheduler.max_concurrency)
+        dedup = new_image_deduplicator()
+        pool = ThreadPoolExecutor(max_workers=scheduler.max_concurrency, thread_name_prefix="image-describe")
+        batcher = _DescriptionBatcher(
+            self,
+            pool,
+            client,
+            model_name,
+            model_provider,
+            request_id=request_id,
+            batch_size=image_description_batch_size(),
+        )
+        pending: deque = deque()
+        try:
+            for i, page in enumerate(reader.pages):
+                pending.append(
+                    self._start_page_optimized(
+                        batcher,
+                        page,
+                        i + 1,
+                        request_id=request_id,
+                        include_page_text=include_page_text,
+                        dedup=dedup,
+                        image_filter=image_filter,
+                        stats=stats,
+                    )
+                )
+                if len(pending) > lookahead:
+                    batcher.flush_through(pending[0][0])
+                    yield self._finish_page_optimized(
+                        *pending.popleft(),
+                        request_id=request_id,
+                        include_images=include_images,
+                        image_mode=image_mode,
+                        stats=stats,
+                    )
+            while pending:
+                batcher.flush_through(pending[0][0])
+                yield self._finish_page_optimized(
+                    *pending.popleft(),
+                    request_id=request_id,
+                    include_images=include_images,
+                    image_mode=image_mode,
+                    stats=stats,
+                )
+        finally:
+            # Stop queued descriptions if the caller stopped early; running ones finish in the background
+            pool.shutdown(wait=False, cancel_futures=True)
 
-                        # Validate and potentially resize image before processing 
-                        processed_bytes, processed_mime = self._validate_and_resize_image_for_azure(
-                            image_bytes, image_mime, request_id, j+1, page_num
-                        )
+        if dedup is not None and dedup.duplicates:
+            logger.info("[%s] Skipped describing %d repeated images", request_id, dedup.duplicates)
+        if stats.prefiltered:
+            logger.info("[%s] Prefiltered decorative images: %s", request_id, dict(stats.prefiltered))
 
-                        if not processed_bytes:
-                            skipped_images += 1
-                            continue 
+    def _start_page_optimized(
+        self,
+        batcher: _DescriptionBatcher,
+        page,
+        page_num: int,
+        *,
+        request_id: str,
+        include_page_text: bool,
+        dedup: ImageDeduplicator | None = None,
+        image_filter: dict[str, float] | None = None,
+        stats: ImageStats | None = None,
+    ) -> tuple[int, list[str], list[_PageImage], int]:
+        """
+        Extract a page's text and hand its new images to ``batcher`` for description.
 
-                        image_b64 = base64.b64encode(processed_bytes).decode("utf-8")
+        Images the prefilter classes as decorative (``image_filter``
+        thresholds) are skipped without an LLM call.
 
-                        # Update mime type to the processed format 
-                        image_mime = processed_mime 
+        Returns (page_num, text fragments, page images, skipped image count).
+        """
+        page_output: list[str] = []
+        logger.info("[%s] Processing Page %d", request_id, page_num)
 
-                        # Call appropriate description function based on provider
-                        if model_provider == ModelProvider.AZURE_OPENAI:
-                            description = self._describe_image_azure(
-                                client, model_name, image_b64, image_mime, request_id=request_id, page_index=i
-                            )
-                        elif model_provider == ModelProvider.AWS_BEDROCK:
-                            description = self._describe_image_bedrock(
-                                client, model_name, image_b64, image_mime, request_id=request_id, page_index=i
-                            )
-                        else:
-                            logger.error("[%s] Unsupported model provider: %s", request_id, model_provider)
-                            continue
-                        
-                        # Skip invalid images (no description due to Azure 400 or other issues)
-                        if not description:
-                            logger.warning("[%s] Skipping image %d on page %d due to invalid data/description", request_id, j + 1, page_num)
-                            skipped_images += 1
-                            continue
-                            
-                        # Skip images the model tagged as non-important
-                        desc_trimmed = description.strip()
-                        if desc_trimmed.upper() == "SKIP" or desc_trimmed.lower().startswith("skip"):
-                            logger.info("[%s] AI marked image %d on page %d as non-important (SKIP)", request_id, j + 1, page_num)
-                            skipped_images += 1
+        # Extract text from the page locally 
+        if include_page_text:
+            try:
+                text = (page.extract_text() or "").strip()
+                if text:
+                    page_output.append(text)
+
+            except Exception as e:
+                logger.warning("[%s] Could not extract text from page %d: %s", request_id, page_num, e)
+
+        # Extract and describe only embedded images (robust: scan XObjects and only accept JPEG/JP2)
+        images: list[_PageImage] = []
+        skipped_images = 0
+        images_info = self.extract_images_from_page(page)
+        if images_info:
+            logger.info("[%s] Found %d extractable images on page %d", request_id, len(images_info),page_num)
+
+            for j, (image_mime, image_bytes) in enumerate(images_info):
+                try:
+                    logger.debug("[%s] Processing image %d/%d on page %d (%s, %d bytes)", request_id, j + 1, len(images_info), page_num, image_mime, len(image_bytes))
+
+                    if dedup is not None:
+                        sha256, hashed, seen = dedup.find(image_bytes)
+                        if seen is not None:
+                            logger.debug("[%s] Image %d on page %d repeats image %d on page %d", request_id, j + 1, page_num, seen.image_num, seen.page_num)
+                            images.append(_PageImage(j + 1, duplicate_of=seen))
                             continue
-                            
-                        # Image successfully processed
-                        processed_images += 1
-                        logger.debug("[%s] Generated description for image %d on page %d (%d chars)", 
-                                request_id, j + 1, page_num, len(description))
-                        
-                        if include_images:
-                            markdown_output.append(
-                                f"\n\n![Image {j+1} on Page {page_num}](data:{processed_mime};base64,{image_b64})\n\n{description}"
-                            )
-                        else:
-                            markdown_output.append(
-                                f"\n\n{description}"
-                            )
-                    except Exception as e:
-                        logger.error("[%s] Failed to process image %d on page %d: %s", request_id, j + 1, page_num, e, exc_info=True)
+
+                    # Validate and potentially resize image before processing 
+                    processed_bytes, processed_mime = self._validate_and_resize_image_for_azure(
+                        image_bytes, image_mime, request_id, j+1, page_num
+                    )
+
+                    if not processed_bytes:
                         skipped_images += 1
-                        
-                logger.info("[%s] Page %d image processing complete: %d processed, %d skipped", 
-                        request_id, page_num, processed_images, skipped_images)
-            else:
-                logger.debug("[%s] No extractable images found on page %d", request_id, page_num)
+                        if stats is not None:
+                            stats.invalid += 1
+                        if dedup is not None:
+                            dedup.add(sha256, hashed, page_num=page_num, image_num=j + 1)
+                        continue 
 
-        return "\n\n".join(markdown_output).strip()
+                    reason = decorative_reason(processed_bytes, image_filter) if image_filter else None
+                    if reason is not None:
+                        logger.debug("[%s] Prefilter skipped image %d on page %d (%s)", request_id, j + 1, page_num, reason)
+                        skipped_images += 1
+                        if stats is not None:
+                            stats.prefiltered[reason] += 1
+                        if dedup is not None:
+                            # Repeats of it are skipped as well, without measuring them again
+                            dedup.add(sha256, hashed, page_num=page_num, image_num=j + 1)
+                        continue
+
+                    if batcher.describe is None:
+                        logger.error("[%s] Unsupported model provider: %s", request_id, batcher.model_provider)
+                        continue
+
+                    image_b64 = base64.b64encode(processed_bytes).decode("utf-8")
+                    with Image.open(io.BytesIO(processed_bytes)) as img:
+                        size = img.size
+
+                    future = batcher.submit(
+                        image_b64,
+                        processed_mime,
+                        sha256=hashlib.sha256(processed_bytes).hexdigest(),
+                        size=size,
+                        page_index=page_num - 1,
+                    )
+                    ref = None
+                    if dedup is not None:
+                        ref = dedup.add(sha256, hashed, page_num=page_num, image_num=j + 1, value=future).ref
+                    images.append(_PageImage(j + 1, processed_mime, processed_bytes, ref, future))
+                except Exception as e:
+                    logger.error("[%s] Failed to process image %d on page %d: %s", request_id, j + 1, page_num, e, exc_info=True)
+                    skipped_images += 1
+                    if stats is not None:
+                        stats.invalid += 1
+        else:
+            logger.debug("[%s] No extractable images found on page %d", request_id, page_num)
+        batcher.end_page()
+
+        return page_num, page_output, images, skipped_images
+
+    @staticmethod
+    def _is_skip_description(description: str) -> bool:
+        desc_trimmed = description.strip()
+        return desc_trimmed.upper() == "SKIP" or desc_trimmed.lower().startswith("skip")
+
+    def _finish_page_optimized(
+        self,
+        page_num: int,
+        page_output: list[str],
+        images: list[_PageImage],
+        skipped_images: int,
+        *,
+        request_id: str,
+        include_images: bool,
+        image_mode: ImageMode | None = None,
+        stats: ImageStats | None = None,
+    ) -> tuple[int, list[str]]:
+        """Wait for a page's image descriptions and append them, in image order, after the page text."""
+        processed_images = 0
+        repeated_images = 0
+
+        for image in images:
+            image_num = image.image_num
+            try:
+                if image.duplicate_of is not None:
+                    # Reuse the first copy's outcome: skipped there means skipped here
+                    first = image.duplicate_of
+                    description = first.value.result() if first.value is not None else ""
+                    if not description or self._is_skip_description(description):
+                        skipped_images += 1
+                        continue
+                    repeated_images += 1
+                    note = f"_Same image as Image {first.image_num} on Page {first.page_num}._"
+                    if include_images:
+                        page_output.append(
+                            f"\n\n{image_markdown(f'Image {image_num} on Page {page_num}', first.ref)}\n\n{note}"
+                        )
+                    else:
+                        page_output.append(f"\n\n{note}")
+                    continue
+
+                description = image.description.result() if image.description is not None else ""
+
+                # Skip invalid images (no description due to Azure 400 or other issues)
+                if not description:
+                    logger.warning("[%s] Skipping image %d on page %d due to invalid data/description", request_id, image_num, page_num)
+                    skipped_images += 1
+                    if stats is not None:
+                        stats.invalid += 1
+                    continue
+                    
+                # Skip images the model tagged as non-important
+                if self._is_skip_description(description):
+                    logger.info("[%s] AI marked image %d on page %d as non-important (SKIP)", request_id, image_num, page_num)
+                    skipped_images += 1
+                    if stats is not None:
+                        stats.skipped_by_model += 1
+                    continue
+                    
+                # Image successfully processed
+                processed_images += 1
+                logger.debug("[%s] Generated description for image %d on page %d (%d chars)", 
+                        request_id, image_num, page_num, len(description))
+                
+                if include_images:
+                    # Only images that made it into the output are stored
+                    link = image_link(image.data, image.mime, mode=image_mode)
+                    if image.ref is None:
+                        image_block = f"![Image {image_num} on Page {page_num}]({link})"
+                    else:
+                        image_block = image_markdown(f"Image {image_num} on Page {page_num}", image.ref, link)
+                    page_output.append(f"\n\n{image_block}\n\n{description}")
+                else:
+                    page_output.append(
+                        f"\n\n{description}"
+                    )
+            except Exception as e:
+                logger.error("[%s] Failed to process image %d on page %d: %s", request_id, image_num, page_num, e, exc_info=True)
+                skipped_images += 1
+                if stats is not None:
+                    stats.invalid += 1
 
+        if stats is not None:
+            stats.described += processed_images
+            stats.repeated += repeated_images
+        if images or skipped_images:
+            logger.info("[%s] Page %d image processing complete: %d processed, %d repeated, %d skipped", 
+                    request_id, page_num, processed_images, repeated_images, skipped_images)
 
+        return page_num, page_output
@@ -1,14 +1,21 @@
+import io
 import os 
 from fastapi import HTTPException
-import certifi
 from dotenv import load_dotenv
-from extraction.helper.schemas.types import ModelProvider
+from extraction.helper.common import logging as logutil
+from extraction.helper.common.bedrock import get_bedrock_client
+from extraction.helper.common.images import image_dedup_threshold
+from extraction.helper.common.imagestore import default_image_mode, image_output_options
+from extraction.helper.common.markdown import sanitize_markdown_output
+from extraction.helper.schemas.types import ImageMode, ModelProvider
 from openai import AzureOpenAI
-import boto3
+from typing import Any, Iterator
 
 # Load environment variables
 load_dotenv()
 
+logger = logutil.get_logger("markitdown-endpoint")
+
 class MarkitDownHelper():
     def __init__(self):
         pass
@@ -48,13 +55,12 @@ class MarkitDownHelper():
             if not aws_access_key_id or not aws_secret_access_key:
                 raise HTTPException(status_code=500, detail="AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY must be set for Bedrock")
             
-            # Initialize Bedrock client
-            ai_client = boto3.client(
-                'bedrock-runtime',
+            # Reuse the process-wide Bedrock client for these credentials
+            ai_client = get_bedrock_client(
+                region=aws_region,
                 aws_access_key_id=aws_access_key_id,
                 aws_secret_access_key=aws_secret_access_key,
-                region_name=aws_region,
-                verify=certifi.where(),
+                aws_session_token=os.getenv('AWS_SESSION_TOKEN'),
             )
             model_name = bedrock_model_id
         
@@ -62,3 +68,147 @@ class MarkitDownHelper():
             raise HTTPException(status_code=400, detail=f"Unsupported model provider: {model_provider}")
         
         return ai_client, model_name
+
+
+def _docintel_settings() -> tuple[str | None, str | None, str | None]:
+    """Return (endpoint, key, api_version) for Azure Document Intelligence from the environment."""
+    docintel_endpoint = os.getenv("AZURE_DOC_INTEL_ENDPOINT") or os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
+    docintel_key = os.getenv("AZURE_DOC_INTEL_KEY") or os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
+    docintel_api_version = os.getenv("AZURE_DOC_INTEL_API_VERSION")
+    return docintel_endpoint, docintel_key, docintel_api_version
+
+
+def conversion_fingerprint(*, is_pdf_upload: bool, image_mode: ImageMode | None = None) -> dict[str, Any]:
+    """Settings that change convert_file_to_markdown output for an upload, for cache keys."""
+    from extraction.helper.markitdown.PdfToMarkdown import image_pipeline_profile
+
+    docintel_endpoint, docintel_key, docintel_api_version = _docintel_settings()
+    use_docintel = is_pdf_upload and bool(docintel_endpoint and docintel_key)
+    return {
+        "isPdf": is_pdf_upload,
+        "docintel": use_docintel,
+        "docintelEndpoint": docintel_endpoint if use_docintel else None,
+        "docintelApiVersion": docintel_api_version if use_docintel else None,
+        "imageDedup": image_dedup_threshold() if is_pdf_upload and not use_docintel else None,
+        "images": image_output_options(image_mode) if is_pdf_upload and not use_docintel else None,
+        "imagePipeline": image_pipeline_profile() if is_pdf_upload and not use_docintel else None,
+    }
+
+
+def _markitdown_convert(md_instance, source: str | bytes, file_name: str | None):
+    if isinstance(source, bytes):
+        from markitdown import StreamInfo
+
+        # No path to guess the format from, so pass the upload's name along with its bytes
+        extension = os.path.splitext(file_name or "")[1].lower() or None
+        return md_instance.convert_stream(
+            io.BytesIO(source), stream_info=StreamInfo(extension=extension, filename=file_name)
+        )
+    return md_instance.convert(source)
+
+
+def convert_file_to_markdown(
+    file_path: str | bytes,
+    *,
+    is_pdf_upload: bool,
+    request_id: str,
+    file_name: str | None = None,
+    image_mode: ImageMode | None = None,
+) -> str:
+    """
+    Convert a stored upload to markdown with MarkItDown.
+
+    ``file_path`` is the upload's path, or its bytes when it was small enough
+    to keep in memory (``file_name`` then gives MarkItDown its extension).
+    PDFs use Azure Document Intelligence when configured, otherwise standard
+    MarkItDown plus the PDF's embedded images written per ``image_mode``
+    (``none`` skips extracting them), with a local pypdf fallback if
+    MarkItDown fails. This is blocking and is meant to run on the markitdown
+    engine executor.
+    """
+    from markitdown import MarkItDown
+    from extraction.helper.markitdown.PdfToMarkdown import PDFToMarkdown
+
+    pdfToMarkdownHelper = PDFToMarkdown()
+    image_mode = image_mode or default_image_mode()
+    include_images = image_mode != ImageMode.NONE
+
+    docintel_endpoint, docintel_key, docintel_api_version = _docintel_settings()
+    use_docintel = is_pdf_upload and bool(docintel_endpoint and docintel_key)
+
+    try:
+        if use_docintel:
+            from azure.core.credentials import AzureKeyCredential
+
+            md_kwargs: dict[str, Any] = {
+                "docintel_endpoint": docintel_endpoint,
+                "docintel_credential": AzureKeyCredential(docintel_key),
+                "keep_data_uris": True,
+            }
+            if docintel_api_version:
+                md_kwargs["docintel_api_version"] = docintel_api_version
+
+            md_instance = MarkItDown(**md_kwargs)
+            result = _markitdown_convert(md_instance, file_path, file_name)
+            text = result.text_content
+            logger.info("[%s] Converted with Azure Document Intelligence mode", request_id)
+        else:
+            if is_pdf_upload:
+                logger.info("[%s] Azure Document Intelligence credentials not set; using standard MarkItDown path", request_id)
+            md_instance = MarkItDown()
+            result = _markitdown_convert(md_instance, file_path, file_name)
+            text = result.text_content
+            if is_pdf_upload and include_images:
+                image_markdown = pdfToMarkdownHelper.extract_pdf_images_markdown(
+                    file_path,
+                    request_id=request_id,
+                    image_mode=image_mode,
+                )
+                if image_markdown:
+                    text = f"{(text or '').strip()}\n\n---\n\n## Extracted Images\n\n{image_markdown}".strip()
+    except Exception as exc:
+        if is_pdf_upload:
+            logger.warning(
+                "[%s] MarkItDown conversion failed; using local PDF fallback: %s",
+                request_id,
+                exc,
+            )
+            text = pdfToMarkdownHelper.convert_pdf_to_markdown_local(
+                file_path,
+                request_id=request_id,
+                include_images=include_images,
+                include_page_text=True,
+                image_mode=image_mode,
+            )
+        else:
+            raise
+
+    return text
+
+
+def iter_pdf_markdown_pages(
+    file_path: str | bytes,
+    *,
+    request_id: str,
+    image_mode: ImageMode | None = None,
+) -> Iterator[tuple[int, str]]:
+    """
+    Yield (page_number, markdown) for a PDF upload one page at a time.
+
+    Used for streaming responses. MarkItDown and Document Intelligence only
+    return a whole document, so this uses the local pypdf pipeline with each
+    page's images inlined after its text. Blocking; run it with
+    stream_in_engine("markitdown", ...).
+    """
+    from extraction.helper.markitdown.PdfToMarkdown import PDFToMarkdown
+
+    image_mode = image_mode or default_image_mode()
+    pages = PDFToMarkdown().iter_pdf_pages_local(
+        file_path,
+        request_id=request_id,
+        include_images=image_mode != ImageMode.NONE,
+        include_page_text=True,
+        image_mode=image_mode,
+    )
+    for page_num, markdown in pages:
+        yield page_num, sanitize_markdown_output(markdown)
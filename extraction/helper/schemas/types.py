@@ -18,6 +18,54 @@ class APIError(BaseModel):
     code: int
     message: str
 
+class PageRoute(str, Enum):
+    TEXT = "text"
+    OCR = "ocr"
+
+
+class UnstructuredStrategy(str, Enum):
+    AUTO = "auto"
+    FAST = "fast"
+    HI_RES = "hi_res"
+    OCR_ONLY = "ocr_only"
+
+
+class ImageMode(str, Enum):
+    """
+    How extracted images appear in markdown: left out (and not extracted), a
+    URL into the image store, an inline data URI, or an inline downscaled
+    thumbnail.
+    """
+
+    NONE = "none"
+    REFERENCE = "reference"
+    INLINE = "inline"
+    THUMBNAIL = "thumbnail"
+
+
+class PageRouting(BaseModel):
+    """
+    Model representing how one PDF page was extracted.
+
+    Attributes:
+        page (int): 1-based page number
+        route (PageRoute): ``text`` when read from the text layer, ``ocr`` when
+                           sent through the OCR/layout models
+        text_chars (int): Bytes shown by text operators, about one per
+                          character (two for CID fonts). Counted from the
+                          content stream's string operands, so other strings
+                          such as marked-content properties add a little
+        image_coverage (float): Fraction of the page area covered by images
+    """
+
+    model_config = ConfigDict(alias_generator=to_camel)
+
+    page: int
+    route: PageRoute
+    text_chars: int
+    image_coverage: float
+
+
 class Metadata(BaseModel):
     """
     Model representing the file Metadata extracted from a document.
@@ -26,6 +74,9 @@ class Metadata(BaseModel):
         file_name (str): Name of the file
         file_size (str): Size of the file
         creation_date (datetime): Date when the file was created
+        cache_hit (bool): Whether the result was served from the result cache
+        page_routes (list[PageRouting]): Per-page routing decisions when fast-path
+                                         routing was used
     """
 
     model_config = ConfigDict(alias_generator=to_camel)
@@ -33,6 +84,8 @@ class Metadata(BaseModel):
     file_name: str
     file_size: str
     creation_date: datetime.datetime
+    cache_hit: Optional[bool] = None
+    page_routes: Optional[list[PageRouting]] = None
     # Optional field for security classification for now
     # [For future development]
     security_classification: Optional[str] = None
@@ -60,4 +113,16 @@ class TextExtraction(BaseModel):
 
 class ModelProvider(str, Enum):
     AZURE_OPENAI = "azure_openai"
-    AWS_BEDROCK = "aws_bedrock"
\ No newline at end of file
+    AWS_BEDROCK = "aws_bedrock"
+
+class ExtractionEngine(str, Enum):
+    MARKER = "marker"
+    MARKER_STRUCTURED = "marker_structured"
+    MARKITDOWN = "markitdown"
+    UNSTRUCTURED = "unstructured"
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import io
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, BinaryIO, Optional
+
+from pypdf import PdfReader, PdfWriter
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.schemas.types import ImageMode
+
+logger = logutil.get_logger("unstructured-pages")
+
+# Strategies that run per-page inference; fast and auto-on-text PDFs are not worth splitting
+PARALLEL_STRATEGIES = {"hi_res", "ocr_only"}
+# Each worker holds its own copy of the layout model, so the default pool stays small on large hosts
+DEFAULT_PAGE_WORKERS = 4
+# Native thread pools sized from the environment before the model loads
+THREAD_LIMIT_VARIABLES = ("OMP_NUM_THREADS", "OMP_THREAD_LIMIT", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Ignoring invalid integer for %s: %r", name, value)
+        return default
+
+
+def page_pool_settings() -> dict[str, int]:
+    """
+    UNSTRUCTURED_PAGE_WORKERS (default: one per CPU, at most
+    DEFAULT_PAGE_WORKERS; 0 or 1 turns splitting off),
+    UNSTRUCTURED_PARALLEL_MIN_PAGES and UNSTRUCTURED_PAGES_PER_CHUNK.
+    """
+    return {
+        "workers": _env_int("UNSTRUCTURED_PAGE_WORKERS", min(DEFAULT_PAGE_WORKERS, os.cpu_count() or 1)),
+        "minPages": max(1, _env_int("UNSTRUCTURED_PARALLEL_MIN_PAGES", 16)),
+        "pagesPerChunk": max(1, _env_int("UNSTRUCTURED_PAGES_PER_CHUNK", 4)),
+    }
+
+
+def _limit_onnxruntime_threads(threads: int) -> None:
+    # onnxruntime has no environment setting; sessions created without options get a thread per core
+    try:
+        import onnxruntime
+    except ImportError:
+        return
+    session_class = onnxruntime.InferenceSession
+
+    def limited_session(path_or_bytes: Any, sess_options: Any = None, *args: Any, **kwargs: Any) -> Any:
+        if sess_options is None:
+            sess_options = onnxruntime.SessionOptions()
+            sess_options.intra_op_num_threads = threads
+            sess_options.inter_op_num_threads = 1
+        return session_class(path_or_bytes, sess_options, *args, **kwargs)
+
+    onnxruntime.InferenceSession = limited_session
+
+
+def _init_worker(model_name: Optional[str], workers: int) -> None:
+    # Split the cores between workers. Tesseract, torch and onnxruntime otherwise each start a thread per core
+    # in every worker. Values set by the operator are kept.
+    threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    for name in THREAD_LIMIT_VARIABLES:
+        os.environ.setdefault(name, str(threads))
+    try:
+        import torch
+    except ImportError:
+        pass
+    else:
+        torch.set_num_threads(threads)
+    _limit_onnxruntime_threads(threads)
+    if model_name:
+        from unstructured_inference.models.base import get_model
+
+        get_model(model_name)
+
+
+def _partition_chunk(
+    pdf_bytes: bytes,
+    *,
+    filename: str | None,
+    content_type: str | None,
+    parsing_config: dict[str, Any],
+    include_images: bool,
+    image_mode: Optional[ImageMode],
+) -> str | None:
+    from extraction.helper.unstructured.unstructuredHelper import UnstructuredHelper
+
+    return UnstructuredHelper.partition_to_markdown(
+        io.BytesIO(pdf_bytes),
+        filename=filename,
+        content_type=content_type,
+        parsing_config=parsing_config,
+        include_images=include_images,
+        image_mode=image_mode,
+        parallel=False,
+    )
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+class PagePool:
+    """
+    Process pool that partitions page ranges of one PDF at a time in parallel.
+
+    hi_res layout inference and OCR run on one core per partition call, so a
+    long scan otherwise leaves the rest of the machine idle. Workers are
+    spawned rather than forked (the server has threads running) and load the
+    layout model once when they start, then keep it for every later chunk.
+    Each worker's native thread pools get an equal share of the cores.
+    """
+
+    def __init__(self, workers: int, model_name: Optional[str]):
+        self.workers = workers
+        self.model_name = model_name
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.workers),
+                )
+                logger.info("Started unstructured page pool (workers=%d)", self.workers)
+            return self._executor
+
+    def warm(self) -> None:
+        """Spawn every worker now, so models load before the first large PDF instead of during it."""
+        executor = self._get_executor()
+        for future in [executor.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+
+    def worker_pids(self) -> list[int]:
+        executor = self._executor
+        return list(getattr(executor, "_processes", None) or {}) if executor is not None else []
+
+    def _reset(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def partition(
+        self,
+        reader: PdfReader,
+        *,
+        pages_per_chunk: int,
+        filename: str | None,
+        content_type: str | None,
+        parsing_config: dict[str, Any],
+        include_images: bool,
+        image_mode: Optional[ImageMode] = None,
+    ) -> str | None:
+        """
+        Split ``reader``'s pages into chunks of ``pages_per_chunk``, partition
+        them across the pool and join the markdown in page order. Each chunk is
+        partitioned with ``starting_page_number`` set, so page numbers in
+        element metadata match the original document.
+        """
+        executor = self._get_executor()
+        page_count = len(reader.pages)
+        # Routed runs are themselves excerpts that start part-way into the document
+        offset = int(parsing_config.get("starting_page_number", 1))
+        futures = []
+        for first in range(0, page_count, pages_per_chunk):
+            writer = PdfWriter()
+            for index in range(first, min(first + pages_per_chunk, page_count)):
+                writer.add_page(reader.pages[index])
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            futures.append(
+                executor.submit(
+                    _partition_chunk,
+                    buffer.getvalue(),
+                    filename=filename,
+                    content_type=content_type,
+                    parsing_config={**parsing_config, "starting_page_number": offset + first},
+                    include_images=include_images,
+                    image_mode=image_mode,
+                )
+            )
+        try:
+            parts = [future.result() for future in futures]
+        except BrokenProcessPool:
+            # A worker died (usually out of memory); the next call starts a fresh pool
+            self._reset()
+            raise
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        parts = [part for part in parts if part]
+        return "\n".join(parts) if parts else None
+
+    def shutdown(self) -> None:
+        self._reset()
+
+
+_POOL: Optional[PagePool] = None
+_POOL_PID: Optional[int] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_page_pool(model_name: Optional[str]) -> PagePool:
+    global _POOL, _POOL_PID
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != os.getpid():
+            _POOL = PagePool(page_pool_settings()["workers"], model_name)
+            _POOL_PID = os.getpid()
+        return _POOL
+
+
+def partition_pdf_in_parallel(
+    file: BinaryIO,
+    *,
+    filename: str | None,
+    content_type: str | None,
+    parsing_config: dict[str, Any],
+    include_images: bool,
+    image_mode: Optional[ImageMode] = None,
+) -> tuple[bool, str | None]:
+    """
+    Partition a large hi_res/ocr_only PDF across the page pool.
+
+    Returns:
+        (handled, markdown): ``handled`` is False when the document should be
+        partitioned in one piece instead: splitting is off, the strategy does
+        not need it, the PDF is shorter than UNSTRUCTURED_PARALLEL_MIN_PAGES or
+        cannot be read, or a pool worker crashed. The file is rewound either way.
+    """
+    settings = page_pool_settings()
+    strategy = str(getattr(parsing_config.get("strategy"), "value", parsing_config.get("strategy")))
+    if settings["workers"] <= 1 or strategy not in PARALLEL_STRATEGIES:
+        return False, None
+
+    position = file.tell()
+    try:
+        reader = PdfReader(file)
+        page_count = len(reader.pages)
+    except Exception as exc:  # noqa: BLE001 - let partition report unreadable PDFs
+        logger.warning("Could not count PDF pages; partitioning in one piece: %s", exc)
+        file.seek(position)
+        return False, None
+    if page_count < settings["minPages"]:
+        file.seek(position)
+        return False, None
+
+    # Small documents near the threshold still get one chunk per worker
+    pages_per_chunk = min(settings["pagesPerChunk"], math.ceil(page_count / settings["workers"]))
+    try:
+        markdown = get_page_pool(parsing_config.get("hi_res_model_name")).partition(
+            reader,
+            pages_per_chunk=pages_per_chunk,
+            filename=filename,
+            content_type=content_type,
+            parsing_config=parsing_config,
+            include_images=include_images,
+            image_mode=image_mode,
+        )
+    except BrokenProcessPool as exc:
+        logger.error("Unstructured page pool crashed; partitioning in one piece: %s", exc)
+        return False, None
+    finally:
+        if not file.closed:
+            file.seek(position)
+    return True, markdown
+
+
+def page_pool_pids() -> list[int]:
+    """PIDs of this process's page pool workers, for /metrics."""
+    if _POOL is None or _POOL_PID != os.getpid():
+        return []
+    return _POOL.worker_pids()
+
+
+def shutdown_page_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL_PID == os.getpid():
+            _POOL.shutdown()
+        _POOL = None
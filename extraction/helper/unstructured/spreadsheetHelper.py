@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import datetime
+import io
+import os
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Iterator, Optional, TextIO
+
+import openpyxl
+import xlrd
+
+from extraction.helper.common import logging as logutil
+
+logger = logutil.get_logger("spreadsheet")
+
+SPREADSHEET_TYPES = {".csv", ".xlsx", ".xls"}
+# Bytes of a CSV read to detect its delimiter
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_DELIMITERS = ",;\t|"
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_limit(name: str, default: int) -> Optional[int]:
+    try:
+        value = int(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Ignoring invalid %s", name)
+        value = default
+    return value if value > 0 else None
+
+
+def native_spreadsheets_enabled() -> bool:
+    """Whether CSV and Excel uploads skip partition (SPREADSHEET_NATIVE_ENABLED, default true)."""
+    return _env_flag("SPREADSHEET_NATIVE_ENABLED", True)
+
+
+def is_spreadsheet(filename: str | None) -> bool:
+    return Path(filename or "").suffix.lower() in SPREADSHEET_TYPES
+
+
+def spreadsheet_limits(max_rows: Optional[int] = None, max_columns: Optional[int] = None) -> dict[str, Optional[int]]:
+    """
+    Per-sheet row and column caps: the request's values if given, else
+    SPREADSHEET_MAX_ROWS and SPREADSHEET_MAX_COLUMNS. 0 means no cap. Part of
+    cache keys, since they change the output.
+    """
+    if max_rows is None:
+        max_rows = _env_limit("SPREADSHEET_MAX_ROWS", 10000)
+    if max_columns is None:
+        max_columns = _env_limit("SPREADSHEET_MAX_COLUMNS", 100)
+    return {"maxRows": max_rows or None, "maxColumns": max_columns or None}
+
+
+def native_spreadsheet_limits(
+    filename: str | None, max_rows: Optional[int] = None, max_columns: Optional[int] = None
+) -> Optional[dict[str, Optional[int]]]:
+    """The caps to convert ``filename`` natively with, or None if it should go through partition."""
+    if not is_spreadsheet(filename) or not native_spreadsheets_enabled():
+        return None
+    return spreadsheet_limits(max_rows, max_columns)
+
+
+def _format_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+        return value.date().isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    text = str(value).strip()
+    # Pipes would end the cell and newlines the row
+    return text.replace("\\", "\\\\").replace("|", "\\|").replace("\r\n", "<br>").replace("\n", "<br>")
+
+
+def _write_table(
+    out: TextIO,
+    rows: Iterable[list[str]],
+    *,
+    title: Optional[str],
+    width_hint: int,
+    max_rows: Optional[int],
+    max_columns: Optional[int],
+) -> None:
+    """
+    Write one sheet as a markdown table, one row at a time. The first
+    non-empty row is the header; fully empty rows are dropped.
+
+    The table is as wide as the header or ``width_hint`` (the sheet's
+    declared width), whichever is larger, capped at ``max_columns``. Notes
+    after the table say when rows or columns were cut off.
+    """
+    header: Optional[list[str]] = None
+    width = 0
+    written = 0
+    truncated_rows = False
+    widest = 0
+    for row in rows:
+        while row and not row[-1]:
+            row.pop()
+        if not row:
+            continue
+        widest = max(widest, len(row))
+        if header is None:
+            width = max(len(row), width_hint)
+            if max_columns is not None:
+                width = min(width, max_columns)
+            header = row[:width] + [""] * (width - len(row))
+            if title:
+                out.write(f"## {title}\n\n")
+            out.write("| " + " | ".join(header) + " |\n")
+            out.write("|" + "---|" * width + "\n")
+            continue
+        if max_rows is not None and written >= max_rows:
+            truncated_rows = True
+            break
+        cells = row[:width] + [""] * (width - len(row))
+        out.write("| " + " | ".join(cells) + " |\n")
+        written += 1
+
+    if header is None:
+        return
+    if truncated_rows:
+        out.write(f"\n_Showing the first {written} rows._\n")
+    if widest > width:
+        out.write(f"\n_Showing the first {width} of {widest} columns._\n")
+    out.write("\n")
+
+
+def _csv_rows(file: BinaryIO) -> Iterator[list[str]]:
+    sample = file.read(CSV_SNIFF_BYTES)
+    file.seek(0)
+    encoding = "utf-8-sig" if sample.startswith(codecs.BOM_UTF8) else "utf-8"
+    try:
+        sample.decode(encoding)
+    except UnicodeDecodeError as exc:
+        # Excel's "CSV" export is Windows-1252; a split character at the end of the sample is not evidence of that
+        if len(sample) < CSV_SNIFF_BYTES or exc.start < len(sample) - 3:
+            encoding = "cp1252"
+    decoded = sample.decode(encoding, errors="replace")
+    try:
+        dialect = csv.Sniffer().sniff(decoded, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        # Ragged or blank-line-separated files defeat the sniffer; the header line usually does not
+        first_line = decoded.splitlines()[0] if decoded else ""
+        delimiter = max(CSV_DELIMITERS, key=first_line.count)
+        dialect = csv.excel
+        if first_line.count(delimiter):
+            dialect = type("SniffedDialect", (csv.excel,), {"delimiter": delimiter})
+    # Replace undecodable bytes further in rather than fail the upload
+    text = io.TextIOWrapper(file, encoding=encoding, errors="replace", newline="")
+    try:
+        for row in csv.reader(text, dialect):
+            yield [_format_cell(value) for value in row]
+    finally:
+        # Hand the caller's file back open
+        text.detach()
+
+
+def _xlsx_sheets(file: BinaryIO) -> Iterator[tuple[str, int, Iterator[list[str]]]]:
+    # read_only streams rows from the sheet XML instead of building every cell in memory
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            if not hasattr(sheet, "iter_rows"):
+                # Chart sheets have no cells
+                continue
+            # Declared dimensions are unreliable in files written by some tools, so they are only a hint
+            width_hint = sheet.max_column if sheet.max_column and sheet.max_column < 1000 else 0
+            rows = ([_format_cell(value) for value in row] for row in sheet.iter_rows(values_only=True))
+            yield sheet.title, width_hint, rows
+    finally:
+        workbook.close()
+
+
+def _xls_cell(cell: xlrd.sheet.Cell, datemode: int) -> str:
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        try:
+            return _format_cell(xlrd.xldate.xldate_as_datetime(cell.value, datemode))
+        except (ValueError, xlrd.xldate.XLDateError):
+            return _format_cell(cell.value)
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return _format_cell(bool(cell.value))
+    if cell.ctype in (xlrd.XL_CELL_ERROR, xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return ""
+    return _format_cell(cell.value)
+
+
+def _xls_sheets(file: BinaryIO) -> Iterator[tuple[str, int, Iterator[list[str]]]]:
+    # on_demand parses each sheet when it is first used, and it is released after being written
+    workbook = xlrd.open_workbook(file_contents=file.read(), on_demand=True)
+    try:
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            rows = ([_xls_cell(cell, workbook.datemode) for cell in sheet.row(r)] for r in range(sheet.nrows))
+            yield sheet.name, sheet.ncols, rows
+            workbook.unload_sheet(index)
+    finally:
+        workbook.release_resources()
+
+
+def convert_spreadsheet_to_markdown(
+    file: BinaryIO,
+    *,
+    filename: str | None,
+    max_rows: Optional[int] = None,
+    max_columns: Optional[int] = None,
+) -> str | None:
+    """
+    Render a CSV, XLSX or XLS file as markdown tables, one per sheet, without
+    going through partition and HTML.
+
+    Rows are read and written one at a time, so memory stays bounded by the
+    output rather than the workbook. Each sheet stops after ``max_rows`` data
+    rows and ``max_columns`` columns (None for no cap). Blocking; run it on
+    the unstructured engine executor.
+
+    Returns:
+        markdown_string: One ``## <sheet>`` section per non-empty sheet (CSV
+        files get a single untitled table), or None if there were no cells
+    """
+    suffix = Path(filename or "").suffix.lower()
+    out = io.StringIO()
+    if suffix == ".csv":
+        _write_table(out, _csv_rows(file), title=None, width_hint=0, max_rows=max_rows, max_columns=max_columns)
+    elif suffix in {".xlsx", ".xls"}:
+        sheets = _xlsx_sheets(file) if suffix == ".xlsx" else _xls_sheets(file)
+        for title, width_hint, rows in sheets:
+            _write_table(out, rows, title=title, width_hint=width_hint, max_rows=max_rows, max_columns=max_columns)
+    else:
+        raise ValueError(f"Not a spreadsheet: {filename}")
+
+    markdown = out.getvalue().rstrip()
+    return markdown + "\n" if markdown else None
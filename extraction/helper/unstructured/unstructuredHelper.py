@@ -1,20 +1,40 @@
 from fastapi import UploadFile, HTTPException
 from pathlib import Path
-from extraction.helper.schemas.types import APIError
 from http import HTTPStatus
-from typing import Any
+from typing import Any, BinaryIO
 import base64
+import io
+import shutil
+import tempfile
 
 import html2text
+from unstructured.partition.auto import partition
 from unstructured.partition.utils.constants import PartitionStrategy
 from unstructured.documents.elements import Element
+from pypdf import PdfReader, PdfWriter
+
+from extraction.helper.common import logging as logutil
+from extraction.helper.common.imagestore import image_link
+from extraction.helper.common.libreoffice import LibreOfficeError, get_libreoffice_pool
+from extraction.helper.common.pdfrouting import classify_pdf, page_runs
+from extraction.helper.common.uploads import upload_limit
+from extraction.helper.unstructured.pagePool import get_page_pool, page_pool_settings, partition_pdf_in_parallel
+from extraction.helper.schemas.types import ImageMode, PageRoute, UnstructuredStrategy
+
+logger = logutil.get_logger("unstructured")
+
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
 
 class UnstructuredHelper():
     def __init__(self):
-        self.MAX_FILE_SIZE: int = 10 * 1024 * 1024  
+        self.MAX_FILE_SIZE: int = upload_limit("unstructured")
         self.VALID_FILE_TYPES: list[str] = [".pdf", ".doc", ".docx", ".xlsx", ".xls", ".csv", ".txt"]
         self.MAX_FILE: int = 1
+        # Only PDFs have page images for layout detection and table inference
+        # to run on. Word documents and spreadsheets carry their structure
+        # (tables included) in the file itself, and CSV and text files are read
+        # directly, so hi_res settings there only add work.
         self.FILE_PARSING_CONFIG: dict[str, dict[str, Any]]= {
             ".pdf": {
                 "strategy": PartitionStrategy.HI_RES,
@@ -24,88 +44,275 @@ class UnstructuredHelper():
                 "extract_image_block_to_payload": True
             },
             ".docx": {
-                "strategy": PartitionStrategy.HI_RES,
-                "hi_res_model_name": "yolox",
-                "infer_table_structure": True,
-                "extract_image_block_types": ["Image"],
-                "extract_image_block_to_payload": True
+                "strategy": PartitionStrategy.FAST,
+                "infer_table_structure": True
             },
             ".doc": {
-                "strategy": PartitionStrategy.HI_RES,
-                "hi_res_model_name": "yolox",
-                "infer_table_structure": True,
-                "extract_image_block_types": ["Image"],
-                "extract_image_block_to_payload": True
+                "strategy": PartitionStrategy.FAST,
+                "infer_table_structure": True
             },
             ".xlsx": {
-                "strategy": PartitionStrategy.HI_RES,
-                "hi_res_model_name": "yolox",
-                "infer_table_structure": True,
-                "extract_image_block_types": ["Image"],
-                "extract_image_block_to_payload": True
+                "infer_table_structure": True
             },
             ".xls": {
-                "strategy": PartitionStrategy.HI_RES,
-                "hi_res_model_name": "yolox",
-                "infer_table_structure": True,
-                "extract_image_block_types": ["Image"],
-                "extract_image_block_to_payload": True
+                "infer_table_structure": True
             },
             ".csv": {
-                "strategy": PartitionStrategy.HI_RES,
-                "hi_res_model_name": "yolox",
-                "infer_table_structure": True,
-                "extract_image_block_types": ["Image"],
-                "extract_image_block_to_payload": True
-            },
-            ".txt": {
-                "strategy": PartitionStrategy.HI_RES,
-                "hi_res_model_name": "yolox",
-                "infer_table_structure": True,
-                "extract_image_block_types": ["Image"],
-                "extract_image_block_to_payload": True
+                "infer_table_structure": True
             },
+            ".txt": {},
             "default": {
-                "strategy": PartitionStrategy.HI_RES,
-                "hi_res_model_name": "yolox",
-                "infer_table_structure": True,
-                "extract_image_block_types": ["Image"],
-                "extract_image_block_to_payload": True
+                "strategy": PartitionStrategy.AUTO,
+                "infer_table_structure": True
             }
         }
         super().__init__()
 
-    async def get_parsing_config(self, filename: str):
+    async def get_parsing_config(
+        self,
+        filename: str,
+        strategy: UnstructuredStrategy | None = None,
+        *,
+        include_images: bool = True,
+    ):
         """
         Returns the parsing configuration dictionary for given file extension
 
         If no matching pattern is found, returns a default configuration
+
+        Args:
+            filename (str): Name of the uploaded file
+            strategy (UnstructuredStrategy | None): Partition strategy requested by the
+                client, replacing the one in the table. hi_res also turns on the
+                layout model and image extraction.
+            include_images (bool): False drops image extraction, so partition
+                does not crop and encode image blocks at all
+
+        Returns:
+            configuration: A copy of the keyword arguments for partition
         """
         # Get file type
-        file_extension = Path(filename).suffix
+        file_extension = Path(filename).suffix.lower()
         # Get configuration
-        configuration = self.FILE_PARSING_CONFIG[file_extension]
-        if configuration is not None:
-            return configuration
-        # Default return
-        return self.FILE_PARSING_CONFIG["default"]
-    
+        configuration = dict(self.FILE_PARSING_CONFIG.get(file_extension, self.FILE_PARSING_CONFIG["default"]))
+        if strategy is not None:
+            configuration["strategy"] = PartitionStrategy(strategy.value)
+            if strategy == UnstructuredStrategy.HI_RES:
+                pdf_config = self.FILE_PARSING_CONFIG[".pdf"]
+                for key in ("hi_res_model_name", "extract_image_block_types", "extract_image_block_to_payload"):
+                    configuration.setdefault(key, pdf_config[key])
+        if not include_images:
+            configuration.pop("extract_image_block_types", None)
+            configuration.pop("extract_image_block_to_payload", None)
+        return configuration
+
+    @staticmethod
+    def preload_models(warmup_pdf: str | None = None) -> None:
+        """
+        Load the hi_res layout model, start the page pool and optionally partition a sample PDF to warm it up
+
+        Args:
+            warmup_pdf (str | None): Path to a PDF used for a warm-up inference
+        """
+        from unstructured_inference.models.base import get_model
+
+        pdf_config = UnstructuredHelper().FILE_PARSING_CONFIG[".pdf"]
+        get_model(pdf_config["hi_res_model_name"])
+        if page_pool_settings()["workers"] > 1:
+            get_page_pool(pdf_config["hi_res_model_name"]).warm()
+        if warmup_pdf is not None:
+            partition(filename=warmup_pdf, **pdf_config)
+
+    @staticmethod
+    def partition_to_markdown(
+        file: BinaryIO,
+        *,
+        filename: str | None,
+        content_type: str | None,
+        parsing_config: dict[str, Any],
+        include_images: bool = True,
+        image_mode: ImageMode | None = None,
+        parallel: bool = True,
+    ) -> str | None:
+        """
+        Partition a document with unstructured and render the elements as Markdown
+
+        This is blocking (hi_res runs layout inference) and is meant to run on the
+        unstructured engine executor. Large hi_res PDFs are split into page
+        ranges and partitioned on the page pool (see pagePool).
+
+        Args:
+            file (BinaryIO): File object positioned at the start of the document
+            filename (str | None): Original file name, used for type detection and metadata
+            content_type (str | None): MIME type reported by the client
+            parsing_config (dict[str, Any]): Keyword arguments for partition
+            include_images (bool): Whether to write extracted images into the Markdown
+            image_mode (ImageMode | None): How images are written; defaults to IMAGE_MODE
+            parallel (bool): Whether a large PDF may be split across the page pool
+
+        Returns:
+            markdown_string: Document rendered as Markdown, or None if nothing was extracted
+        """
+        if parallel and Path(filename or "").suffix.lower() == ".pdf":
+            handled, markdown = partition_pdf_in_parallel(
+                file,
+                filename=filename,
+                content_type=content_type,
+                parsing_config=parsing_config,
+                include_images=include_images,
+                image_mode=image_mode,
+            )
+            if handled:
+                return markdown
+
+        converted = UnstructuredHelper._convert_legacy_doc(file, filename)
+        if converted is not None:
+            file, content_type = converted, DOCX_CONTENT_TYPE
+        elements = partition(
+            file=file,
+            metadata_filename=filename,
+            content_type=content_type,
+            skip_infer_table_types=[],
+            **parsing_config
+        )
+        if elements is None:
+            return None
+
+        # Convert extracted text to Markdown to facilitate LLM readability
+        return "\n".join(
+            [
+                UnstructuredHelper.convert_unstructured_element_to_markdown(
+                    i, include_images=include_images, image_mode=image_mode
+                )
+                for i in elements
+            ]
+        )
+
+    @staticmethod
+    def _convert_legacy_doc(file: BinaryIO, filename: str | None) -> BinaryIO | None:
+        """
+        Convert a .doc upload to .docx on the pooled LibreOffice workers, so
+        partition does not start a soffice process for it
+
+        Returns:
+            converted: The .docx as an in-memory file, or None to let partition
+            convert the original (not a .doc, pool disabled, or the pool failed)
+        """
+        if Path(filename or "").suffix.lower() != ".doc":
+            return None
+        pool = get_libreoffice_pool()
+        if pool is None:
+            return None
+        work_dir = tempfile.mkdtemp(prefix="doc-convert-")
+        try:
+            input_path = Path(work_dir) / "input.doc"
+            position = file.tell()
+            with open(input_path, "wb") as f_out:
+                shutil.copyfileobj(file, f_out)
+            file.seek(position)
+            output_path = pool.convert(input_path, work_dir, "docx")
+            return io.BytesIO(output_path.read_bytes())
+        except (LibreOfficeError, OSError) as exc:
+            logger.warning("Pooled LibreOffice conversion failed; falling back to partition's own: %s", exc)
+            return None
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    @staticmethod
+    def partition_pdf_with_routing(
+        file: BinaryIO,
+        *,
+        filename: str | None,
+        content_type: str | None,
+        parsing_config: dict[str, Any],
+        include_images: bool = True,
+        image_mode: ImageMode | None = None,
+    ) -> tuple[str | None, list[dict[str, Any]] | None]:
+        """
+        Partition a PDF with the fast strategy for pages that have a usable text
+        layer and the configured (hi_res) strategy only for scanned or
+        image-heavy pages
+
+        Consecutive pages with the same route are partitioned together, each run
+        as its own PDF with starting_page_number set so page numbers in element
+        metadata stay correct. Blocking; run it on the unstructured engine
+        executor.
+
+        Returns:
+            (markdown, page_routes): Markdown as partition_to_markdown returns it,
+            and one routing record per page (None if the PDF could not be
+            classified and was partitioned as a whole)
+        """
+        pages = classify_pdf(file)
+        if pages is None:
+            markdown = UnstructuredHelper.partition_to_markdown(
+                file,
+                filename=filename,
+                content_type=content_type,
+                parsing_config=parsing_config,
+                include_images=include_images,
+                image_mode=image_mode,
+            )
+            return markdown, None
+
+        runs = page_runs(pages)
+        reader = PdfReader(file) if len(runs) > 1 else None
+        parts: list[str] = []
+        for route, run_pages in runs:
+            run_config = dict(parsing_config)
+            if route == PageRoute.TEXT:
+                run_config["strategy"] = PartitionStrategy.FAST
+            if reader is None:
+                source = file
+            else:
+                writer = PdfWriter()
+                for page in run_pages:
+                    writer.add_page(reader.pages[page.page - 1])
+                source = io.BytesIO()
+                writer.write(source)
+                source.seek(0)
+                run_config["starting_page_number"] = run_pages[0].page
+            markdown = UnstructuredHelper.partition_to_markdown(
+                source,
+                filename=filename,
+                content_type=content_type,
+                parsing_config=run_config,
+                include_images=include_images,
+                image_mode=image_mode,
+            )
+            if markdown:
+                parts.append(markdown)
+
+        return ("\n".join(parts) if parts else None), [page.to_dict() for page in pages]
+
     @staticmethod
-    def _extract_image_data_url(metadata: dict[str, Any]) -> str | None:
+    def _extract_image_link(metadata: dict[str, Any], image_mode: ImageMode | None = None) -> str | None:
+        """Image store URL or data URI, per ``image_mode``, for the image payload partition put in ``metadata``."""
         image_b64 = metadata.get("image_base64") or metadata.get("base64") or metadata.get("image_data")
-        if isinstance(image_b64, bytes):
-            image_b64 = base64.b64encode(image_b64).decode("utf-8")
+        mime_type = metadata.get("image_mime_type") or metadata.get("mime_type") or "image/png"
         if isinstance(image_b64, str):
             image_b64 = image_b64.strip()
             if image_b64.startswith("data:image/"):
-                return image_b64
-            if image_b64:
-                mime_type = metadata.get("image_mime_type") or metadata.get("mime_type") or "image/png"
-                return f"data:{mime_type};base64,{image_b64}"
+                header, _, image_b64 = image_b64.partition(",")
+                mime_type = header[len("data:"):].split(";")[0]
+            if not image_b64:
+                return None
+            try:
+                image_b64 = base64.b64decode(image_b64)
+            except ValueError:
+                logger.warning("Skipping image with an undecodable payload")
+                return None
+        if isinstance(image_b64, bytes) and image_b64:
+            return image_link(image_b64, mime_type, mode=image_mode)
         return None
 
     @staticmethod
-    def convert_unstructured_element_to_markdown(element: Element, *, include_images: bool = False):
+    def convert_unstructured_element_to_markdown(
+        element: Element,
+        *,
+        include_images: bool = False,
+        image_mode: ImageMode | None = None,
+    ):
         """
         Convert each element dictionary to a Markdown string based on its type 
 
@@ -165,9 +372,9 @@ class UnstructuredHelper():
                 # Render image text content and the Image path
                 # Image base64 is extracted in metadata instead of
                 # storing the extracted image in the figures directory
-                image_data_url = UnstructuredHelper._extract_image_data_url(metadata) if include_images else None
-                if include_images and image_data_url:
-                    markdown = f"![Image]({image_data_url})\n\nImage Content: {text} \n\n"
+                image_url = UnstructuredHelper._extract_image_link(metadata, image_mode) if include_images else None
+                if include_images and image_url:
+                    markdown = f"![Image]({image_url})\n\nImage Content: {text} \n\n"
                 else:
                     markdown = f"Image Content: {text} \n\n"
 
@@ -243,7 +450,7 @@ class UnstructuredHelper():
         if len(oversize_files) > 0:
             raise HTTPException(
                 status_code=int(HTTPStatus.REQUEST_ENTITY_TOO_LARGE),
-                detail=f"File size exceeds 10mb"
+                detail=f"File size exceeds {self.MAX_FILE_SIZE / (1024 * 1024):g}MB"
             )
         
         if len(invalid_files) > 0:
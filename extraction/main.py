@@ -1,15 +1,48 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from extraction.api import unstructured, markitdown, marker
+from extraction.api import health, images, jobs, unstructured, markitdown, marker
+from extraction.helper.common.executor import shutdown_engine_executors
+from extraction.helper.common.libreoffice import shutdown_libreoffice_pool
+from extraction.helper.common.uploads import UploadSizeLimitMiddleware
+from extraction.helper.common.warmup import start_preloading
+from extraction.helper.jobs.runner import get_job_workers
+from extraction.helper.unstructured.pagePool import shutdown_page_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load models in the background; /ready reports 503 until they are loaded.
+    # Fork-mode engines are loaded and forked here, before serving starts.
+    preload = await start_preloading()
+    job_workers = get_job_workers() if os.getenv("JOBS_ENABLED", "true").lower() in {"1", "true", "yes", "on"} else None
+    if job_workers is not None:
+        job_workers.start()
+    yield
+    if job_workers is not None:
+        await job_workers.stop()
+    if preload is not None and not preload.done():
+        preload.cancel()
+    # Let in-flight extractions finish before the worker exits
+    shutdown_engine_executors(wait=True)
+    shutdown_libreoffice_pool()
+    shutdown_page_pool()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# Turns away oversized bodies before they are parsed and spooled
+app.add_middleware(UploadSizeLimitMiddleware)
 
+app.include_router(health.router)
 app.include_router(unstructured.router, prefix="/unstructured")
 app.include_router(markitdown.router, prefix="/markitdown")
 app.include_router(marker.router, prefix="/marker")
+app.include_router(jobs.router, prefix="/jobs")
+app.include_router(images.router, prefix="/images")
 
 
 if __name__ == "__main__":
     import uvicorn
-    import os
     port = int(os.getenv("PORT", 8000))
     uvicorn.run("extraction.main:app", host="0.0.0.0", port=port, reload=True)
@@ -0,0 +1,98 @@
+import asyncio
+import io
+import os
+import shutil
+
+import pytest
+from fastapi import UploadFile
+
+from extraction.helper.common import cache
+
+
+@pytest.fixture(autouse=True)
+def no_result_cache(monkeypatch):
+    monkeypatch.setenv("RESULT_CACHE_ENABLED", "false")
+
+
+async def _cancel_leader_with_follower(source, cleanup):
+    """Start a shared run, attach a follower, cancel the leader and run its cleanup, then let the run finish."""
+    release = asyncio.Event()
+    started = asyncio.Event()
+    seen = []
+
+    async def compute(owned):
+        seen.append(owned)
+        started.set()
+        await release.wait()
+        if isinstance(owned, bytes):
+            return {"markdown": owned.decode()}
+        with open(owned, "rb") as fh:
+            return {"markdown": fh.read().decode()}
+
+    async def leader():
+        try:
+            return await cache.cached_extraction("same-upload", compute, source)
+        finally:
+            # What the routes do when their request goes away
+            await cleanup()
+
+    leader_task = asyncio.create_task(leader())
+    await started.wait()
+    follower = asyncio.create_task(cache.cached_extraction("same-upload", compute, source))
+    await asyncio.sleep(0)
+    leader_task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader_task
+
+    release.set()
+    result, cache_hit = await follower
+    return result, cache_hit, seen
+
+
+def test_follower_survives_leader_cancel_with_file_source(tmp_path):
+    folder = tmp_path / "request"
+    folder.mkdir()
+    path = folder / "doc.pdf"
+    path.write_bytes(b"%PDF-1.7 shared")
+
+    async def cleanup():
+        shutil.rmtree(folder)
+
+    result, cache_hit, seen = asyncio.run(_cancel_leader_with_follower(str(path), cleanup))
+
+    assert result == {"markdown": "%PDF-1.7 shared"}
+    assert cache_hit is False
+    assert not folder.exists()
+    # One engine run, on a copy the run owned and removed afterwards
+    assert len(seen) == 1 and seen[0] != str(path)
+    assert not os.path.exists(os.path.dirname(seen[0]))
+    assert cache._INFLIGHT == {}
+
+
+def test_follower_survives_leader_cancel_with_upload_file():
+    upload = UploadFile(file=io.BytesIO(b"a,b\n1,2\n"), filename="table.csv")
+
+    async def cleanup():
+        await upload.close()
+
+    result, _, seen = asyncio.run(_cancel_leader_with_follower(upload, cleanup))
+
+    assert result == {"markdown": "a,b\n1,2\n"}
+    assert seen == [b"a,b\n1,2\n"]
+
+
+def test_calls_after_a_run_finishes_start_a_new_one():
+    calls = []
+
+    async def compute(owned):
+        calls.append(owned)
+        return {"markdown": owned.decode()}
+
+    async def main():
+        first = await cache.cached_extraction("key", compute, b"one")
+        second = await cache.cached_extraction("key", compute, b"one")
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second == ({"markdown": "one"}, False)
+    assert len(calls) == 2
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+import pytest
+
+from extraction.helper.common import warmup
+from extraction.helper.common.executor import EngineExecutor, get_engine_executor, shutdown_engine_executors
+
+
+def _start_method(executor: EngineExecutor) -> str:
+    return executor._executor._mp_context.get_start_method()
+
+
+def test_lazy_fork_pool_falls_back_to_spawn_while_other_threads_run():
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    executor = EngineExecutor("lazy", mode="fork", max_workers=1)
+    try:
+        executor._get_executor()
+        assert _start_method(executor) == "spawn"
+    finally:
+        stop.set()
+        thread.join()
+        executor.shutdown()
+
+
+def test_explicit_start_forks():
+    executor = EngineExecutor("eager", mode="fork", max_workers=1)
+    try:
+        executor.start()
+        assert _start_method(executor) == "fork"
+        assert len(executor.worker_pids()) == 1
+    finally:
+        executor.shutdown()
+
+
+@pytest.fixture
+def fork_engines(monkeypatch):
+    monkeypatch.setenv("PRELOAD_ENGINES", "markitdown,unstructured")
+    monkeypatch.setenv("MARKITDOWN_EXECUTOR_MODE", "fork")
+    monkeypatch.setenv("MARKITDOWN_MAX_WORKERS", "1")
+    monkeypatch.setenv("UNSTRUCTURED_EXECUTOR_MODE", "thread")
+    monkeypatch.setattr(warmup, "_STATES", {})
+    shutdown_engine_executors()
+    yield
+    shutdown_engine_executors()
+
+
+def test_fork_engines_are_forked_after_every_preload_finishes(fork_engines, monkeypatch):
+    events = []
+    both_loading = threading.Barrier(2, timeout=5)
+
+    def preloader(name):
+        def load(_warmup_pdf):
+            # Both preloads run at once; neither may overlap a fork
+            both_loading.wait()
+            events.append(f"loaded {name}")
+
+        return load
+
+    real_start = EngineExecutor.start
+
+    def start(self):
+        events.append(f"fork {self.name} threads={threading.active_count()}")
+        real_start(self)
+
+    monkeypatch.setitem(warmup.ENGINE_PRELOADERS, "markitdown", preloader("markitdown"))
+    monkeypatch.setitem(warmup.ENGINE_PRELOADERS, "unstructured", preloader("unstructured"))
+    monkeypatch.setattr(EngineExecutor, "start", start)
+
+    pending = asyncio.run(warmup.start_preloading())
+
+    assert pending is None
+    assert sorted(events[:2]) == ["loaded markitdown", "loaded unstructured"]
+    # The preload threads are gone by the time the workers are forked
+    assert events[2] == "fork markitdown threads=1"
+    assert len(events) == 3
+    assert _start_method(get_engine_executor("markitdown")) == "fork"
+    ready, states = warmup.readiness()
+    assert ready, states
+
+
+def test_thread_engines_still_load_in_the_background(fork_engines, monkeypatch):
+    monkeypatch.setenv("MARKITDOWN_EXECUTOR_MODE", "thread")
+    monkeypatch.setitem(warmup.ENGINE_PRELOADERS, "markitdown", lambda _pdf: None)
+    monkeypatch.setitem(warmup.ENGINE_PRELOADERS, "unstructured", lambda _pdf: None)
+
+    async def main():
+        pending = await warmup.start_preloading()
+        assert pending is not None
+        await pending
+
+    asyncio.run(main())
+    assert warmup.readiness()[0]
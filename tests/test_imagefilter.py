@@ -0,0 +1,59 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from extraction.helper.common.imagefilter import decorative_reason, image_filter_thresholds
+
+
+def _png(img: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _text(mode: str, size: tuple[int, int], text: str, origin: tuple[int, int]) -> bytes:
+    background, ink = (1, 0) if mode == "1" else ("white", "black")
+    img = Image.new(mode, size, background)
+    ImageDraw.Draw(img).text(origin, text, fill=ink)
+    return _png(img)
+
+
+def _qr_like(modules: int, module_px: int) -> bytes:
+    rng = np.random.default_rng(7)
+    matrix = np.where(rng.random((modules, modules)) > 0.5, 255, 0).astype(np.uint8)
+    pixels = np.kron(matrix, np.ones((module_px, module_px), dtype=np.uint8))
+    return _png(Image.fromarray(pixels).convert("1"))
+
+
+@pytest.fixture
+def thresholds():
+    return image_filter_thresholds()
+
+
+@pytest.mark.parametrize(
+    "image",
+    [
+        _text("1", (64, 64), "SIGNED", (4, 26)),
+        _text("RGB", (64, 64), "SIGNED", (4, 26)),
+        _text("1", (48, 48), "OK", (16, 18)),
+        _qr_like(25, 2),
+        _qr_like(32, 8),
+    ],
+    ids=["signed-1bit", "signed-rgb", "ok-icon", "qr-50px", "qr-256px"],
+)
+def test_bilevel_text_and_qr_codes_are_kept(image, thresholds):
+    assert decorative_reason(image, thresholds) is None
+
+
+def test_large_divider_is_low_detail(thresholds):
+    img = Image.new("RGB", (600, 40), "white")
+    ImageDraw.Draw(img).rectangle([0, 18, 599, 21], fill=(40, 40, 40))
+    assert decorative_reason(_png(img), thresholds) == "lowDetail"
+
+
+def test_blank_and_gradient_images_are_dropped(thresholds):
+    assert decorative_reason(_png(Image.new("RGB", (400, 300), "white")), thresholds) == "blank"
+    ramp = np.tile(np.linspace(0, 255, 600, dtype=np.uint8), (200, 1))
+    assert decorative_reason(_png(Image.fromarray(ramp)), thresholds) == "lowDetail"
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from extraction.helper.common import cache, imagestore
+from extraction.helper.common.imagestore import ImageStore
+
+
+def _image(n: int, size: int = 1000) -> bytes:
+    return n.to_bytes(4, "big") * (size // 4)
+
+
+def _stored_bytes(directory) -> int:
+    return sum(p.stat().st_size for p in directory.glob("*/*"))
+
+
+def test_disk_cap_covers_every_process_using_the_store(tmp_path):
+    # Two stores on one directory stand in for two worker processes
+    first = ImageStore(tmp_path, disk_max_bytes=10_000)
+    second = ImageStore(tmp_path, disk_max_bytes=10_000)
+    for n in range(30):
+        (first if n % 2 else second).put(_image(n), "image/png")
+
+    assert _stored_bytes(tmp_path) <= 10_000
+    assert int((tmp_path / imagestore.USAGE_FILE).read_text()) == _stored_bytes(tmp_path)
+    assert first.stats()["evictions"] + second.stats()["evictions"] > 0
+
+
+def test_usage_is_seeded_from_what_is_already_on_disk(tmp_path):
+    ImageStore(tmp_path).put(_image(1), "image/png")
+    (tmp_path / imagestore.USAGE_FILE).unlink()
+
+    ImageStore(tmp_path).put(_image(2), "image/png")
+
+    assert int((tmp_path / imagestore.USAGE_FILE).read_text()) == _stored_bytes(tmp_path) == 2000
+
+
+def test_touch_refreshes_expiry_and_reports_missing_images(tmp_path):
+    store = ImageStore(tmp_path, ttl_seconds=60)
+    image_id = store.put(_image(1), "image/png")
+    path = tmp_path / image_id[:2] / image_id
+    os.utime(path, (time.time() - 50, time.time() - 50))
+
+    assert store.touch([image_id])
+    assert path.stat().st_mtime > time.time() - 5
+    assert not store.touch([image_id, "0" * 64 + ".png"])
+    assert not store.touch(["../escape.png"])
+
+
+@pytest.fixture
+def result_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESULT_CACHE_ENABLED", "true")
+    monkeypatch.setenv("RESULT_CACHE_DIR", str(tmp_path / "results"))
+    monkeypatch.setenv("IMAGE_STORE_DIR", str(tmp_path / "images"))
+    monkeypatch.setattr(cache, "_RESULT_CACHE", None)
+    monkeypatch.setattr(imagestore, "_STORE", None)
+    return tmp_path
+
+
+def test_cached_result_with_evicted_images_is_extracted_again(result_cache):
+    runs = []
+
+    async def compute(source):
+        runs.append(source)
+        image_id = imagestore.get_image_store().put(source, "image/png")
+        return {"markdown": f"![Image 1 on Page 1](/images/{image_id})"}
+
+    async def extract():
+        return await cache.cached_extraction("doc", compute, _image(7))
+
+    first, hit = asyncio.run(extract())
+    assert not hit
+    _, hit = asyncio.run(extract())
+    assert hit and len(runs) == 1
+
+    image_id = imagestore.IMAGE_LINK_REGEX.search(first["markdown"]).group(1)
+    (result_cache / "images" / image_id[:2] / image_id).unlink()
+
+    again, hit = asyncio.run(extract())
+    assert not hit and len(runs) == 2
+    assert again == first
+    assert imagestore.get_image_store().get(image_id) is not None
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from extraction.helper.unstructured import pagePool
+
+
+@pytest.fixture
+def sixteen_cpus(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 16)
+    for name in (*pagePool.THREAD_LIMIT_VARIABLES, "UNSTRUCTURED_PAGE_WORKERS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_default_worker_count_is_bounded(sixteen_cpus, monkeypatch):
+    assert pagePool.page_pool_settings()["workers"] == pagePool.DEFAULT_PAGE_WORKERS
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    assert pagePool.page_pool_settings()["workers"] == 2
+
+
+def test_workers_split_the_cores_between_their_thread_pools(sixteen_cpus, monkeypatch):
+    # Imported here: onnxruntime starts native threads, which would make the executor tests' forks unsafe
+    onnxruntime = pytest.importorskip("onnxruntime")
+    sessions = []
+
+    def record_session(path_or_bytes, sess_options=None, *args, **kwargs):
+        sessions.append(sess_options)
+
+    monkeypatch.setattr(onnxruntime, "InferenceSession", record_session)
+    monkeypatch.setenv("MKL_NUM_THREADS", "2")
+
+    pagePool._init_worker(None, workers=4)
+    onnxruntime.InferenceSession("model.onnx", providers=["CPUExecutionProvider"])
+
+    assert os.environ["OMP_NUM_THREADS"] == "4"
+    assert os.environ["OMP_THREAD_LIMIT"] == "4"
+    assert os.environ["MKL_NUM_THREADS"] == "2"
+    assert sessions[0].intra_op_num_threads == 4
+    assert sessions[0].inter_op_num_threads == 1
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from openai import AsyncAzureOpenAI, AzureOpenAI
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from benchmarks.image_description import build_deck, make_client, run
+from extraction.helper.common import ratelimit
+from extraction.helper.common.ratelimit import LLMScheduler
+from extraction.helper.schemas.types import ModelProvider
+
+MESSAGES = [{"role": "user", "content": "Describe nothing."}]
+BEDROCK_BODY = json.dumps(
+    {"anthropic_version": "bedrock-2023-05-31", "max_tokens": 16, "messages": [{"role": "user", "content": "Hi"}]}
+)
+
+
+def _azure(url: str, client_class=AzureOpenAI):
+    # The scheduler does the retrying; the SDK's own retries would hide throttles from it
+    return client_class(api_key="fake", azure_endpoint=url, api_version="2024-12-01-preview", max_retries=0)
+
+
+def _complete(scheduler: LLMScheduler, client: AzureOpenAI, **kwargs):
+    return scheduler.call(client.chat.completions.create, model="fake-deployment", messages=MESSAGES, **kwargs)
+
+
+def _in_threads(count: int, target) -> None:
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrency_limit_is_shared_by_threads_and_coroutines():
+    scheduler = LLMScheduler("test", max_concurrency=3)
+    with FakeLLMServer(latency=0.1, max_concurrency=10) as server:
+        client = _azure(server.url)
+
+        async def coroutines():
+            async_client = _azure(server.url, AsyncAzureOpenAI)
+            await asyncio.gather(
+                *(
+                    scheduler.acall(async_client.chat.completions.create, model="fake-deployment", messages=MESSAGES)
+                    for _ in range(6)
+                )
+            )
+
+        async_callers = threading.Thread(target=asyncio.run, args=(coroutines(),))
+        async_callers.start()
+        _in_threads(6, lambda: _complete(scheduler, client))
+        async_callers.join()
+        served = server.stats()
+
+    assert served["completed"] == 12
+    assert served["throttled"] == 0
+    assert served["peakConcurrency"] == 3
+    assert scheduler.stats()["calls"] == 12
+
+
+def test_cancelled_async_waiter_gives_its_slot_back():
+    scheduler = LLMScheduler("test", max_concurrency=1)
+    release = threading.Event()
+
+    async def scenario():
+        holder = asyncio.create_task(scheduler.acall(asyncio.to_thread, release.wait))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.create_task(scheduler.acall(asyncio.sleep, 0))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        release.set()
+        await holder
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # The slot freed by the holder must not stay with the cancelled waiter
+        await asyncio.wait_for(scheduler.acall(asyncio.sleep, 0), timeout=2)
+
+    asyncio.run(scenario())
+
+
+def test_waiting_coroutines_do_not_hold_executor_threads():
+    scheduler = LLMScheduler("test", max_concurrency=1)
+
+    async def scenario():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2))
+        held = asyncio.Event()
+        holder = asyncio.create_task(scheduler.acall(held.wait))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(scheduler.acall(asyncio.sleep, 0, result=n)) for n in range(20)]
+        await asyncio.sleep(0.05)
+        # Other to_thread work still runs while twenty calls wait for the slot
+        assert await asyncio.wait_for(asyncio.to_thread(lambda: "free"), timeout=2) == "free"
+        held.set()
+        await holder
+        assert await asyncio.gather(*waiters) == list(range(20))
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_paces_calls():
+    scheduler = LLMScheduler("test", max_concurrency=4, tokens_per_minute=6000)
+    with FakeLLMServer(latency=0.01) as server:
+        client = _azure(server.url)
+        # The first call spends the whole minute's budget; at 100 tokens/s each 50-token call then waits 0.5s
+        _complete(scheduler, client, estimated_tokens=6000)
+        start = time.perf_counter()
+        for _ in range(2):
+            _complete(scheduler, client, estimated_tokens=50)
+        elapsed = time.perf_counter() - start
+
+    # Each call's own latency refills a little of the next wait
+    assert elapsed >= 0.8
+    assert scheduler.stats()["rateLimitWaitSeconds"] >= 0.8
+
+
+@pytest.mark.parametrize("provider", list(ModelProvider), ids=lambda provider: provider.value)
+def test_throttled_calls_back_off_for_retry_after(provider):
+    # Without the server's hint, backoff would pick up to 30 seconds
+    scheduler = LLMScheduler("test", max_concurrency=3, retry_base_seconds=30, retry_max_seconds=60)
+    with FakeLLMServer(latency=0.2, max_concurrency=1, retry_after=0.3) as server:
+        if provider == ModelProvider.AZURE_OPENAI:
+            client = _azure(server.url)
+            call = lambda: _complete(scheduler, client)  # noqa: E731
+        else:
+            client, model = make_client(provider, server.url)
+            call = lambda: scheduler.call(client.invoke_model, modelId=model, body=BEDROCK_BODY)  # noqa: E731
+
+        start = time.perf_counter()
+        _in_threads(3, call)
+        elapsed = time.perf_counter() - start
+        served = server.stats()
+
+    assert served["completed"] == 3
+    assert served["throttled"] >= 2
+    assert scheduler.stats()["throttled"] == served["throttled"]
+    assert scheduler.stats()["failures"] == 0
+    assert 0.3 <= elapsed < 5
+
+
+@pytest.fixture
+def deck(tmp_path, monkeypatch):
+    monkeypatch.setenv("IMAGE_DESCRIPTION_CACHE_ENABLED", "false")
+    monkeypatch.setenv("IMAGE_DESCRIPTION_BATCH_SIZE", "1")
+    monkeypatch.setattr(ratelimit, "_SCHEDULERS", {})
+    pdf = tmp_path / "deck.pdf"
+    build_deck(pdf, images=8, decorative=2)
+    return pdf
+
+
+@pytest.mark.parametrize("provider", list(ModelProvider), ids=lambda provider: provider.value)
+def test_concurrent_and_batched_descriptions_keep_page_order(deck, provider):
+    # Jitter makes later images finish first
+    with FakeLLMServer(latency=0.02, jitter=0.2, max_concurrency=16) as server:
+        client, model = make_client(provider, server.url)
+        outputs = {
+            (concurrency, batch_size): run(
+                deck, provider, client, model, concurrency=concurrency, tokens_per_minute=0, batch_size=batch_size
+            )
+            for concurrency, batch_size in [(1, 1), (4, 1), (4, 3), (4, 0)]
+        }
+
+    sequential = outputs[(1, 1)][3]
+    described = re.findall(r"Image ([0-9a-f]{12})\.", sequential)
+    assert len(described) == len(set(described)) == 8
+    for (concurrency, batch_size), (_, _, image_stats, markdown) in outputs.items():
+        assert re.findall(r"Image ([0-9a-f]{12})\.", markdown) == described, (concurrency, batch_size)
+        assert markdown == sequential
+        assert image_stats.prefiltered
@@ -0,0 +1,51 @@
+import pytest
+from fastapi import HTTPException
+
+from extraction.helper.common.uploads import check_file_type, sniff_kind
+
+BMP_HEADER = b"BM" + (70).to_bytes(4, "little") + b"\x00\x00\x00\x00" + (54).to_bytes(4, "little") + b"\x28\x00\x00\x00"
+
+
+@pytest.mark.parametrize(
+    "filename, head",
+    [
+        ("measurements.csv", b"BMI,Height,Weight\n22.1,180,72\n"),
+        ("cars.txt", b"BMW 3 Series, 2019\nAudi A4, 2020\n"),
+        ("notes.txt", b"Saved as %PDF-1.7 by the scanner, see attachment.\n"),
+        ("notes.md", b"%PDF-1.7 is the header every PDF starts with.\n"),
+    ],
+)
+def test_text_that_looks_like_a_signature_is_accepted_as_text(filename, head):
+    assert check_file_type(filename, head) == "text"
+
+
+def test_sniff_only_matches_signatures_at_the_start():
+    assert sniff_kind(b"BMI,Height,Weight\n") == "text"
+    assert sniff_kind(b"note: %PDF-1.7\n") == "text"
+    assert sniff_kind(BMP_HEADER) == "bmp"
+    assert sniff_kind(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n") == "pdf"
+
+
+def test_pdf_header_after_junk_is_accepted_when_a_pdf_is_expected():
+    head = b"\r\n\x00junk" + b"%PDF-1.4\n"
+    assert check_file_type("scan.pdf", head) == "pdf"
+    assert check_file_type("upload", head, required_kind="pdf") == "pdf"
+
+
+@pytest.mark.parametrize(
+    "filename, head, required_kind",
+    [
+        ("report.pdf", b"BMI,Height,Weight\n", None),
+        ("upload", b"plain text", "pdf"),
+        ("image.bmp", b"BMI,Height,Weight\n", None),
+        ("table.csv", b"PK\x03\x04\x14\x00\x00\x00\x08\x00", None),
+    ],
+)
+def test_content_not_matching_the_expected_kind_is_rejected(filename, head, required_kind):
+    with pytest.raises(HTTPException) as excinfo:
+        check_file_type(filename, head, required_kind=required_kind)
+    assert excinfo.value.status_code == 415
+
+
+def test_bmp_upload_is_accepted():
+    assert check_file_type("image.bmp", BMP_HEADER) == "bmp"